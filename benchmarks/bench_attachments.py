@@ -0,0 +1,68 @@
+"""
+Compares peak RSS and time of processing a multi-megabyte CSV attachment with the original
+decode-write-reread process_attachments against the streaming decoder. Each variant runs in its
+own subprocess so its peak RSS is measured in isolation.
+
+Usage: python -m benchmarks.bench_attachments [megabytes]
+"""
+import os
+import sys
+import csv
+import time
+import base64
+import resource
+import tempfile
+import subprocess
+
+MEGABYTES = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+
+def make_attachment(megabytes):
+    row = "student{0}@example.com,captcha-solver,{0},https://github.com/u/r{0},0.{0}\n"
+    lines = ["email,task,round,repo_url,score\n"]
+    size = 0
+    i = 0
+    while size < megabytes * 1024 * 1024:
+        lines.append(row.format(i))
+        size += len(lines[-1])
+        i += 1
+    return {"name": "data.csv", "url": "data:text/csv;base64," + base64.b64encode("".join(lines).encode()).decode()}
+
+def legacy_process(attachment, temp_dir):
+    """The original process_attachments for a CSV: decode it all, write it to disk, re-read it into a list."""
+    header, encoded = attachment["url"].split(",", 1)
+    padding = len(encoded) % 4
+    if padding != 0:
+        encoded += "=" * (4 - padding)
+    data = base64.b64decode(encoded)
+    file_path = os.path.join(temp_dir, attachment["name"])
+    with open(file_path, "wb") as f:
+        f.write(data)
+    with open(file_path, "r", encoding="utf-8-sig") as f:
+        return [row for row in csv.DictReader(f)]
+
+def streaming_process(attachment):
+    from student_api.utils import process_attachments
+    return process_attachments([attachment])[attachment["name"]]
+
+def run_variant(variant):
+    attachment = make_attachment(MEGABYTES)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = legacy_process(attachment, tmp) if variant == "legacy" else streaming_process(attachment)
+        count = sum(1 for _ in rows)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    print(f"{variant:<10} {count:>9,} rows  {elapsed:.3f}s  peak RSS above input +{peak / 1024:.1f} MiB")
+
+def main():
+    if len(sys.argv) > 2:
+        run_variant(sys.argv[2])
+        return
+    os.environ.setdefault("ATTACHMENT_MAX_BYTES", str((MEGABYTES + 1) * 1024 * 1024))
+    print(f"{MEGABYTES} MiB CSV attachment")
+    for variant in ("legacy", "streaming"):
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_attachments", str(MEGABYTES), variant], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares result inserts/sec for the old connect-per-statement access pattern
+against the pooled connection, a single transaction and executemany.
+
+Usage: python -m benchmarks.bench_db [rows]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+INSERT = "INSERT INTO results (email, task, round, repo_url, commit_sha, pages_url, check_name, score, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+def make_rows(n):
+    return [(f"student{i}@example.com", "captcha-solver", 1, f"https://github.com/u/r{i}", "sha", "https://u.github.io/r/", "MIT LICENSE", 1, "MIT license found") for i in range(n)]
+
+def create_table(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE results (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, email TEXT, task TEXT, round INTEGER, repo_url TEXT, commit_sha TEXT, pages_url TEXT, check_name TEXT, score INTEGER, reason TEXT, logs TEXT)")
+    conn.commit()
+    conn.close()
+
+def connect_per_statement(path, rows):
+    """The original db_utils.execute: connect, execute, commit and close for every row."""
+    for row in rows:
+        conn = sqlite3.connect(path)
+        conn.execute(INSERT, row)
+        conn.commit()
+        conn.close()
+
+def run(label, fn, rows):
+    start = time.perf_counter()
+    fn(rows)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(rows) / elapsed:>12,.0f} inserts/sec  ({elapsed:.3f}s)")
+
+def main():
+    rows = make_rows(ROWS)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        create_table(legacy_path)
+        run("connect per statement", lambda r: connect_per_statement(legacy_path, r), rows)
+
+        pooled_path = os.path.join(tmp, "pooled.db")
+        create_table(pooled_path)
+        from database import db_utils
+        db_utils.DB_PATH = pooled_path
+
+        def pooled(r):
+            for row in r:
+                db_utils.execute(INSERT, row)
+
+        def batched(r):
+            with db_utils.transaction():
+                for row in r:
+                    db_utils.execute(INSERT, row)
+
+        run("pooled execute", pooled, rows)
+        run("pooled transaction", batched, rows)
+        run("executemany", lambda r: db_utils.executemany(INSERT, r), rows)
+        db_utils.close_connections()
+
+if __name__ == "__main__":
+    main()
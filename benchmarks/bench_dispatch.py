@@ -0,0 +1,65 @@
+"""
+Runs round 1 over a generated submissions.csv against local stub student endpoints and compares
+it with the original serial, blocking POST loop (timed on a sample and extrapolated).
+
+Usage: python -m benchmarks.bench_dispatch [rows] [endpoints] [latency_seconds]
+"""
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import tempfile
+from contextlib import ExitStack
+
+import requests
+
+from tests.fake_student_api import FakeStudentAPI
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+ENDPOINTS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+LATENCY = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+SERIAL_SAMPLE = 20
+
+def write_submissions(path, endpoints):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["email", "secret", "task", "round", "nonce", "brief", "checks", "evaluation_url", "attachments", "endpoint"])
+        for i in range(ROWS):
+            writer.writerow([f"student{i}@example.com", "secret", "captcha-solver-1", 1, f"nonce{i}", "Create a captcha solver",
+                             "Repo has MIT license,README.md is professional", "http://localhost:8001/evaluation", "[]", endpoints[i % len(endpoints)]])
+
+def serial(path):
+    """The original round 1 loop: one blocking POST at a time."""
+    with open(path) as f:
+        rows = list(csv.DictReader(f))[:SERIAL_SAMPLE]
+    start = time.perf_counter()
+    for row in rows:
+        payload = dict(row, round=int(row["round"]), checks=row["checks"].split(","), attachments=json.loads(row["attachments"]))
+        requests.post(row["endpoint"], json=payload, timeout=30)
+    return (time.perf_counter() - start) / len(rows) * ROWS
+
+def main():
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp, ExitStack() as stack:
+        from database import db_utils
+        db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+        from evaluation_scripts import round1
+
+        servers = [stack.enter_context(FakeStudentAPI(latency=LATENCY)) for _ in range(ENDPOINTS)]
+        path = os.path.join(tmp, "submissions.csv")
+        write_submissions(path, [server.url for server in servers])
+        print(f"{ROWS} submissions, {ENDPOINTS} endpoints, {LATENCY:.2f}s per request")
+
+        estimate = serial(path)
+        print(f"{'serial requests.post':<24} {estimate:>9.1f}s (extrapolated from {SERIAL_SAMPLE} rows)")
+
+        start = time.perf_counter()
+        round1.main(["--csv", path])
+        elapsed = time.perf_counter() - start
+        sent = db_utils.fetchone("SELECT COUNT(*) AS count FROM tasks WHERE statuscode=202")["count"]
+        print(f"{'async dispatcher':<24} {elapsed:>9.1f}s ({sent} tasks accepted, {ROWS / elapsed:,.0f} tasks/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares time-to-first-file and end-to-end latency of app generation for the original path
+(a new synchronous client per call, captcha solved before a non-streamed completion) against
+the shared async engine (captcha solved alongside a streamed completion), using a local stub of
+the chat completions endpoint.
+
+Usage: python -m benchmarks.bench_generation [jobs] [latency_seconds]
+"""
+import os
+import sys
+import time
+import tempfile
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from tests.fake_openai import FakeOpenAI
+
+JOBS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+CONCURRENCY = 8
+SAMPLE = {"sample.png": "data:image/png;base64,aGVsbG8="}
+
+def legacy_generate(generator, base_url, brief):
+    """The original generate_app: a fresh client per call and the two requests back to back."""
+    client = openai.OpenAI(api_key="bench", base_url=base_url)
+    response = client.chat.completions.create(
+        model=generator.MODEL,
+        messages=[{"role": "user", "content": [
+            {"type": "text", "text": generator.CAPTCHA_QUESTION},
+            {"type": "image_url", "image_url": {"url": SAMPLE["sample.png"]}},
+        ]}],
+        max_tokens=300,
+    )
+    solution = response.choices[0].message.content.strip()
+    client = openai.OpenAI(api_key="bench", base_url=base_url)
+    response = client.chat.completions.create(
+        model=generator.MODEL,
+        messages=[
+            {"role": "system", "content": "You are an expert web developer."},
+            {"role": "user", "content": generator.create_prompt(brief, SAMPLE, solution)},
+        ],
+        temperature=generator.TEMPERATURE,
+        max_tokens=generator.MAX_TOKENS,
+    )
+    return generator.parse_generated_code(response.choices[0].message.content)
+
+def measure(label, generate):
+    def job(i):
+        first_file = []
+        start = time.perf_counter()
+        generate(f"brief {label} {i}", lambda name, content: first_file or first_file.append(time.perf_counter()))
+        end = time.perf_counter()
+        return (first_file[0] if first_file else end) - start, end - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        timings = list(pool.map(job, range(JOBS)))
+    elapsed = time.perf_counter() - start
+    first_file = [t[0] for t in timings]
+    total = [t[1] for t in timings]
+    print(f"{label:<22} first file p50 {statistics.median(first_file):.3f}s  "
+          f"end-to-end p50 {statistics.median(total):.3f}s  max {max(total):.3f}s  wall {elapsed:.3f}s")
+
+def main():
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    with tempfile.TemporaryDirectory() as tmp:
+        from database import db_utils
+        db_utils.DB_PATH = os.path.join(tmp, "bench.db")
+        db_utils.init_db()
+        from student_api import generator
+
+        with FakeOpenAI(latency=LATENCY, chunk_size=32, chunk_delay=0.002) as fake:
+            print(f"{JOBS} jobs, {CONCURRENCY} at a time, {LATENCY:.2f}s model latency")
+            measure("sequential, blocking", lambda brief, on_file: on_file(*next(iter(legacy_generate(generator, fake.url, brief).items()))))
+            generator.engine = generator.GenerationEngine(base_url=fake.url)
+            # Distinct briefs keep the completion cache cold; the shared sample image is solved once.
+            measure("async engine, streamed", lambda brief, on_file: generator.generate_app(brief, SAMPLE, on_file))
+            print(f"engine stats: {generator.engine.stats()}")
+
+if __name__ == "__main__":
+    main()
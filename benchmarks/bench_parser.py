@@ -0,0 +1,75 @@
+"""
+Compares the original three-regex parse_generated_code against the single-pass code block parser
+on large completions, both on the whole text and fed as a stream of small chunks.
+
+Usage: python -m benchmarks.bench_parser [kilobytes]
+"""
+import re
+import sys
+import time
+
+from student_api.code_blocks import CodeBlockParser, parse_code_blocks
+
+KILOBYTES = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+CHUNK_SIZE = 16
+
+def make_completion(kilobytes):
+    line = "    <div class=\"row\"><span>captcha</span><img src=\"data:image/png;base64,aGVsbG8=\"></div>\n"
+    body = line * (kilobytes * 1024 // len(line) // 2)
+    return (
+        "Here are the files.\n\n"
+        f"```html\n<!-- index.html -->\n<html>\n{body}</html>\n```\n\n"
+        f"**app.js**\n```javascript\n{body.replace('<', '// <')}```\n\n"
+        "```markdown\n<!-- README.md -->\n# Captcha Solver\n\n```bash\npython -m http.server\n```\n```\n\n"
+        "```text\n<!-- LICENSE -->\nMIT License\n```\n"
+    )
+
+def legacy_parse(generated_code):
+    """The original parse_generated_code: one DOTALL search per known file."""
+    files = {}
+    file_patterns = {
+        "index.html": r"```html\n<!-- index.html -->\n(.*?)\n```",
+        "README.md": r"```markdown\n<!-- README.md -->\n(.*?)\n```",
+        "LICENSE": r"```text\n<!-- LICENSE -->\n(.*?)\n```",
+    }
+    for file_name, pattern in file_patterns.items():
+        match = re.search(pattern, generated_code, re.DOTALL)
+        if match:
+            files[file_name] = match.group(1).strip()
+    return files
+
+def legacy_stream(text):
+    """Streaming with the original parser: re-parse the whole buffer whenever a chunk has a backtick."""
+    buffer = ""
+    seen = set()
+    for i in range(0, len(text), CHUNK_SIZE):
+        chunk = text[i:i + CHUNK_SIZE]
+        buffer += chunk
+        if "`" in chunk:
+            seen.update(legacy_parse(buffer))
+    return seen
+
+def incremental_stream(text):
+    parser = CodeBlockParser()
+    for i in range(0, len(text), CHUNK_SIZE):
+        parser.feed(text[i:i + CHUNK_SIZE])
+    parser.close()
+    return parser.files
+
+def run(label, fn, text, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        files = fn(text)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<32} {elapsed * 1000:>9.2f} ms  {len(text) / elapsed / 1e6:>8.1f} MB/s  files={sorted(files)}")
+
+def main():
+    text = make_completion(KILOBYTES)
+    print(f"{len(text) / 1024:.0f} KiB completion, streamed in {CHUNK_SIZE}-character chunks")
+    run("three regexes, whole text", legacy_parse, text)
+    run("single pass, whole text", lambda t: parse_code_blocks(t)[0], text)
+    run("three regexes, re-parse on `", legacy_stream, text, repeat=1)
+    run("single pass, incremental", incremental_stream, text, repeat=1)
+
+if __name__ == "__main__":
+    main()
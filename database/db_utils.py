@@ -1,96 +1,226 @@
 import sqlite3
 import os
+import threading
+import importlib.util
+from contextlib import contextmanager
 
 DB_FILE = "tasks.db"
 
+def _default_db_path():
+    """
+    database/tasks.db, unless a tasks.db exists in the working directory, the default location
+    before DB_PATH was introduced, in which case that database keeps being used.
+    """
+    default = os.path.join(os.path.dirname(os.path.abspath(__file__)), DB_FILE)
+    legacy = os.path.abspath(DB_FILE)
+    if legacy != default and os.path.exists(legacy):
+        print(f"Using the database at {legacy}; set DB_PATH or move it to {default} to silence this notice.")
+        return legacy
+    return default
+
+DB_PATH = os.getenv("DB_PATH") or _default_db_path()
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+STATEMENT_CACHE_SIZE = 256
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = []
+_generation = 0
+
 def get_db_path():
     """Returns the absolute path to the database file."""
-    return os.path.abspath(DB_FILE)
+    return os.path.abspath(DB_PATH)
 
-def get_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(get_db_path())
+def _connect(check_same_thread=True):
+    conn = sqlite3.connect(
+        get_db_path(),
+        isolation_level=None,
+        check_same_thread=check_same_thread,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+def get_connection():
+    """
+    Establishes a new connection to the SQLite database.
+    The caller owns the connection and must close it; use the module helpers for pooled access.
+    """
+    return _connect()
+
+def _thread_connection():
+    """
+    Returns the persistent connection of the current thread, opening it on first use.
+    Keeping the connection open lets SQLite reuse its prepared statement cache across calls.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = _connect(check_same_thread=False)
+        with _pool_lock:
+            _pool.append(conn)
+            _local.generation = _generation
+        _local.conn = conn
+        _local.depth = 0
     return conn
 
+def close_connections():
+    """Closes every pooled connection. Threads transparently reconnect on their next call."""
+    global _generation
+    with _pool_lock:
+        for conn in _pool:
+            conn.close()
+        _pool.clear()
+        _generation += 1
+
+@contextmanager
+def transaction():
+    """
+    Runs the enclosed statements in a single transaction on the thread's connection.
+    Commits on success and rolls back if the block raises. Nested blocks join the outer transaction.
+    """
+    conn = _thread_connection()
+    if _local.depth == 0:
+        conn.execute("BEGIN")
+    _local.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        _local.depth -= 1
+        if _local.depth == 0 and conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    else:
+        _local.depth -= 1
+        if _local.depth == 0:
+            conn.execute("COMMIT")
+
+def _in_transaction():
+    """Whether the current thread is inside transaction(), where a swallowed error would commit a partial transaction."""
+    return getattr(_local, "depth", 0) > 0
+
 def execute(query, params=()):
-    """Executes a query and returns the last inserted row id."""
-    conn = None
+    """
+    Executes a query and returns the last inserted row id.
+    Database errors are printed and return None, except inside transaction(), where they propagate
+    so the transaction is rolled back; the same holds for executemany, fetchall and fetchone.
+    """
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(query, params)
-        conn.commit()
+        cur = _thread_connection().execute(query, params)
+        return cur.lastrowid
     except sqlite3.Error as e:
+        if _in_transaction():
+            raise
         print(f"Database error: {e}")
-    finally:
-        if conn:
-            conn.close()
+        return None
+
+def executemany(query, seq_of_params):
+    """Executes a query once per parameter tuple in a single transaction and returns the row count."""
+    try:
+        with transaction() as conn:
+            cur = conn.executemany(query, seq_of_params)
+            return cur.rowcount
+    except sqlite3.Error as e:
+        if _in_transaction():
+            raise
+        print(f"Database error: {e}")
+        return 0
 
 def fetchall(query, params=()):
     """Fetches all rows from a query."""
-    conn = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(query, params)
-        rows = cur.fetchall()
-        return [dict(row) for row in rows]
+        cur = _thread_connection().execute(query, params)
+        return [dict(row) for row in cur.fetchall()]
     except sqlite3.Error as e:
+        if _in_transaction():
+            raise
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 def fetchone(query, params=()):
     """Fetches one row from a query."""
-    conn = None
     try:
-        conn = get_connection()
-        cur = conn.cursor()
-        cur.execute(query, params)
+        cur = _thread_connection().execute(query, params)
         row = cur.fetchone()
         return dict(row) if row else None
     except sqlite3.Error as e:
+        if _in_transaction():
+            raise
         print(f"Database error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
+
+def _migrations():
+    """Returns (version, name, path) for every migration file, ordered by version."""
+    migrations = []
+    for file_name in os.listdir(MIGRATIONS_DIR):
+        name, extension = os.path.splitext(file_name)
+        if extension in (".sql", ".py") and name[:1].isdigit():
+            version = int(name.split("_", 1)[0])
+            migrations.append((version, name, os.path.join(MIGRATIONS_DIR, file_name)))
+    return sorted(migrations)
+
+def _run_python_migration(conn, version, name, path):
+    """Runs the upgrade(conn) function of a .py migration and records it in one transaction."""
+    spec = importlib.util.spec_from_file_location(f"migration_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    conn.execute("BEGIN")
+    module.upgrade(conn)
+    conn.execute("INSERT INTO schema_migrations (version, name) VALUES (?, ?)", (version, name))
+    conn.execute("COMMIT")
+
+def migrate(conn):
+    """
+    Applies every migration in database/migrations that has not been recorded in schema_migrations.
+    A migration is a .sql script, or a .py module with an upgrade(conn) function for changes that
+    depend on the existing schema. Each migration runs in its own transaction. Returns the list of
+    applied versions.
+    """
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+    newly_applied = []
+    for version, name, path in _migrations():
+        if version in applied:
+            continue
+        try:
+            if path.endswith(".py"):
+                _run_python_migration(conn, version, name, path)
+            else:
+                with open(path, "r") as f:
+                    sql = f.read()
+                conn.executescript(f"BEGIN;\n{sql}\nINSERT INTO schema_migrations (version, name) VALUES ({version}, '{name}');\nCOMMIT;")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        newly_applied.append(version)
+    return newly_applied
 
 def main():
-    """Initializes the database and creates the tasks table."""
+    """Initializes the database by applying any pending schema migrations."""
+    close_connections()
     conn = None
     try:
         conn = get_connection()
-        conn.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT,
-            task TEXT,
-            round INTEGER,
-            nonce TEXT,
-            brief TEXT,
-            attachments TEXT,
-            checks TEXT,
-            evaluation_url TEXT,
-            endpoint TEXT,
-            statuscode INTEGER,
-            secret TEXT,
-            repo_url TEXT,
-            commit_sha TEXT,
-            pages_url TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        conn.commit()
-        print("Database initialized and tasks table created.")
+        applied = migrate(conn)
+        if applied:
+            print(f"Database initialized, applied migrations: {applied}")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     finally:
         if conn:
             conn.close()
 
+init_db = main
+
 if __name__ == "__main__":
     main()
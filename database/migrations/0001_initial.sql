@@ -1,4 +1,5 @@
 CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
     email TEXT,
     task TEXT,
@@ -10,7 +11,10 @@ CREATE TABLE IF NOT EXISTS tasks (
     evaluation_url TEXT,
     endpoint TEXT,
     statuscode INTEGER,
-    secret TEXT
+    secret TEXT,
+    repo_url TEXT,
+    commit_sha TEXT,
+    pages_url TEXT
 );
 
 CREATE TABLE IF NOT EXISTS repos (
@@ -36,4 +40,20 @@ CREATE TABLE IF NOT EXISTS results (
     score INTEGER,
     reason TEXT,
     logs TEXT
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    email TEXT,
+    task TEXT,
+    round INTEGER,
+    nonce TEXT,
+    status TEXT,
+    stage TEXT,
+    request TEXT,
+    endpoint TEXT,
+    result TEXT,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
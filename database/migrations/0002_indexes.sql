@@ -0,0 +1,22 @@
+-- Keep only the latest row per submission so the unique key can be created on existing databases.
+-- The older duplicates are moved to tasks_duplicates rather than dropped, for the operator to review.
+CREATE TABLE IF NOT EXISTS tasks_duplicates AS SELECT * FROM tasks WHERE 0;
+INSERT INTO tasks_duplicates
+SELECT * FROM tasks
+WHERE rowid NOT IN (
+    SELECT MAX(rowid) FROM tasks GROUP BY email, task, round, nonce
+);
+DELETE FROM tasks
+WHERE rowid NOT IN (
+    SELECT MAX(rowid) FROM tasks GROUP BY email, task, round, nonce
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_tasks_submission ON tasks (email, task, round, nonce);
+CREATE INDEX IF NOT EXISTS idx_tasks_email_round ON tasks (email, round);
+CREATE INDEX IF NOT EXISTS idx_tasks_task_round ON tasks (task, round);
+
+CREATE INDEX IF NOT EXISTS idx_repos_round ON repos (round);
+
+CREATE INDEX IF NOT EXISTS idx_results_submission ON results (email, task, round);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
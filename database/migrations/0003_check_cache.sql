@@ -0,0 +1,5 @@
+-- Results are memoized per (repo_url, commit_sha, check_name, check_version).
+-- Rows written before this migration have no version and are therefore re-evaluated once.
+ALTER TABLE results ADD COLUMN check_version INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_results_check_cache ON results (repo_url, commit_sha, check_name, check_version);
@@ -0,0 +1,14 @@
+-- Outbound evaluation callbacks, drained by the notification sender in student_api/notifier.py.
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT,
+    payload TEXT,
+    status TEXT DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at REAL,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notifications_due ON notifications (status, next_attempt_at);
@@ -0,0 +1,10 @@
+-- Content-addressed cache of model responses, see student_api/llm_cache.py.
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    response TEXT,
+    size INTEGER,
+    created_at REAL,
+    last_used_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used_at);
@@ -0,0 +1,8 @@
+-- Resumable position of the round 1 submissions ingest, see evaluation_scripts/round1.py.
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    source TEXT PRIMARY KEY,
+    byte_offset INTEGER NOT NULL,
+    row_number INTEGER NOT NULL,
+    fingerprint TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
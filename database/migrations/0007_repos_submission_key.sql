@@ -0,0 +1,8 @@
+-- One repos row per submission, so evaluation callbacks can be upserted.
+-- Keep only the latest row per submission so the unique key can be created on existing databases.
+DELETE FROM repos
+WHERE rowid NOT IN (
+    SELECT MAX(rowid) FROM repos GROUP BY email, task, round, nonce
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_repos_submission ON repos (email, task, round, nonce);
@@ -0,0 +1,2 @@
+-- The evaluation scheduler polls repos for rows recorded or updated after its watermark.
+CREATE INDEX IF NOT EXISTS idx_repos_timestamp ON repos (timestamp);
@@ -0,0 +1,8 @@
+-- One job per submission, so a repeated request is attached to the existing job.
+-- Keep only the latest job per submission so the unique key can be created on existing databases.
+DELETE FROM jobs
+WHERE rowid NOT IN (
+    SELECT MAX(rowid) FROM jobs GROUP BY email, task, round, nonce
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_submission ON jobs (email, task, round, nonce);
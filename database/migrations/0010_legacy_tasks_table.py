@@ -0,0 +1,50 @@
+"""
+Rebuilds a tasks table created before migrations existed, by the original schema.sql (no id,
+repo_url, commit_sha or pages_url) or init_db (created_at instead of timestamp). 0001 leaves such a
+table untouched, so the repo upsert after a deployment fails on it. Rows are kept in order and the
+indexes from 0002 are recreated.
+"""
+
+CREATE_TASKS = """
+CREATE TABLE tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    email TEXT,
+    task TEXT,
+    round INTEGER,
+    nonce TEXT,
+    brief TEXT,
+    attachments TEXT,
+    checks TEXT,
+    evaluation_url TEXT,
+    endpoint TEXT,
+    statuscode INTEGER,
+    secret TEXT,
+    repo_url TEXT,
+    commit_sha TEXT,
+    pages_url TEXT
+)
+"""
+COLUMNS = ["id", "timestamp", "email", "task", "round", "nonce", "brief", "attachments", "checks",
+           "evaluation_url", "endpoint", "statuscode", "secret", "repo_url", "commit_sha", "pages_url"]
+INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_tasks_submission ON tasks (email, task, round, nonce)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_email_round ON tasks (email, round)",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_task_round ON tasks (task, round)",
+]
+
+def upgrade(conn):
+    existing = [row[1] for row in conn.execute("PRAGMA table_info(tasks)")]
+    if all(name in existing for name in COLUMNS):
+        return
+    targets = [name for name in COLUMNS if name in existing]
+    sources = list(targets)
+    if "timestamp" not in existing and "created_at" in existing:
+        targets.append("timestamp")
+        sources.append("created_at")
+    conn.execute("ALTER TABLE tasks RENAME TO tasks_legacy")
+    conn.execute(CREATE_TASKS)
+    conn.execute(f"INSERT INTO tasks ({', '.join(targets)}) SELECT {', '.join(sources)} FROM tasks_legacy ORDER BY rowid")
+    conn.execute("DROP TABLE tasks_legacy")
+    for index in INDEXES:
+        conn.execute(index)
@@ -0,0 +1,7 @@
+-- Results are memoized per (repo_url, commit_sha, task, round, check_name, check_version, check_hash),
+-- where check_hash identifies the check's definition (the js: checks of the Playwright test).
+-- Earlier Playwright results have no hash and are therefore re-evaluated once.
+ALTER TABLE results ADD COLUMN check_hash TEXT;
+
+DROP INDEX IF EXISTS idx_results_check_cache;
+CREATE INDEX IF NOT EXISTS idx_results_check_cache ON results (repo_url, commit_sha, task, round, check_name, check_version);
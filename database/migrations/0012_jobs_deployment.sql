@@ -0,0 +1,4 @@
+-- The pushed commit of a job in the deploy stage, so its Pages deployment is followed again after a restart.
+ALTER TABLE jobs ADD COLUMN repo_url TEXT;
+ALTER TABLE jobs ADD COLUMN commit_sha TEXT;
+ALTER TABLE jobs ADD COLUMN pages_url TEXT;
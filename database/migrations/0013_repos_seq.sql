@@ -0,0 +1,24 @@
+-- The evaluation scheduler polls repos in seq order. seq is taken from a counter on every insert
+-- and every change to a submission, so it only ever increases, unlike the second-resolution timestamp.
+CREATE TABLE IF NOT EXISTS repos_seq (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    value INTEGER NOT NULL
+);
+
+ALTER TABLE repos ADD COLUMN seq INTEGER;
+UPDATE repos SET seq = rowid;
+INSERT INTO repos_seq (id, value) VALUES (1, (SELECT COALESCE(MAX(rowid), 0) FROM repos));
+
+CREATE TRIGGER IF NOT EXISTS repos_seq_insert AFTER INSERT ON repos
+BEGIN
+    UPDATE repos_seq SET value = value + 1 WHERE id = 1;
+    UPDATE repos SET seq = (SELECT value FROM repos_seq WHERE id = 1) WHERE rowid = NEW.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS repos_seq_update AFTER UPDATE OF email, task, round, nonce, repo_url, commit_sha, pages_url ON repos
+BEGIN
+    UPDATE repos_seq SET value = value + 1 WHERE id = 1;
+    UPDATE repos SET seq = (SELECT value FROM repos_seq WHERE id = 1) WHERE rowid = NEW.rowid;
+END;
+
+CREATE INDEX IF NOT EXISTS idx_repos_seq ON repos (seq);
@@ -0,0 +1,94 @@
+import os
+import json
+
+JS_PREFIX = "js:"
+# Upper bound on how long a page may take to satisfy its checks. Checks are re-run as the DOM
+# changes, so a page that is ready returns as soon as every check passes.
+CHECK_TIMEOUT_MS = int(os.getenv("EVAL_CHECK_TIMEOUT_MS", "10000"))
+
+# Runs every check in the page in one round trip. Each expression is evaluated (awaiting promises),
+# and failing ones are re-evaluated on DOM mutations and on the load event until all pass or the
+# timeout expires. Returns, per check, whether it passed, the last error and the milliseconds from
+# the start of evaluation until it passed.
+RUN_CHECKS_JS = """
+async ({expressions, timeout}) => {
+    const start = performance.now();
+    const results = expressions.map(() => ({passed: false, error: null, ms: null}));
+    const compiled = expressions.map((expression) => {
+        try {
+            return new Function(`return (${expression});`);
+        } catch (e) {
+            return () => { throw e; };
+        }
+    });
+    const runPending = async () => {
+        await Promise.all(compiled.map(async (check, i) => {
+            if (results[i].passed) return;
+            try {
+                results[i].passed = !!(await check());
+                results[i].error = null;
+            } catch (e) {
+                results[i].error = String(e && e.message || e);
+            }
+            if (results[i].passed) results[i].ms = performance.now() - start;
+        }));
+        return results.every((result) => result.passed);
+    };
+    if (await runPending()) return results;
+    await new Promise((resolve) => {
+        let scheduled = false;
+        let finished = false;
+        const finish = () => {
+            if (finished) return;
+            finished = true;
+            observer.disconnect();
+            window.removeEventListener("load", schedule);
+            clearTimeout(timer);
+            resolve();
+        };
+        const schedule = () => {
+            if (scheduled || finished) return;
+            scheduled = true;
+            setTimeout(async () => {
+                scheduled = false;
+                if (!finished && await runPending()) finish();
+            }, 0);
+        };
+        const observer = new MutationObserver(schedule);
+        observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+        window.addEventListener("load", schedule);
+        const timer = setTimeout(async () => { await runPending(); finish(); }, timeout);
+    });
+    return results;
+}
+"""
+
+def parse_checks(checks: list[str]) -> list[str]:
+    """Returns the JavaScript expressions of the `js:` checks, in order and without duplicates."""
+    expressions = []
+    for check in checks:
+        if isinstance(check, str) and check.strip().lower().startswith(JS_PREFIX):
+            expression = check.strip()[len(JS_PREFIX):].strip()
+            if expression and expression not in expressions:
+                expressions.append(expression)
+    return expressions
+
+async def run_js_checks(page, expressions: list[str], timeout_ms: int = CHECK_TIMEOUT_MS) -> list[dict]:
+    """Evaluates every expression on the page in a single page.evaluate call."""
+    if not expressions:
+        return []
+    results = await page.evaluate(RUN_CHECKS_JS, {"expressions": expressions, "timeout": timeout_ms})
+    return [
+        {"check": expression, "passed": result["passed"], "error": result["error"],
+         "ms": round(result["ms"], 1) if result["ms"] is not None else None}
+        for expression, result in zip(expressions, results)
+    ]
+
+def summarize(results: list[dict]) -> tuple[int, str, str]:
+    """Turns check results into a (score, reason, logs) result row. The score is 1 only if every check passed."""
+    passed = sum(1 for result in results if result["passed"])
+    failed = [result["check"] for result in results if not result["passed"]]
+    reason = f"{passed}/{len(results)} checks passed"
+    if failed:
+        reason += f"; failed: {', '.join(failed)}"
+    return int(passed == len(results)), reason, json.dumps(results)
@@ -0,0 +1,140 @@
+import os
+import json
+import random
+import asyncio
+import logging
+from typing import Callable, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from database.db_utils import executemany
+
+DISPATCH_CONCURRENCY = int(os.getenv("DISPATCH_CONCURRENCY", "64"))
+DISPATCH_PER_HOST = int(os.getenv("DISPATCH_PER_HOST", "8"))
+DISPATCH_TIMEOUT = float(os.getenv("DISPATCH_TIMEOUT", "30"))
+DISPATCH_MAX_ATTEMPTS = int(os.getenv("DISPATCH_MAX_ATTEMPTS", "3"))
+DISPATCH_BACKOFF_BASE = float(os.getenv("DISPATCH_BACKOFF_BASE", "0.5"))
+DISPATCH_BACKOFF_MAX = 30.0
+TASK_BATCH_SIZE = 100
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+TASK_UPSERT = (
+    "INSERT INTO tasks (email, task, round, nonce, brief, attachments, checks, evaluation_url, endpoint, statuscode, secret) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(email, task, round, nonce) DO UPDATE SET endpoint=excluded.endpoint, statuscode=excluded.statuscode"
+)
+
+logger = logging.getLogger(__name__)
+
+def task_row(endpoint: str, payload: dict, status: int) -> tuple:
+    return (payload["email"], payload["task"], payload["round"], payload["nonce"], payload["brief"], json.dumps(payload["attachments"]),
+            json.dumps(payload["checks"]), payload["evaluation_url"], endpoint, status, payload["secret"])
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Exponential backoff with full jitter, or the server's Retry-After if it sent one."""
+    if response is not None and response.headers.get("Retry-After", "").isdigit():
+        return min(DISPATCH_BACKOFF_MAX, float(response.headers["Retry-After"]))
+    return random.uniform(0, min(DISPATCH_BACKOFF_MAX, DISPATCH_BACKOFF_BASE * 2 ** attempt))
+
+class Dispatcher:
+    """
+    Sends task payloads to student endpoints concurrently over one pooled HTTP client.
+    At most `concurrency` requests are in flight overall and `per_host` per endpoint host, so one
+    slow student only holds up their own requests. Connection errors, timeouts, 429 and 5xx
+    responses are retried with jittered backoff. Every outcome is written to the tasks table in
+    batched transactions; a task that could not be delivered is recorded with status 0.
+    on_flush(payloads), if given, is called after each batch is written.
+    """
+
+    def __init__(self, concurrency: int = DISPATCH_CONCURRENCY, per_host: int = DISPATCH_PER_HOST,
+                 timeout: float = DISPATCH_TIMEOUT, max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+                 batch_size: int = TASK_BATCH_SIZE, on_flush: Callable[[list[dict]], None] = None):
+        self._concurrency = concurrency
+        self._per_host = per_host
+        self._timeout = timeout
+        self._max_attempts = max_attempts
+        self._batch_size = batch_size
+        self._on_flush = on_flush
+        self._hosts = {}
+        self._rows = []
+        self._payloads = []
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _host_slots(self, endpoint: str) -> asyncio.Semaphore:
+        host = urlsplit(endpoint).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self._per_host)
+        return self._hosts[host]
+
+    def _record(self, endpoint: str, payload: dict, status: int):
+        self._rows.append(task_row(endpoint, payload, status))
+        self._payloads.append(payload)
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the recorded tasks in a single transaction."""
+        if self._rows:
+            rows, self._rows = self._rows, []
+            payloads, self._payloads = self._payloads, []
+            executemany(TASK_UPSERT, rows)
+            if self._on_flush:
+                self._on_flush(payloads)
+
+    async def _post(self, client: httpx.AsyncClient, endpoint: str, payload: dict) -> int:
+        for attempt in range(self._max_attempts):
+            response = None
+            try:
+                response = await client.post(endpoint, json=payload)
+                if response.status_code not in RETRY_STATUSES:
+                    return response.status_code
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+            if attempt < self._max_attempts - 1:
+                self.retries += 1
+                logger.warning(f"Retrying task for {payload['email']} at {endpoint} after attempt {attempt + 1}: {error}")
+                await asyncio.sleep(retry_delay(attempt, response))
+        logger.error(f"Failed to send task to {payload['email']}: {error}")
+        return response.status_code if response is not None else 0
+
+    async def _send(self, client: httpx.AsyncClient, slots: asyncio.Semaphore, endpoint: str, payload: dict):
+        # The host slot is taken first, so requests queued behind a slow host do not hold global slots.
+        async with self._host_slots(endpoint), slots:
+            status = await self._post(client, endpoint, payload)
+        if status in (200, 202):
+            self.sent += 1
+        else:
+            self.failed += 1
+        self._record(endpoint, payload, status)
+        logger.info(f"Task {payload['task']} round {payload['round']} for {payload['email']} logged to database with status {status}.")
+
+    async def run(self, items: Iterable[tuple[str, dict]]):
+        """
+        Sends every (endpoint, payload) and records the results. Items are consumed lazily, with a
+        bounded number of sends outstanding, so the input can be a generator over a large cohort.
+        """
+        slots = asyncio.Semaphore(self._concurrency)
+        outstanding = asyncio.Semaphore(self._concurrency * 4)
+        limits = httpx.Limits(max_connections=self._concurrency, max_keepalive_connections=self._concurrency)
+        tasks = set()
+        async with httpx.AsyncClient(timeout=self._timeout, limits=limits) as client:
+            try:
+                for endpoint, payload in items:
+                    await outstanding.acquire()
+                    task = asyncio.create_task(self._send(client, slots, endpoint, payload))
+                    tasks.add(task)
+                    task.add_done_callback(lambda t: (tasks.discard(t), outstanding.release()))
+                if tasks:
+                    await asyncio.gather(*tasks)
+            finally:
+                self.flush()
+
+def dispatch(items: Iterable[tuple[str, dict]], **options) -> Dispatcher:
+    """Sends every (endpoint, payload) with a new Dispatcher and returns it for its counters."""
+    dispatcher = Dispatcher(**options)
+    asyncio.run(dispatcher.run(items))
+    logger.info(f"Dispatched {dispatcher.sent + dispatcher.failed} tasks: {dispatcher.sent} accepted, {dispatcher.failed} failed, {dispatcher.retries} retries.")
+    return dispatcher
@@ -1,84 +1,367 @@
 import os
-import subprocess
 import json
+import time
+import hashlib
+import asyncio
 import logging
-from database.db_utils import fetchall, execute, init_db
-from playwright.sync_api import sync_playwright
+import argparse
+from collections import defaultdict
+from contextlib import contextmanager, asynccontextmanager
+import httpx
+from database.db_utils import fetchall, fetchone, executemany, init_db
+from evaluation_scripts.repo_cache import RepoCache
+from evaluation_scripts.static_server import StaticServerPool
+from evaluation_scripts.checks import parse_checks, run_js_checks, summarize
+from evaluation_scripts.templates import template_for, render_round
+from playwright.async_api import async_playwright
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_playwright_test(pages_url: str, task_template: dict) -> tuple[int, str, str]:
-    """Runs a Playwright test based on the task template."""
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-            page.goto(pages_url, wait_until="networkidle")
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "8"))
+BROWSER_CONTEXTS = int(os.getenv("EVAL_BROWSER_CONTEXTS", "4"))
+RESULT_BATCH_SIZE = 50
+
+RESULT_INSERT = (
+    "INSERT INTO results (email, task, round, repo_url, commit_sha, pages_url, check_name, check_version, check_hash, score, reason, logs) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Bump a check's version whenever its logic changes so cached results for it are re-evaluated.
+CHECK_VERSIONS = {
+    "MIT LICENSE": 1,
+    "Professional README": 1,
+    "Playwright Test": 2,
+    "Pages Deployment": 1,
+}
+DEFAULT_CHECKS = ["MIT LICENSE", "Professional README", "Playwright Test"]
+# When pages are served from the local checkout, the live site is only checked for being deployed.
+LOCAL_CHECKS = DEFAULT_CHECKS + ["Pages Deployment"]
+DEPLOYMENT_TIMEOUT = 15
+# Checks that depend on the live site. Their failures may be transient (Pages not built yet), so a
+# failed result is only reused for this many seconds.
+LIVE_CHECKS = {"Playwright Test", "Pages Deployment"}
+EVAL_RETRY_FAILED_AFTER = float(os.getenv("EVAL_RETRY_FAILED_AFTER", "600"))
+
+class StageTimer:
+    """Accumulates the time spent in each evaluation stage across all repos."""
 
-            # Example check from template
-            check = task_template["checks"][-1] # "Page displays solved captcha text within 15 seconds"
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.cached = 0
 
-            # This is a placeholder for a more robust solution
-            # that would dynamically generate test code.
-            page.wait_for_selector("text=/Solved Captcha Text/i", timeout=15000)
+    @contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[stage] += time.perf_counter() - start
+            self.counts[stage] += 1
+
+    def report(self, wall_clock: float, repo_count: int):
+        logger.info(f"Evaluated {repo_count} repos in {wall_clock:.2f}s wall-clock ({self.cached} checks reused from cache)")
+        for stage, total in self.totals.items():
+            count = self.counts[stage]
+            logger.info(f"  {stage:<12} total {total:8.2f}s  mean {total / count:6.2f}s  ({count} runs)")
+
+class BrowserPool:
+    """
+    A single long-lived Chromium shared by all workers.
+    At most `size` browser contexts are open at once; each check gets a fresh context so
+    cookies and storage never leak between submissions.
+    """
+
+    def __init__(self, size: int = BROWSER_CONTEXTS):
+        self._size = size
+        self._playwright = None
+        self._browser = None
+        self._semaphore = None
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self._size)
+        self._playwright = await async_playwright().start()
+        self._browser = await self._playwright.chromium.launch()
+
+    async def close(self):
+        if self._browser:
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            context = await self._browser.new_context()
+            try:
+                yield await context.new_page()
+            finally:
+                await context.close()
+
+class ResultWriter:
+    """
+    Buffers result rows and writes them with executemany in batches.
+    If given a result cache, every added result is recorded in it.
+    """
 
-            browser.close()
-            return 1, "Playwright test passed.", ""
+    def __init__(self, batch_size: int = RESULT_BATCH_SIZE, cached: dict = None):
+        self._batch_size = batch_size
+        self._cached = cached
+        self._rows = []
+        self.written = 0
+
+    def add(self, repo: dict, check_name: str, score: int, reason: str, logs: str = None, definition: str = ""):
+        self._rows.append((repo["email"], repo["task"], repo["round"], repo["repo_url"], repo["commit_sha"], repo["pages_url"],
+                           check_name, CHECK_VERSIONS[check_name], definition, score, reason, logs))
+        if self._cached is not None:
+            key = result_key(repo, check_name, definition)
+            self._cached[key] = max(self._cached.get(key, 0), reuse_until(check_name, score, time.time()))
+        if len(self._rows) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            self.written += executemany(RESULT_INSERT, self._rows)
+            self._rows = []
+
+def check_license(folder: str) -> tuple[int, str]:
+    license_path = os.path.join(folder, "LICENSE")
+    return (1, "MIT license found") if os.path.exists(license_path) else (0, "MIT license missing")
+
+def check_readme(folder: str) -> tuple[int, str]:
+    readme_path = os.path.join(folder, "README.md")
+    if not os.path.exists(readme_path):
+        return 0, "README.md missing"
+    with open(readme_path, "r") as f:
+        content = f.read()
+    return (1, "README is professional") if len(content) > 100 else (0, "README is too short")
+
+async def run_playwright_test(page, pages_url: str, task_template: dict, timer: StageTimer = None) -> tuple[int, str, str]:
+    """
+    Loads the page and runs the `js:` checks of the task template in a single round trip.
+    Checks are re-evaluated as the page changes instead of waiting a fixed time; the logs hold
+    per-check results and timings.
+    """
+    timer = timer or StageTimer()
+    expressions = parse_checks(task_template.get("checks", []))
+    try:
+        with timer.measure("page-load"):
+            await page.goto(pages_url, wait_until="load")
+        if not expressions:
+            return 1, "Page loaded; no js: checks defined.", ""
+        with timer.measure("js-checks"):
+            results = await run_js_checks(page, expressions)
+        return summarize(results)
     except Exception as e:
         return 0, "Playwright test failed.", str(e)
 
-def main():
+async def check_deployment(http: httpx.AsyncClient, pages_url: str) -> tuple[int, str]:
+    """Checks that the GitHub Pages site answers with a successful response."""
+    try:
+        response = await http.get(pages_url)
+    except httpx.HTTPError as e:
+        return 0, f"Pages site unreachable: {e}"
+    if response.is_success:
+        return 1, f"Pages site is live (HTTP {response.status_code})"
+    return 0, f"Pages site returned HTTP {response.status_code}"
+
+def result_key(repo: dict, check_name: str, definition: str = "") -> tuple:
+    """The memo key of a check result: the submission's commit, task and round, and the check's version and definition."""
+    return repo["repo_url"], repo["commit_sha"], repo["task"], repo["round"], check_name, CHECK_VERSIONS[check_name], definition
+
+def reuse_until(check_name: str, score: int, evaluated_at: float) -> float:
+    """Until when a result may be reused: forever, except for failed live-site checks."""
+    if score or check_name not in LIVE_CHECKS:
+        return float("inf")
+    return evaluated_at + EVAL_RETRY_FAILED_AFTER
+
+def playwright_definition(task_checks: list[str], serve_local: bool) -> str:
+    """A hash of the js: checks and of where the page is loaded from, so changed checks are re-run."""
+    return hashlib.sha256(json.dumps([parse_checks(task_checks), serve_local]).encode()).hexdigest()[:16]
+
+def load_cached_results() -> dict:
+    """Maps the result_key of every versioned result to the time until which it may be reused."""
+    rows = fetchall(
+        "SELECT repo_url, commit_sha, task, round, check_name, check_version, COALESCE(check_hash, '') AS check_hash, "
+        "MAX(score) AS score, MAX(CAST(strftime('%s', timestamp) AS INTEGER)) AS evaluated_at "
+        "FROM results WHERE check_version IS NOT NULL "
+        "GROUP BY repo_url, commit_sha, task, round, check_name, check_version, COALESCE(check_hash, '')"
+    )
+    return {
+        (row["repo_url"], row["commit_sha"], row["task"], row["round"], row["check_name"], row["check_version"], row["check_hash"]):
+            reuse_until(row["check_name"], row["score"], row["evaluated_at"] or 0)
+        for row in rows
+    }
+
+def pending_checks(repo: dict, cached: dict, force: bool = False, names: list[str] = DEFAULT_CHECKS, definitions: dict = None) -> list[str]:
+    """Returns the names of the checks that still need to run for the repo's submission."""
+    definitions = definitions or {}
+    now = time.time()
+    return [
+        name for name in names
+        if force or cached.get(result_key(repo, name, definitions.get(name, "")), 0) <= now
+    ]
+
+def checks_for(repo: dict, checks: dict) -> list[str]:
+    """The checks of the repo's task, followed by the checks rendered from its task template."""
+    task_checks = list(checks.get((repo["task"], repo["round"]), []))
+    template = template_for(repo["task"])
+    rendered = template and render_round(template, repo["email"], repo["task"], repo["round"])
+    return task_checks + (rendered["checks"] if rendered else [])
+
+def load_checks() -> dict:
+    """Loads the checks of every task, keyed by (task, round), in a single query."""
+    checks = {}
+    for row in fetchall("SELECT task, round, checks FROM tasks"):
+        checks[(row["task"], row["round"])] = json.loads(row["checks"] or "[]")
+    return checks
+
+async def evaluate_repo(repo: dict, checks: dict, browsers: BrowserPool, repos: RepoCache, writer: ResultWriter, timer: StageTimer, pending: list[str],
+                        servers: StaticServerPool = None, http: httpx.AsyncClient = None):
+    """
+    Checks out one repo from the cache, runs its pending checks and queues the results.
+    With static servers the Playwright test runs against the local checkout instead of pages_url.
     """
-    Fetches repos, clones them, and evaluates them based on the checks.
+    logger.info(f"Evaluating repo: {repo['repo_url']} ({', '.join(pending)})")
+    file_checks = [name for name in ("MIT LICENSE", "Professional README") if name in pending]
+    checkout = None
+    if file_checks or (servers and "Playwright Test" in pending):
+        with timer.measure("fetch"):
+            try:
+                checkout = await repos.checkout(repo)
+            except RuntimeError as e:
+                logger.error(f"Skipping {repo['repo_url']}: {e}")
+                return
+
+        with timer.measure("files"):
+            if "MIT LICENSE" in file_checks:
+                writer.add(repo, "MIT LICENSE", *check_license(checkout))
+            if "Professional README" in file_checks:
+                writer.add(repo, "Professional README", *check_readme(checkout))
+
+    if "Playwright Test" in pending:
+        task_template = {"checks": checks_for(repo, checks)}
+        definition = playwright_definition(task_template["checks"], servers is not None)
+        with timer.measure("playwright"):
+            if servers:
+                async with servers.serve(checkout) as local_url, browsers.page() as page:
+                    score, reason, logs = await run_playwright_test(page, local_url, task_template, timer)
+            else:
+                async with browsers.page() as page:
+                    score, reason, logs = await run_playwright_test(page, repo["pages_url"], task_template, timer)
+        writer.add(repo, "Playwright Test", score, reason, logs, definition)
+
+    if "Pages Deployment" in pending:
+        with timer.measure("deployment"):
+            writer.add(repo, "Pages Deployment", *await check_deployment(http, repo["pages_url"]))
+
+class Evaluator:
     """
+    The state shared by every repo of an evaluation run: the browser, the repo cache, the local
+    static servers, the task checks and the result cache. evaluate_all uses one for a batch; the
+    scheduler keeps one open and evaluates repos as they arrive.
+    """
+
+    def __init__(self, workers: int = EVAL_WORKERS, browsers: BrowserPool = None, repo_cache: RepoCache = None,
+                 force: bool = False, serve_local: bool = False):
+        self.timer = StageTimer()
+        self.checks = load_checks()
+        self.cached = load_cached_results()
+        self.writer = ResultWriter(cached=self.cached)
+        self.browsers = browsers or BrowserPool()
+        self.repo_cache = repo_cache or RepoCache()
+        self.force = force
+        self.serve_local = serve_local
+        self.names = LOCAL_CHECKS if serve_local else DEFAULT_CHECKS
+        self.servers = StaticServerPool(workers) if serve_local else None
+        self.http = None
+
+    def _load_task_checks(self, repo: dict):
+        """Loads the checks of a task sent after the run started."""
+        if (repo["task"], repo["round"]) not in self.checks:
+            row = fetchone("SELECT checks FROM tasks WHERE task=? AND round=? ORDER BY id DESC LIMIT 1", (repo["task"], repo["round"]))
+            self.checks[(repo["task"], repo["round"])] = json.loads(row["checks"] or "[]") if row else []
+
+    def pending(self, repo: dict) -> list[str]:
+        """Returns the checks that still need to run for the repo's submission."""
+        self._load_task_checks(repo)
+        definitions = {"Playwright Test": playwright_definition(checks_for(repo, self.checks), self.serve_local)}
+        return pending_checks(repo, self.cached, self.force, self.names, definitions)
+
+    async def start(self):
+        await self.browsers.start()
+        if self.servers:
+            self.servers.start()
+            self.http = httpx.AsyncClient(timeout=DEPLOYMENT_TIMEOUT, follow_redirects=True)
+
+    async def close(self):
+        self.writer.flush()
+        await self.browsers.close()
+        if self.servers:
+            self.servers.close()
+            await self.http.aclose()
+
+    def flush(self):
+        self.writer.flush()
+
+    async def evaluate(self, repo: dict, pending: list[str] = None):
+        """Runs the pending checks of one repo."""
+        pending = self.pending(repo) if pending is None else pending
+        if not pending:
+            return
+        self._load_task_checks(repo)
+        await evaluate_repo(repo, self.checks, self.browsers, self.repo_cache, self.writer, self.timer, pending, self.servers, self.http)
+
+async def evaluate_all(repos: list[dict], workers: int = EVAL_WORKERS, browsers: BrowserPool = None, repo_cache: RepoCache = None,
+                       force: bool = False, serve_local: bool = False) -> StageTimer:
+    """
+    Evaluates repos concurrently with at most `workers` repos in flight.
+    Checks that already have a result for the repo's commit and the current check version are
+    skipped unless `force` is set. With `serve_local`, pages are loaded from the cached checkout
+    through one local static server per worker, and pages_url is only used to check that the
+    site is deployed.
+    """
+    evaluator = Evaluator(workers, browsers, repo_cache, force, serve_local)
+    limit = asyncio.Semaphore(workers)
+
+    work = []
+    for repo in repos:
+        pending = evaluator.pending(repo)
+        evaluator.timer.cached += len(evaluator.names) - len(pending)
+        if pending:
+            work.append((repo, pending))
+    if not work:
+        return evaluator.timer
+
+    async def bounded(repo, pending):
+        async with limit:
+            await evaluator.evaluate(repo, pending)
+
+    await evaluator.start()
+    try:
+        await asyncio.gather(*(bounded(repo, pending) for repo, pending in work))
+    finally:
+        await evaluator.close()
+    return evaluator.timer
+
+def main(argv=None):
+    """
+    Fetches repos, checks them out from the repo cache, and evaluates them based on the checks.
+    """
+    parser = argparse.ArgumentParser(description="Evaluate submitted repositories.")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="Number of repos evaluated concurrently.")
+    parser.add_argument("--contexts", type=int, default=BROWSER_CONTEXTS, help="Number of concurrent browser contexts.")
+    parser.add_argument("--force", action="store_true", help="Re-run checks even if a result exists for the commit.")
+    parser.add_argument("--serve-local", action="store_true", help="Load pages from the local checkout instead of GitHub Pages.")
+    args = parser.parse_args(argv)
+
     init_db()
     repos = fetchall("SELECT * FROM repos")
 
-    for repo in repos:
-        repo_url = repo["repo_url"]
-        task_name = repo["task"]
-        email = repo["email"]
-        round_num = repo["round"]
-        pages_url = repo["pages_url"]
-        commit_sha = repo["commit_sha"]
-
-        logger.info(f"Evaluating repo: {repo_url}")
-
-        # Clone repo
-        folder = f"temp/{task_name}"
-        if os.path.exists(folder):
-            subprocess.run(["rm", "-rf", folder])
-        os.makedirs(folder, exist_ok=True)
-        subprocess.run(["git", "clone", repo_url, folder], check=True)
-
-        # 1. Check for MIT LICENSE
-        license_path = os.path.join(folder, "LICENSE")
-        score, reason = (1, "MIT license found") if os.path.exists(license_path) else (0, "MIT license missing")
-        execute("INSERT INTO results (email, task, round, repo_url, commit_sha, pages_url, check_name, score, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (email, task_name, round_num, repo_url, commit_sha, pages_url, "MIT LICENSE", score, reason))
-
-        # 2. Check for professional README.md
-        readme_path = os.path.join(folder, "README.md")
-        if os.path.exists(readme_path):
-            with open(readme_path, "r") as f:
-                content = f.read()
-            score, reason = (1, "README is professional") if len(content) > 100 else (0, "README is too short")
-        else:
-            score, reason = (0, "README.md missing")
-        execute("INSERT INTO results (email, task, round, repo_url, commit_sha, pages_url, check_name, score, reason) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (email, task_name, round_num, repo_url, commit_sha, pages_url, "Professional README", score, reason))
-
-        # 3. Run Playwright tests
-        task_info = fetchall("SELECT * FROM tasks WHERE task=? AND round=?", (task_name, round_num))[0]
-        task_template = {"checks": json.loads(task_info["checks"])} # Recreate a template-like object
-
-        score, reason, logs = run_playwright_test(pages_url, task_template)
-        execute("INSERT INTO results (email, task, round, repo_url, commit_sha, pages_url, check_name, score, reason, logs) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (email, task_name, round_num, repo_url, commit_sha, pages_url, "Playwright Test", score, reason, logs))
-
-        # Clean up
-        subprocess.run(["rm", "-rf", folder])
+    start = time.perf_counter()
+    timer = asyncio.run(evaluate_all(repos, workers=args.workers, browsers=BrowserPool(args.contexts), force=args.force, serve_local=args.serve_local))
+    timer.report(time.perf_counter() - start, len(repos))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,159 @@
+import os
+import asyncio
+import logging
+import sqlite3
+from typing import Callable, Optional
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from database.db_utils import init_db, transaction
+from evaluation_scripts.scheduler import Scheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RECEIVER_BATCH_SIZE = int(os.getenv("RECEIVER_BATCH_SIZE", "500"))
+EVAL_SERVE_LOCAL = os.getenv("EVAL_SERVE_LOCAL", "0") == "1"
+
+TASK_EXISTS = "SELECT 1 FROM tasks WHERE email=? AND task=? AND round=? AND nonce=?"
+REPO_UPSERT = (
+    "INSERT INTO repos (email, task, round, nonce, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT(email, task, round, nonce) DO UPDATE SET repo_url=excluded.repo_url, commit_sha=excluded.commit_sha, "
+    "pages_url=excluded.pages_url, timestamp=CURRENT_TIMESTAMP"
+)
+
+class EvaluationCallback(BaseModel):
+    email: str
+    task: str
+    round: int
+    nonce: str
+    repo_url: str
+    commit_sha: str
+    pages_url: str
+
+def write_repos(repos: list[dict]) -> Optional[list[bool]]:
+    """
+    Upserts every repo whose (email, task, round, nonce) matches a sent task, in one transaction.
+    Returns whether each repo was accepted, or None if the transaction failed.
+    """
+    try:
+        with transaction() as conn:
+            accepted = [
+                conn.execute(TASK_EXISTS, (repo["email"], repo["task"], repo["round"], repo["nonce"])).fetchone() is not None
+                for repo in repos
+            ]
+            conn.executemany(REPO_UPSERT, [
+                (repo["email"], repo["task"], repo["round"], repo["nonce"], repo["repo_url"], repo["commit_sha"], repo["pages_url"])
+                for repo, ok in zip(repos, accepted) if ok
+            ])
+        return accepted
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+class RepoWriter:
+    """
+    Group-commits evaluation callbacks to the repos table.
+    Callbacks that arrive while a batch is being written are written together in the next
+    transaction, so a burst costs one commit per batch instead of one per callback, and a lone
+    callback is written without waiting. on_commit(repos) is called with the accepted repos.
+    """
+
+    def __init__(self, on_commit: Callable[[list[dict]], None] = None, batch_size: int = RECEIVER_BATCH_SIZE):
+        self._on_commit = on_commit
+        self._batch_size = batch_size
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(self, repo: dict) -> bool:
+        """Queues a repo for the next batch and returns whether it matched a task once committed."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((repo, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._write(batch)
+            except Exception as e:
+                # One bad batch must not stop the writer; its callers get an error instead of waiting forever.
+                logger.error(f"Error writing a batch of {len(batch)} repos: {e}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Could not record the repo"))
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]):
+        repos = [repo for repo, _ in batch]
+        accepted = await asyncio.to_thread(write_repos, repos)
+        self.batches += 1
+        if accepted is None:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Could not record the repo"))
+            return
+        # A caller that disconnected has cancelled its future; the repo is recorded all the same.
+        for (_, future), ok in zip(batch, accepted):
+            if not future.done():
+                future.set_result(ok)
+        committed = [repo for repo, ok in zip(repos, accepted) if ok]
+        self.accepted += len(committed)
+        self.rejected += len(repos) - len(committed)
+        if committed and self._on_commit:
+            self._on_commit(committed)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "accepted": self.accepted, "rejected": self.rejected, "pending": self._queue.qsize() if self._queue else 0}
+
+app = FastAPI()
+scheduler = Scheduler(serve_local=EVAL_SERVE_LOCAL)
+repo_writer = RepoWriter(on_commit=lambda repos: scheduler.put(repos))
+
+@app.on_event("startup")
+async def startup_event():
+    """Initializes the database and starts the repo writer and the evaluation scheduler."""
+    init_db()
+    await scheduler.start()
+    repo_writer.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stops the repo writer and the evaluation scheduler."""
+    await repo_writer.stop()
+    await scheduler.stop()
+
+@app.post("/evaluation")
+async def receive_evaluation(callback: EvaluationCallback):
+    """
+    Records the repo of a submission and hands it to the evaluation scheduler.
+    Returns 400 if no task was sent with the callback's (email, task, round, nonce).
+    """
+    try:
+        accepted = await repo_writer.submit(callback.model_dump())
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not accepted:
+        raise HTTPException(status_code=400, detail="Unknown task or nonce")
+    logger.info(f"Recorded {callback.repo_url} at {callback.commit_sha} for {callback.email} ({callback.task} round {callback.round})")
+    return {"status": "received"}
+
+@app.get("/metrics")
+def metrics():
+    """Exposes the receiver and evaluation scheduler counters."""
+    return {"repos": repo_writer.stats(), "evaluation": scheduler.stats()}
@@ -0,0 +1,88 @@
+import os
+import re
+import asyncio
+import shutil
+import hashlib
+import logging
+from collections import defaultdict
+
+REPO_CACHE_DIR = os.getenv("REPO_CACHE_DIR", os.path.join("temp", "repo-cache"))
+
+logger = logging.getLogger(__name__)
+
+async def git(*args: str, cwd: str = None) -> str:
+    """Runs a git command without blocking the event loop and returns its stdout."""
+    proc = await asyncio.create_subprocess_exec(
+        "git", *args, cwd=cwd,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {stderr.decode().strip()}")
+    return stdout.decode().strip()
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", str(value)).strip("-")
+
+class RepoCache:
+    """
+    Keeps one bare mirror per repo URL and one worktree per (email, task, round).
+    Commits already present in a mirror are never fetched again, and a worktree that is
+    already at the requested commit is reused as-is.
+    """
+
+    def __init__(self, root: str = REPO_CACHE_DIR):
+        self.root = os.path.abspath(root)
+        self.fetches = 0
+        self._locks = defaultdict(asyncio.Lock)
+
+    def mirror_path(self, repo_url: str) -> str:
+        digest = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+        return os.path.join(self.root, "mirrors", f"{digest}.git")
+
+    def worktree_path(self, email: str, task: str, round_num: int) -> str:
+        return os.path.join(self.root, "worktrees", f"{_slug(email)}--{_slug(task)}--{round_num}")
+
+    async def _has_commit(self, mirror: str, commit_sha: str) -> bool:
+        try:
+            await git("--git-dir", mirror, "cat-file", "-e", f"{commit_sha}^{{commit}}")
+            return True
+        except RuntimeError:
+            return False
+
+    async def _fetch(self, mirror: str, repo_url: str, commit_sha: str) -> str:
+        """Shallow-fetches commit_sha (or the default branch if it cannot be fetched directly)."""
+        if not os.path.exists(mirror):
+            await git("init", "--quiet", "--bare", mirror)
+            await git("--git-dir", mirror, "remote", "add", "origin", repo_url)
+
+        if commit_sha and await self._has_commit(mirror, commit_sha):
+            return commit_sha
+
+        self.fetches += 1
+        if commit_sha:
+            try:
+                await git("--git-dir", mirror, "fetch", "--quiet", "--depth", "1", "origin", commit_sha)
+                return commit_sha
+            except RuntimeError as e:
+                logger.warning(f"Could not fetch {commit_sha} from {repo_url}, falling back to the default branch: {e}")
+        await git("--git-dir", mirror, "fetch", "--quiet", "--depth", "1", "origin", "HEAD")
+        return await git("--git-dir", mirror, "rev-parse", "FETCH_HEAD")
+
+    async def checkout(self, repo: dict) -> str:
+        """Makes the submission's commit available in its worktree and returns the worktree path."""
+        mirror = self.mirror_path(repo["repo_url"])
+        worktree = self.worktree_path(repo["email"], repo["task"], repo["round"])
+        async with self._locks[mirror]:
+            commit_sha = await self._fetch(mirror, repo["repo_url"], repo["commit_sha"])
+            if os.path.exists(worktree):
+                try:
+                    if await git("rev-parse", "HEAD", cwd=worktree) != commit_sha:
+                        await git("checkout", "--quiet", "--force", "--detach", commit_sha, cwd=worktree)
+                    return worktree
+                except RuntimeError:
+                    # The worktree belongs to a different mirror (e.g. the repo URL changed); recreate it.
+                    shutil.rmtree(worktree, ignore_errors=True)
+            await git("--git-dir", mirror, "worktree", "prune")
+            await git("--git-dir", mirror, "worktree", "add", "--quiet", "--force", "--detach", worktree, commit_sha)
+        return worktree
@@ -1,31 +1,111 @@
+import os
 import csv
 import json
 import uuid
-import requests
+import hashlib
+import argparse
 import logging
-from database.db_utils import execute, fetchall, init_db
+from collections import OrderedDict
+from typing import Iterator
+from database.db_utils import execute, fetchall, fetchone, init_db
+from evaluation_scripts.dispatcher import dispatch
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
+# Used for submissions without an endpoint column, assuming the student API is running locally.
+DEFAULT_ENDPOINT = "http://localhost:8000/api-endpoint"
+FINGERPRINT_BYTES = 4096
+
+def load_processed_emails() -> set:
+    """Returns every email that already has a round 1 task, in a single query."""
+    return {row["email"] for row in fetchall("SELECT DISTINCT email FROM tasks WHERE round=1")}
+
+def file_fingerprint(path: str, offset: int) -> str:
     """
-    Reads submissions from submissions.csv, generates tasks,
-    and POSTs them to the student API endpoints.
+    A sha256 of the start of the file up to offset, so a checkpoint is not applied to a different
+    file at the same path but still is after rows are appended.
     """
-    init_db()
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read(min(offset, FINGERPRINT_BYTES))).hexdigest()
+
+class Checkpoint:
+    """
+    The resumable position of an ingest: the byte offset and row number just past the last row
+    whose task has been recorded. Rows finish out of order, so the checkpoint only advances over
+    the contiguous run of finished rows and is persisted in the ingest_checkpoints table.
+    """
+
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.source = os.path.abspath(path)
+        self.offset = 0
+        self.row_number = 0
+        self._rows = OrderedDict()
+        self._keys = {}
+        saved = None if restart else fetchone("SELECT byte_offset, row_number, fingerprint FROM ingest_checkpoints WHERE source=?", (self.source,))
+        if saved and saved["byte_offset"] <= os.path.getsize(path) and saved["fingerprint"] == file_fingerprint(path, saved["byte_offset"]):
+            self.offset = saved["byte_offset"]
+            self.row_number = saved["row_number"]
+
+    def read(self, row_number: int, offset: int, key: str = None):
+        """Registers a row ending at offset. Rows without a key are finished immediately."""
+        self._rows[row_number] = [offset, key is None]
+        if key is not None:
+            self._keys[key] = row_number
+
+    def done(self, key: str):
+        """Marks the row registered with key as finished."""
+        row_number = self._keys.pop(key, None)
+        if row_number in self._rows:
+            self._rows[row_number][1] = True
+
+    def save(self):
+        """Advances past the finished rows at the front and persists the position."""
+        while self._rows and next(iter(self._rows.values()))[1]:
+            self.row_number, (self.offset, _) = self._rows.popitem(last=False)
+        execute(
+            "INSERT INTO ingest_checkpoints (source, byte_offset, row_number, fingerprint) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(source) DO UPDATE SET byte_offset=excluded.byte_offset, row_number=excluded.row_number, "
+            "fingerprint=excluded.fingerprint, updated_at=CURRENT_TIMESTAMP",
+            (self.source, self.offset, self.row_number, file_fingerprint(self.path, self.offset))
+        )
+
+def iter_submissions(path: str, checkpoint: Checkpoint) -> Iterator[tuple[int, int, dict]]:
+    """
+    Streams the submissions CSV from the checkpoint, yielding (row_number, end_offset, row).
+    Byte offsets are tracked per physical line, so rows with quoted newlines are handled.
+    """
+    with open(path, "rb") as f:
+        fieldnames = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        offset = max(checkpoint.offset, f.tell())
+        f.seek(offset)
 
-    with open("submissions.csv", "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            email = row["email"]
-            endpoint = "http://localhost:8000/api-endpoint" # Assuming the student API is running locally
+        def lines():
+            nonlocal offset
+            for line in iter(f.readline, b""):
+                offset += len(line)
+                yield line.decode("utf-8")
 
-            # Skip if already processed
-            if fetchall("SELECT * FROM tasks WHERE email=? AND round=1", (email,)):
-                logger.info(f"Task for {email} already exists. Skipping.")
+        row_number = checkpoint.row_number
+        for values in csv.reader(lines()):
+            if not values:
                 continue
+            row_number += 1
+            yield row_number, offset, dict(zip(fieldnames, values))
+
+def build_round1_payloads(path: str, checkpoint: Checkpoint, processed: set) -> Iterator[tuple[str, dict]]:
+    """Yields the (endpoint, payload) of every submission after the checkpoint that has not been sent yet."""
+    for row_number, offset, row in iter_submissions(path, checkpoint):
+        email = row.get("email")
+
+        # Skip if already processed
+        if email in processed:
+            logger.info(f"Task for {email} already exists. Skipping.")
+            checkpoint.read(row_number, offset)
+            continue
 
+        try:
             nonce = str(uuid.uuid4())
             payload = {
                 "email": email,
@@ -38,23 +118,41 @@ def main():
                 "evaluation_url": row["evaluation_url"],
                 "attachments": json.loads(row["attachments"]),
             }
+        except (KeyError, ValueError, AttributeError) as e:
+            logger.error(f"Skipping malformed submission on row {row_number}: {e}")
+            checkpoint.read(row_number, offset)
+            continue
+
+        processed.add(email)
+        checkpoint.read(row_number, offset, nonce)
+        yield row.get("endpoint") or DEFAULT_ENDPOINT, payload
+
+def main(argv=None):
+    """
+    Reads submissions from submissions.csv, generates tasks,
+    and POSTs them to the student API endpoints.
+    An interrupted run resumes after the last recorded row unless --restart is given.
+    """
+    parser = argparse.ArgumentParser(description="Send round 1 tasks for every submission.")
+    parser.add_argument("--csv", default="submissions.csv", help="Path of the submissions CSV.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved checkpoint and scan the whole file.")
+    args = parser.parse_args(argv)
+
+    init_db()
+    checkpoint = Checkpoint(args.csv, restart=args.restart)
+    if checkpoint.row_number:
+        logger.info(f"Resuming {args.csv} after row {checkpoint.row_number} (byte {checkpoint.offset}).")
+    processed = load_processed_emails()
+
+    def on_flush(payloads: list[dict]):
+        for payload in payloads:
+            checkpoint.done(payload["nonce"])
+        checkpoint.save()
 
-            logger.info(f"Sending task {payload['task']} to {email} at {endpoint}")
-
-            try:
-                r = requests.post(endpoint, json=payload, timeout=30)
-                status = r.status_code
-                if status != 200:
-                    logger.error(f"Failed to send task to {email}: {r.text}")
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to send task to {email}: {e}")
-                status = 0
-
-            execute(
-                "INSERT INTO tasks (email, task, round, nonce, brief, attachments, checks, evaluation_url, endpoint, statuscode, secret) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (payload["email"], payload["task"], payload["round"], payload["nonce"], payload["brief"], json.dumps(payload["attachments"]), json.dumps(payload["checks"]), payload["evaluation_url"], endpoint, status, payload["secret"])
-            )
-            logger.info(f"Task for {email} logged to database with status {status}.")
+    try:
+        dispatch(build_round1_payloads(args.csv, checkpoint, processed), on_flush=on_flush)
+    finally:
+        checkpoint.save()
 
 if __name__ == "__main__":
     main()
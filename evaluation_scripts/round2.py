@@ -1,72 +1,69 @@
-import json
 import uuid
-import requests
 import logging
-from database.db_utils import fetchall, execute, init_db
+from database.db_utils import fetchall, init_db
+from evaluation_scripts.dispatcher import dispatch
+from evaluation_scripts.templates import template_for, render_round
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def main():
-    """
-    Generates and sends round 2 tasks based on the results of the evaluation.
-    """
-    init_db()
+DEFAULT_ENDPOINT = "http://localhost:8000/api-endpoint"
 
-    # Get all repos that have been evaluated in round 1
-    repos = fetchall("SELECT * FROM repos WHERE round=1")
+# The latest round 1 task of every student with a round 1 repo and no round 2 task yet.
+PENDING_ROUND2 = """
+WITH latest AS (
+    SELECT MAX(id) AS id FROM tasks WHERE round=1 GROUP BY email, task
+), submitted AS (
+    SELECT DISTINCT email, task FROM repos WHERE round=1
+)
+SELECT t.email, t.task, t.secret, t.evaluation_url, t.endpoint
+FROM latest
+JOIN tasks t ON t.id = latest.id
+JOIN submitted s ON s.email = t.email AND s.task = t.task
+WHERE NOT EXISTS (SELECT 1 FROM tasks r2 WHERE r2.email = t.email AND r2.task = t.task AND r2.round = 2)
+ORDER BY t.id
+"""
 
-    for repo in repos:
-        email = repo["email"]
-        task_name = repo["task"]
-
-        # Skip if round 2 task already exists
-        if fetchall("SELECT * FROM tasks WHERE email=? AND task=? AND round=2", (email, task_name)):
-            logger.info(f"Round 2 task for {email} and {task_name} already exists. Skipping.")
-            continue
-
-        # This is a placeholder for generating a more specific round 2 brief
-        # based on the evaluation results.
-        brief = f"Round 2: Improve the UI and add error handling for the {task_name} task."
-        checks = [
+def fallback_round2(task_name: str) -> dict:
+    """A generic round 2 brief for tasks without a template."""
+    return {
+        "brief": f"Round 2: Improve the UI and add error handling for the {task_name} task.",
+        "checks": [
             "UI has been improved with CSS.",
             "Error handling is implemented for user inputs.",
             "All previous functionality is still working."
-        ]
-
-        nonce = str(uuid.uuid4())
-        task_info = fetchall("SELECT * FROM tasks WHERE task=? AND round=1", (task_name,))[0]
-
+        ],
+        "attachments": [],
+    }
 
-        payload = {
-            "email": email,
-            "secret": task_info["secret"],
-            "task": task_name,
+def build_round2_payloads() -> list[tuple[str, dict]]:
+    """
+    Returns the (endpoint, payload) of every round 2 task still to be sent, from a single query.
+    Briefs, checks and attachments are rendered from the round2 entries of the task's template.
+    """
+    payloads = []
+    for row in fetchall(PENDING_ROUND2):
+        template = template_for(row["task"])
+        rendered = (template and render_round(template, row["email"], row["task"], 2)) or fallback_round2(row["task"])
+        payloads.append((row["endpoint"] or DEFAULT_ENDPOINT, {
+            "email": row["email"],
+            "secret": row["secret"],
+            "task": row["task"],
             "round": 2,
-            "nonce": nonce,
-            "brief": brief,
-            "checks": checks,
-            "evaluation_url": task_info["evaluation_url"],
-            "attachments": [], # No new attachments for round 2 in this example
-        }
-
-        endpoint = "http://localhost:8000/api-endpoint"
-        logger.info(f"Sending round 2 task {payload['task']} to {email} at {endpoint}")
+            "nonce": str(uuid.uuid4()),
+            "brief": rendered["brief"],
+            "checks": rendered["checks"],
+            "evaluation_url": row["evaluation_url"],
+            "attachments": rendered["attachments"],
+        }))
+    return payloads
 
-        try:
-            r = requests.post(endpoint, json=payload, timeout=30)
-            status = r.status_code
-            if status != 200:
-                logger.error(f"Failed to send round 2 task to {email}: {r.text}")
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send round 2 task to {email}: {e}")
-            status = 0
-
-        execute(
-            "INSERT INTO tasks (email, task, round, nonce, brief, attachments, checks, evaluation_url, endpoint, statuscode, secret) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (payload["email"], payload["task"], payload["round"], payload["nonce"], payload["brief"], json.dumps(payload["attachments"]), json.dumps(payload["checks"]), payload["evaluation_url"], endpoint, status, payload["secret"])
-        )
-        logger.info(f"Round 2 task for {email} logged to database with status {status}.")
+def main():
+    """
+    Generates and sends round 2 tasks based on the results of the evaluation.
+    """
+    init_db()
+    dispatch(build_round2_payloads())
 
 if __name__ == "__main__":
     main()
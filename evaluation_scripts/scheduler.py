@@ -0,0 +1,201 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+import argparse
+import itertools
+from datetime import datetime, timezone
+
+from database.db_utils import fetchall, init_db
+from evaluation_scripts.evaluate import EVAL_WORKERS, BROWSER_CONTEXTS, BrowserPool, Evaluator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EVAL_POLL_INTERVAL = float(os.getenv("EVAL_POLL_INTERVAL", "2"))
+EVAL_MAX_PENDING = int(os.getenv("EVAL_MAX_PENDING", "1000"))
+# Seconds after submission by which each round should be evaluated; the earliest deadline runs first,
+# so round 2 submissions overtake round 1 ones without starving them.
+ROUND_DEADLINES = {1: 600, 2: 120}
+DEFAULT_DEADLINE = 600
+
+# Rows are read in seq order; an upserted row gets a new seq and is read again.
+NEW_REPOS = "SELECT * FROM repos WHERE seq > ? ORDER BY seq LIMIT ?"
+
+def submission_key(repo: dict) -> tuple:
+    return repo["email"], repo["task"], repo["round"]
+
+def commit_key(repo: dict) -> tuple:
+    """A submitted commit. The same commit submitted for another task or round is evaluated again."""
+    return repo["repo_url"], repo["commit_sha"], repo["task"], repo["round"]
+
+def submitted_at(timestamp) -> float:
+    """
+    Parses a repos timestamp (SQLite's "YYYY-MM-DD HH:MM:SS" or ISO 8601, UTC unless it has an offset).
+    Returns now for a missing or unparseable timestamp.
+    """
+    if not timestamp:
+        return time.time()
+    try:
+        submitted = datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        logger.warning(f"Unparseable repos timestamp {timestamp!r}, treating it as now")
+        return time.time()
+    if submitted.tzinfo is None:
+        submitted = submitted.replace(tzinfo=timezone.utc)
+    return submitted.timestamp()
+
+def deadline_for(repo: dict) -> float:
+    """The submission time (the repos timestamp, or now for a callback) plus the round's deadline."""
+    return submitted_at(repo.get("timestamp")) + ROUND_DEADLINES.get(repo["round"], DEFAULT_DEADLINE)
+
+class Scheduler:
+    """
+    Evaluates submissions continuously as they arrive, from the receiver (submit) or from new and
+    updated repos rows (polled from a watermark).
+    - Pending submissions are ordered by deadline, then by round.
+    - A commit that is queued, being evaluated or already has every result is not queued again; a
+      new commit for a queued submission replaces the queued one.
+    - The poller's watermark is the repos seq of the last row it queued, so no row is skipped.
+    - At most `max_pending` submissions are queued. Beyond that, submit returns False and the poller
+      stops reading, so the backlog stays in the repos table and is picked up as workers free up.
+    """
+
+    def __init__(self, evaluator: Evaluator = None, workers: int = EVAL_WORKERS, max_pending: int = EVAL_MAX_PENDING,
+                 poll_interval: float = EVAL_POLL_INTERVAL, **evaluator_options):
+        self.evaluator = evaluator
+        self._evaluator_options = evaluator_options
+        self._workers = workers
+        self._max_pending = max_pending
+        self._poll_interval = poll_interval
+        self._heap = []
+        self._queued = {}
+        self._active = set()
+        self._seq = itertools.count()
+        self._watermark = 0
+        self._wakeup = None
+        self._tasks = []
+        self.submitted = 0
+        self.duplicates = 0
+        self.deferred = 0
+        self.evaluated = 0
+
+    async def start(self):
+        """Opens the evaluator and starts the workers and the repos poller."""
+        self.evaluator = self.evaluator or Evaluator(self._workers, **self._evaluator_options)
+        self._wakeup = asyncio.Event()
+        await self.evaluator.start()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self._workers)]
+        if self._poll_interval:
+            self._tasks.append(asyncio.create_task(self._poll()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.evaluator.close()
+
+    def submit(self, repo: dict) -> bool:
+        """Queues a submission for evaluation. Returns False if the queue is full."""
+        queued = self._queued.get(submission_key(repo))
+        if commit_key(repo) in self._active or (queued and commit_key(queued[-1]) == commit_key(repo)) or not self.evaluator.pending(repo):
+            self.duplicates += 1
+            return True
+        if queued:
+            # Superseded by a newer commit; the stale heap entry is skipped when popped.
+            queued[-1] = None
+        elif len(self._queued) >= self._max_pending:
+            self.deferred += 1
+            return False
+        entry = [deadline_for(repo), -repo["round"], next(self._seq), repo]
+        heapq.heappush(self._heap, entry)
+        self._queued[submission_key(repo)] = entry
+        self.submitted += 1
+        self._wakeup.set()
+        return True
+
+    def put(self, repos: list[dict]):
+        """Queues recorded submissions; those that do not fit are left to the poller."""
+        for repo in repos:
+            self.submit(repo)
+
+    async def _next(self) -> dict:
+        while True:
+            while self._heap:
+                repo = heapq.heappop(self._heap)[-1]
+                if repo is not None:
+                    del self._queued[submission_key(repo)]
+                    return repo
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _worker(self):
+        while True:
+            repo = await self._next()
+            key = commit_key(repo)
+            self._active.add(key)
+            try:
+                await self.evaluator.evaluate(repo)
+                self.evaluator.flush()
+            except Exception as e:
+                logger.error(f"Evaluation of {repo['repo_url']} at {repo['commit_sha']} failed: {e}", exc_info=True)
+            finally:
+                self._active.discard(key)
+            self.evaluated += 1
+
+    async def _poll(self):
+        while True:
+            free = self._max_pending - len(self._queued)
+            try:
+                if free > 0:
+                    for row in await asyncio.to_thread(fetchall, NEW_REPOS, (self._watermark, free)):
+                        try:
+                            accepted = self.submit(row)
+                        except Exception:
+                            # A row that cannot be queued is skipped, so it does not hold up the rows after it.
+                            logger.exception(f"Could not queue repos row {row.get('seq')} ({row.get('repo_url')})")
+                            accepted = True
+                        # A rejected row is read again on the next poll, along with everything after it.
+                        if not accepted:
+                            break
+                        self._watermark = row["seq"]
+            except Exception:
+                logger.exception("Error polling the repos table")
+            await asyncio.sleep(self._poll_interval)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._queued), "active": len(self._active), "submitted": self.submitted,
+            "duplicates": self.duplicates, "deferred": self.deferred, "evaluated": self.evaluated,
+        }
+
+async def run(scheduler: Scheduler):
+    await scheduler.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await scheduler.stop()
+
+def main(argv=None):
+    """
+    Watches the repos table and evaluates new submissions until interrupted.
+    """
+    parser = argparse.ArgumentParser(description="Evaluate submissions continuously as they are recorded.")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="Number of repos evaluated concurrently.")
+    parser.add_argument("--contexts", type=int, default=BROWSER_CONTEXTS, help="Number of concurrent browser contexts.")
+    parser.add_argument("--poll-interval", type=float, default=EVAL_POLL_INTERVAL, help="Seconds between polls of the repos table.")
+    parser.add_argument("--serve-local", action="store_true", help="Load pages from the local checkout instead of GitHub Pages.")
+    args = parser.parse_args(argv)
+
+    init_db()
+    scheduler = Scheduler(workers=args.workers, poll_interval=args.poll_interval,
+                          browsers=BrowserPool(args.contexts), serve_local=args.serve_local)
+    try:
+        asyncio.run(run(scheduler))
+    except KeyboardInterrupt:
+        logger.info(f"Scheduler stopped: {scheduler.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+class StaticServer:
+    """
+    An in-process HTTP server for one directory on a local port. The directory can be switched
+    between repos; while none is set, every request gets 404.
+    """
+
+    def __init__(self):
+        self.root = None
+        server = self
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                self.root = server.root
+                super().__init__(*args, directory=self.root, **kwargs)
+
+            def send_head(self):
+                # Without a root the handler would fall back to the working directory (.env, tasks.db).
+                if self.root is None:
+                    self.send_error(404, "No repo is being served")
+                    return None
+                return super().send_head()
+
+            def end_headers(self):
+                # Every repo is served from the same origin, so nothing may be cached across repos.
+                self.send_header("Cache-Control", "no-store")
+                super().end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name="static-server", daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+class StaticServerPool:
+    """
+    One static server per evaluation worker, reused across repos.
+    A worker holds a server for as long as its page is open, so a page never sees another repo's files.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._servers = []
+        self._idle = None
+
+    def start(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self._size):
+            server = StaticServer()
+            server.start()
+            self._servers.append(server)
+            self._idle.put_nowait(server)
+
+    def close(self):
+        for server in self._servers:
+            server.close()
+        self._servers = []
+
+    @asynccontextmanager
+    async def serve(self, root: str):
+        """Serves root from an idle server and yields its base URL."""
+        server = await self._idle.get()
+        server.root = root
+        try:
+            yield server.url
+        finally:
+            server.root = None
+            self._idle.put_nowait(server)
@@ -0,0 +1,65 @@
+import os
+import json
+import glob
+import string
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Optional
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "task_templates")
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=None)
+def load_templates(directory: str = TEMPLATES_DIR) -> dict[str, dict]:
+    """Loads every task template in the directory once, keyed by id. Empty or invalid files are skipped."""
+    templates = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path) as f:
+                template = json.load(f)
+            templates[template.get("id") or os.path.splitext(os.path.basename(path))[0]] = template
+        except (IOError, ValueError, AttributeError) as e:
+            logger.warning(f"Skipping task template {path}: {e}")
+    return templates
+
+def template_for(task: str, directory: str = TEMPLATES_DIR) -> Optional[dict]:
+    """Returns the template of a task, matching its id exactly or as a prefix such as sum-of-sales-3."""
+    templates = load_templates(directory)
+    if task in templates:
+        return templates[task]
+    matches = [template_id for template_id in templates if task.startswith(f"{template_id}-")]
+    return templates[max(matches, key=len)] if matches else None
+
+def seed_for(email: str, task: str, round_num: int) -> str:
+    """A stable per-student seed, so re-rendering a task for the same student gives the same result."""
+    return hashlib.sha256(f"{email}:{task}:{round_num}".encode()).hexdigest()[:16]
+
+def render(value, values: dict):
+    """Substitutes ${name} placeholders in a string, or in every string of a list or dict."""
+    if isinstance(value, str):
+        return string.Template(value).safe_substitute(values)
+    if isinstance(value, list):
+        return [render(item, values) for item in value]
+    if isinstance(value, dict):
+        return {key: render(item, values) for key, item in value.items()}
+    return value
+
+def render_round(template: dict, email: str, task: str, round_num: int) -> Optional[dict]:
+    """
+    Renders the brief, checks and attachments of a template for one student.
+    Round 1 uses the top-level entry; later rounds pick one of the template's round{n} entries by
+    the student's seed. Returns None if the template has no entry for the round.
+    """
+    seed = seed_for(email, task, round_num)
+    entries = [template] if round_num == 1 else template.get(f"round{round_num}") or []
+    if not entries:
+        return None
+    entry = entries[int(seed, 16) % len(entries)]
+    values = {"email": email, "task": task, "round": round_num, "seed": seed}
+    return {
+        "brief": render(entry.get("brief", ""), values),
+        "checks": render(entry.get("checks", []), values),
+        "attachments": render(entry.get("attachments", []), values),
+    }
@@ -0,0 +1,106 @@
+import os
+import math
+import time
+import threading
+
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "100"))
+# Token buckets: each email may start EMAIL_BURST jobs at once and one more every 1/EMAIL_RATE seconds.
+ADMISSION_EMAIL_RATE = float(os.getenv("ADMISSION_EMAIL_RATE", "0.1"))
+ADMISSION_EMAIL_BURST = float(os.getenv("ADMISSION_EMAIL_BURST", "5"))
+ADMISSION_TASK_RATE = float(os.getenv("ADMISSION_TASK_RATE", "2"))
+ADMISSION_TASK_BURST = float(os.getenv("ADMISSION_TASK_BURST", "50"))
+# Seconds between sweeps that drop buckets which have refilled completely; a fresh bucket is identical.
+ADMISSION_PRUNE_INTERVAL = float(os.getenv("ADMISSION_PRUNE_INTERVAL", "60"))
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; retry_after is the suggested wait in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+class TokenBucket:
+    """Holds up to `burst` tokens and refills at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Refills the bucket and returns how long until a token is available (0 if one is)."""
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        """Whether the bucket will have refilled to its burst by now."""
+        return self.tokens + max(0.0, now - self.updated) * self.rate >= self.burst
+
+class AdmissionController:
+    """
+    Decides whether a new task request may be queued: the job queue must have room, and the
+    request's email and task must each have a token. A rejected request consumes no tokens.
+    Buckets that have refilled completely are dropped every `prune_interval` seconds, so memory
+    grows with the emails and tasks active recently rather than all ever seen.
+    """
+
+    def __init__(self, max_queue: int = ADMISSION_MAX_QUEUE, email_rate: float = ADMISSION_EMAIL_RATE, email_burst: float = ADMISSION_EMAIL_BURST,
+                 task_rate: float = ADMISSION_TASK_RATE, task_burst: float = ADMISSION_TASK_BURST,
+                 prune_interval: float = ADMISSION_PRUNE_INTERVAL):
+        self.max_queue = max_queue
+        self._email_limits = (email_rate, email_burst)
+        self._task_limits = (task_rate, task_burst)
+        self._emails = {}
+        self._tasks = {}
+        self._prune_interval = prune_interval
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+
+    def _bucket(self, buckets: dict, key: str, limits: tuple) -> TokenBucket:
+        if key not in buckets:
+            buckets[key] = TokenBucket(*limits)
+        return buckets[key]
+
+    def _prune(self, now: float):
+        for buckets in (self._emails, self._tasks):
+            for key in [key for key, bucket in buckets.items() if bucket.full(now)]:
+                del buckets[key]
+        self._pruned_at = now
+
+    def admit(self, payload: dict, queued: int, drain_seconds: float):
+        """
+        Admits the request or raises Overloaded. queued is the current job queue length and
+        drain_seconds the expected time for one queue slot to free up.
+        """
+        with self._lock:
+            if queued >= self.max_queue:
+                self.rejected += 1
+                raise Overloaded("Job queue is full", drain_seconds)
+            now = time.monotonic()
+            if now - self._pruned_at >= self._prune_interval:
+                self._prune(now)
+            buckets = [
+                ("email", self._bucket(self._emails, payload["email"], self._email_limits)),
+                ("task", self._bucket(self._tasks, payload["task"], self._task_limits)),
+            ]
+            for name, bucket in buckets:
+                wait = bucket.wait_time(now)
+                if wait:
+                    self.rejected += 1
+                    raise Overloaded(f"Too many requests for this {name}", wait)
+            for _, bucket in buckets:
+                bucket.take()
+            self.admitted += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            buckets = len(self._emails) + len(self._tasks)
+        return {"admitted": self.admitted, "rejected": self.rejected, "buckets": buckets}
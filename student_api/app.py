@@ -1,17 +1,20 @@
 import os
 import json
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from pydantic import BaseModel
 import logging
 
-from student_api.generator import generate_app
-from student_api.github_helper import create_and_push_to_repo
+from student_api.generator import generate_app, completion_cache, captcha_cache, engine as generation_engine
+from student_api.github_helper import create_and_push_to_repo, follow_pages_deployment, get_rate_limit_budget, get_pages_stats
 from student_api.utils import process_attachments
-from database.db_utils import execute, main as init_db
+from student_api.attachments import store as attachment_store
+from student_api.notifier import enqueue_notification, notification_stats, sender as notification_sender
+from student_api.admission import AdmissionController, Overloaded
+from student_api.jobs import JobRunner, Deferred, SUCCEEDED, complete_job, fail_job, get_deployment, get_job, update_job
+from database.db_utils import execute, init_db
 
 load_dotenv()
 
@@ -34,37 +37,125 @@ class TaskRequest(BaseModel):
     evaluation_url: str
     attachments: list[dict]
 
-def notify_evaluation_service(url: str, payload: dict):
-    """Notifies the evaluation service with a given payload."""
-    retry_strategy = Retry(
-        total=3,
-        status_forcelist=[429, 500, 502, 503, 504],
-        backoff_factor=1
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    http = requests.Session()
-    http.mount("https://", adapter)
-    http.mount("http://", adapter)
-    try:
-        response = http.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        logging.info(f"Successfully notified evaluation service for task: {payload.get('task')}")
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to notify evaluation service for task: {payload.get('task')}: {e}")
+def notify_evaluation_service(url: str, payload: dict) -> int:
+    """
+    Queues a notification for the evaluation service and returns its id.
+    Delivery, retries and dead-lettering are handled by the background notification sender.
+    """
+    notification_id = enqueue_notification(url, payload)
+    logging.info(f"Queued evaluation notification {notification_id} for task: {payload.get('task')}")
+    return notification_id
+
+def process_task(job_id: str, payload: dict, endpoint: str):
+    """
+    Runs the generate and push stages for a task request, then hands the commit to the
+    GitHub Pages follower. The evaluation service is notified once the site is deployed.
+    A job recovered in the deploy stage skips straight to following its pushed commit.
+    """
+    task_request = TaskRequest(**payload)
+
+    deployment = get_deployment(job_id)
+    if deployment:
+        # Resumed after a restart: the commit is already pushed, only its deployment is followed again.
+        repo_url, commit_sha, pages_url = deployment["repo_url"], deployment["commit_sha"], deployment["pages_url"]
+        logging.info(f"Job {job_id} resumes following the Pages deployment of {commit_sha}")
+    else:
+        update_job(job_id, stage="generate")
+        with attachment_store.scratch(job_id) as scratch:
+            processed_data = process_attachments(task_request.attachments, scratch)
+            app_code = generate_app(task_request.brief, processed_data)
+
+        if "error" in app_code:
+            raise RuntimeError(app_code["error"])
+        if not app_code:
+            raise RuntimeError(f"No files generated for task {task_request.task}")
+
+        update_job(job_id, stage="push")
+        repo_url, commit_sha, pages_url = create_and_push_to_repo(
+            task_request.email, task_request.task, app_code, task_request.round
+        )
+        update_job(job_id, stage="deploy", repo_url=repo_url, commit_sha=commit_sha, pages_url=pages_url)
+
+    def on_deployed(build_seconds: float):
+        try:
+            update_job(job_id, stage="notify")
+            evaluation_payload = {
+                "email": task_request.email,
+                "task": task_request.task,
+                "round": task_request.round,
+                "nonce": task_request.nonce,
+                "repo_url": repo_url,
+                "commit_sha": commit_sha,
+                "pages_url": pages_url,
+            }
+            notification_id = notify_evaluation_service(task_request.evaluation_url, evaluation_payload)
+
+            execute(
+                "INSERT INTO tasks (email, task, round, nonce, brief, attachments, checks, evaluation_url, endpoint, statuscode, secret, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(email, task, round, nonce) DO UPDATE SET statuscode=excluded.statuscode, repo_url=excluded.repo_url, commit_sha=excluded.commit_sha, pages_url=excluded.pages_url",
+                (task_request.email, task_request.task, task_request.round, task_request.nonce, task_request.brief, json.dumps(task_request.attachments), json.dumps(task_request.checks), task_request.evaluation_url, endpoint, 200, task_request.secret, repo_url, commit_sha, pages_url)
+            )
+
+            complete_job(job_id, {
+                "status": "success",
+                "repo_url": repo_url,
+                "pages_url": pages_url,
+                "commit_sha": commit_sha,
+                "build_seconds": round(build_seconds, 3),
+                "notification_id": notification_id
+            })
+        except Exception as e:
+            logging.error(f"Job {job_id} failed after deployment: {e}", exc_info=True)
+            fail_job(job_id, str(e))
+
+    follow_pages_deployment(repo_url, commit_sha, on_deployed, lambda reason: fail_job(job_id, reason))
+    return Deferred()
+
+job_runner = JobRunner(process_task, admission=AdmissionController())
 
 @app.on_event("startup")
 async def startup_event():
-    """Initializes the database on startup."""
+    """Initializes the database, resumes interrupted jobs and starts the notification sender and attachment collector."""
     init_db()
+    attachment_store.start()
+    job_runner.recover()
+    notification_sender.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stops the job worker pool, the notification sender and the attachment collector."""
+    job_runner.shutdown(wait=False)
+    notification_sender.stop()
+    attachment_store.stop()
 
 @app.get("/")
 def read_root():
     """A welcome message for the API."""
     return {"message": "Welcome to the Student API"}
 
+@app.get("/metrics")
+def metrics():
+    """Exposes operational counters such as the remaining GitHub rate-limit budget."""
+    return {
+        "github": get_rate_limit_budget(),
+        "pages": get_pages_stats(),
+        "notifications": notification_stats(),
+        "llm_cache": {"completion": completion_cache.stats(), "captcha": captcha_cache.stats()},
+        "generation": generation_engine.stats(),
+        "attachments": attachment_store.stats(),
+        "jobs": job_runner.stats(),
+    }
+
 @app.post("/api-endpoint")
 async def api_endpoint(request: Request):
-    """The main endpoint for processing tasks."""
+    """
+    Accepts a task, persists it as a job and returns 202 with the job id.
+    The generate, push and notify stages run on the background worker pool.
+    A repeated (email, task, round, nonce) is attached to its existing job: 202 with the same job id
+    while it is in flight, or 200 with the stored result once it has succeeded.
+    New requests are rejected with 429 and Retry-After when the job queue is full or the email or
+    task is over its rate.
+    """
     try:
         data = await request.json()
         task_request = TaskRequest(**data)
@@ -74,40 +165,43 @@ async def api_endpoint(request: Request):
 
         logging.info(f"Received task: {task_request.task} for email: {task_request.email}")
 
-        processed_data = process_attachments(task_request.attachments)
-        app_code = generate_app(task_request.brief, processed_data)
-
-        if "error" in app_code:
-            raise HTTPException(status_code=500, detail=app_code["error"])
-
-        repo_url, commit_sha, pages_url = create_and_push_to_repo(
-            task_request.email, task_request.task, app_code, task_request.round
-        )
-
-        evaluation_payload = {
-            "email": task_request.email,
-            "task": task_request.task,
-            "round": task_request.round,
-            "nonce": task_request.nonce,
-            "repo_url": repo_url,
-            "commit_sha": commit_sha,
-            "pages_url": pages_url,
-        }
-        notify_evaluation_service(task_request.evaluation_url, evaluation_payload)
-
-        execute(
-            "INSERT INTO tasks (email, task, round, nonce, brief, attachments, checks, evaluation_url, endpoint, statuscode, secret, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (task_request.email, task_request.task, task_request.round, task_request.nonce, task_request.brief, json.dumps(task_request.attachments), json.dumps(task_request.checks), task_request.evaluation_url, str(request.url), 200, task_request.secret, repo_url, commit_sha, pages_url)
+        try:
+            # submit takes a lock and writes to SQLite, so it runs off the event loop.
+            job_id, created = await run_in_threadpool(job_runner.submit, task_request.model_dump(), str(request.url))
+        except Overloaded as e:
+            logging.warning(f"Rejected task {task_request.task} for {task_request.email}: {e}")
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        if not created:
+            job = await run_in_threadpool(get_job, job_id)
+            if job and job["status"] == SUCCEEDED:
+                return JSONResponse(
+                    status_code=200,
+                    content={
+                        "status": "completed",
+                        "job_id": job_id,
+                        "status_url": f"/jobs/{job_id}",
+                        "result": job["result"]
+                    }
+                )
+
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "accepted",
+                "job_id": job_id,
+                "status_url": f"/jobs/{job_id}"
+            }
         )
-
-        return {
-            "status": "success",
-            "repo_url": repo_url,
-            "pages_url": pages_url,
-            "commit_sha": commit_sha
-        }
     except HTTPException as e:
         raise e
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal Server Error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    """Returns the status, current stage and result of a job."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,221 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Iterator
+
+from student_api.utils import iter_decoded
+
+ATTACHMENT_STORE_DIR = os.getenv("ATTACHMENT_STORE_DIR", os.path.join("temp", "attachments"))
+ATTACHMENT_STORE_MAX_BYTES = int(os.getenv("ATTACHMENT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+ATTACHMENT_GC_INTERVAL = float(os.getenv("ATTACHMENT_GC_INTERVAL", "60"))
+# Number of data URI hashes remembered, so a repeated attachment is linked without decoding it again.
+PAYLOAD_INDEX_SIZE = 4096
+HASH_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+def payload_key(url: str) -> str:
+    """Returns a sha256 of a data URI, hashed in slices so the string is not copied whole."""
+    digest = hashlib.sha256()
+    for offset in range(0, len(url), HASH_CHUNK_SIZE):
+        digest.update(url[offset:offset + HASH_CHUNK_SIZE].encode())
+    return digest.hexdigest()
+
+class Scratch:
+    """A per-request directory of attachments, hard-linked from the store under their original names."""
+
+    def __init__(self, store: "AttachmentStore", path: str):
+        self.store = store
+        self.path = path
+        self.digests = []
+
+    def add(self, name: str, url: str) -> str:
+        """
+        Stores an attachment, links it into the scratch directory and returns its path.
+        A later attachment with the same name replaces the earlier one.
+        """
+        digest = self.store.acquire(url)
+        self.digests.append(digest)
+        target = os.path.join(self.path, os.path.basename(name))
+        if os.path.lexists(target):
+            # Copying over the existing link would write into the earlier attachment's blob.
+            os.unlink(target)
+        try:
+            os.link(self.store.blob_path(digest), target)
+        except OSError:
+            shutil.copyfile(self.store.blob_path(digest), target)
+        return target
+
+class AttachmentStore:
+    """
+    Stores decoded attachments once, as read-only blobs named by the sha256 of their content.
+    Each request works in its own scratch directory of links to the blobs and holds a reference
+    to every blob it uses. A background collector evicts unreferenced blobs, least recently used
+    first, while the store is larger than max_bytes.
+    """
+
+    def __init__(self, root: str = ATTACHMENT_STORE_DIR, max_bytes: int = ATTACHMENT_STORE_MAX_BYTES,
+                 gc_interval: float = ATTACHMENT_GC_INTERVAL):
+        self.root = root
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.scratch_dir = os.path.join(root, "scratch")
+        self._max_bytes = max_bytes
+        self._gc_interval = gc_interval
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._refs = Counter()
+        self._digests = OrderedDict()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.decoded = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def start(self):
+        """Removes scratch directories left by a previous process and starts the collector."""
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="attachment-gc", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self._gc_interval):
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error(f"Attachment store collection error: {e}", exc_info=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def stats(self) -> dict:
+        """Returns blob counts, sizes and reuse counters."""
+        blobs = self._blobs()
+        return {
+            "blobs": len(blobs),
+            "bytes": sum(size for _, size, _ in blobs),
+            "referenced": sum(1 for count in self._refs.values() if count),
+            "decoded": self.decoded,
+            "reused": self.reused,
+            "evicted": self.evicted,
+        }
+
+    def _lookup(self, key: str):
+        """Returns the digest of an already stored payload and takes a reference to it, or None."""
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is None or not os.path.exists(self.blob_path(digest)):
+                return None
+            self._digests.move_to_end(key)
+            self._refs[digest] += 1
+            os.utime(self.blob_path(digest))
+            self.reused += 1
+            return digest
+
+    def acquire(self, url: str) -> str:
+        """
+        Stores the decoded payload of a data URI if it is not already stored and returns its digest.
+        The caller holds a reference to the blob until it calls release().
+        """
+        key = payload_key(url)
+        digest = self._lookup(key)
+        if digest:
+            return digest
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Concurrent requests with the same attachment wait for one decode instead of repeating it.
+        with key_lock:
+            digest = self._lookup(key) or self._store(key, url)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return digest
+
+    def _store(self, key: str, url: str) -> str:
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.blobs_dir, prefix=".incoming-")
+        try:
+            content = hashlib.sha256()
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter_decoded(url):
+                    content.update(chunk)
+                    f.write(chunk)
+            digest = content.hexdigest()
+            path = self.blob_path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(tmp_path, 0o444)
+            with self._lock:
+                os.replace(tmp_path, path)
+                self._refs[digest] += 1
+                self._digests[key] = digest
+                while len(self._digests) > PAYLOAD_INDEX_SIZE:
+                    self._digests.popitem(last=False)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.decoded += 1
+        return digest
+
+    def release(self, digests: list[str]):
+        """Drops one reference to each digest."""
+        with self._lock:
+            for digest in digests:
+                self._refs[digest] -= 1
+                if self._refs[digest] <= 0:
+                    del self._refs[digest]
+
+    @contextmanager
+    def scratch(self, request_id: str) -> Iterator[Scratch]:
+        """Yields a fresh scratch directory for one request; it is removed and its references released on exit."""
+        path = os.path.join(self.scratch_dir, f"{request_id}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(path)
+        scratch = Scratch(self, path)
+        try:
+            yield scratch
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+            self.release(scratch.digests)
+
+    def _blobs(self) -> list[tuple[float, int, str]]:
+        blobs = []
+        if not os.path.isdir(self.blobs_dir):
+            return blobs
+        for prefix in os.scandir(self.blobs_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                stat = entry.stat()
+                blobs.append((stat.st_mtime, stat.st_size, entry.name))
+        return blobs
+
+    def collect(self) -> int:
+        """Evicts unreferenced blobs, least recently used first, until the store fits in max_bytes. Returns bytes freed."""
+        blobs = sorted(self._blobs())
+        total = sum(size for _, size, _ in blobs)
+        freed = 0
+        with self._lock:
+            for _, size, digest in blobs:
+                if total - freed <= self._max_bytes:
+                    break
+                if self._refs[digest]:
+                    continue
+                try:
+                    os.unlink(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                freed += size
+                self.evicted += 1
+        if freed:
+            logger.info(f"Evicted {freed} bytes of attachments from {self.root}")
+        return freed
+
+store = AttachmentStore()
@@ -0,0 +1,139 @@
+import re
+import posixpath
+from dataclasses import dataclass, field
+from typing import Optional
+
+# An opening or closing fence: three or more backticks or tildes, optionally followed by a language.
+FENCE = re.compile(r"^(?P<fence>`{3,}|~{3,})\s*(?P<info>[^`\s]*)[^`]*$")
+# File name markers on the first line of a block, e.g. <!-- index.html -->, /* style.css */ or // app.js.
+NAME_MARKERS = (
+    re.compile(r"^<!--\s*(?:file(?:name)?:\s*)?(?P<name>\S+?)\s*-->$", re.I),
+    re.compile(r"^/\*\s*(?:file(?:name)?:\s*)?(?P<name>\S+?)\s*\*/$", re.I),
+    re.compile(r"^(?://|#|--)\s*(?:file(?:name)?:\s*)?(?P<name>\S+)$", re.I),
+)
+# A file name on the line before a block, e.g. **app.js**, ### app.js or File: `app.js`.
+HEADING = re.compile(r"^(?:#{1,6}\s*)?(?:\d+\.\s*)?(?:file(?:name)?:\s*)?[*`_]*(?P<name>[^\s*`_:][^\s*`:]*?)[*`_]*:?$", re.I)
+FILE_NAME = re.compile(r"^(?:[\w.-]+/)*[\w-][\w.-]*\.[\w]+$|^(?:[\w.-]+/)*(?:LICENSE|Dockerfile|Makefile|CNAME)$")
+
+@dataclass
+class MalformedBlock:
+    line: int
+    reason: str
+
+@dataclass
+class _Block:
+    fence: str
+    start: int
+    name: Optional[str]
+    lines: list = field(default_factory=list)
+    depth: int = 0
+    first_line: bool = True
+
+def _file_name(candidate: str) -> Optional[str]:
+    candidate = candidate.strip().removeprefix("./")
+    return candidate if FILE_NAME.match(candidate) else None
+
+def _marker_name(line: str) -> Optional[str]:
+    for marker in NAME_MARKERS:
+        match = marker.match(line)
+        if match:
+            return _file_name(match.group("name"))
+    return None
+
+def _heading_name(line: str) -> Optional[str]:
+    match = HEADING.match(line)
+    return _file_name(match.group("name")) if match else None
+
+class CodeBlockParser:
+    """
+    Extracts files from fenced code blocks in a single pass over the text, which may arrive in chunks.
+    A block is named by a marker on its first line (<!-- index.html -->, // app.js, ...) or by a
+    file name on the line just before it. Fences nested inside a block, such as shell snippets in
+    a README, are kept as content. Blocks without a usable name, with an unsafe path or left
+    unterminated are skipped and recorded in errors.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.errors = []
+        self._parts = []
+        self._line_no = 0
+        self._block = None
+        self._heading = None
+
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        """Consumes a chunk of text and returns the (name, content) of files completed by it."""
+        if "\n" not in text:
+            self._parts.append(text)
+            return []
+        self._parts.append(text)
+        *lines, rest = "".join(self._parts).split("\n")
+        self._parts = [rest] if rest else []
+        completed = []
+        for line in lines:
+            completed.extend(self._line(line))
+        return completed
+
+    def close(self) -> list[tuple[str, str]]:
+        """Consumes any remaining partial line, records an unterminated block and returns the last completed files."""
+        completed = []
+        if self._parts:
+            completed.extend(self._line("".join(self._parts)))
+            self._parts = []
+        if self._block is not None:
+            self.errors.append(MalformedBlock(self._block.start, f"unterminated code block for {self._block.name or 'unnamed file'}"))
+            self._block = None
+        return completed
+
+    def _line(self, line: str) -> list[tuple[str, str]]:
+        self._line_no += 1
+        stripped = line.strip()
+        block = self._block
+        if block is None:
+            fence = FENCE.match(stripped)
+            if fence:
+                self._block = _Block(fence.group("fence"), self._line_no, self._heading)
+                self._heading = None
+            elif stripped:
+                self._heading = _heading_name(stripped)
+            return []
+
+        if block.first_line:
+            block.first_line = False
+            name = _marker_name(stripped)
+            if name:
+                block.name = name
+                return []
+
+        fence = FENCE.match(stripped)
+        if fence and fence.group("fence")[0] == block.fence[0] and len(fence.group("fence")) >= len(block.fence):
+            if fence.group("info"):
+                block.depth += 1
+            elif block.depth:
+                block.depth -= 1
+            else:
+                self._block = None
+                return self._finish(block)
+        block.lines.append(line)
+        return []
+
+    def _finish(self, block: _Block) -> list[tuple[str, str]]:
+        if block.name is None:
+            self.errors.append(MalformedBlock(block.start, "code block has no file name"))
+            return []
+        name = posixpath.normpath(block.name)
+        if name.startswith(("/", "..")):
+            self.errors.append(MalformedBlock(block.start, f"unsafe file path {block.name}"))
+            return []
+        if name in self.files:
+            self.errors.append(MalformedBlock(block.start, f"duplicate file {name}; keeping the last block"))
+        content = "\n".join(block.lines).strip()
+        self.files[name] = content
+        return [(name, content)]
+
+def parse_code_blocks(text: str) -> tuple[dict[str, str], list[MalformedBlock]]:
+    """Extracts every named file from the text. Returns the files and the malformed blocks that were skipped."""
+    parser = CodeBlockParser()
+    parser.feed(text)
+    parser.close()
+    return parser.files, parser.errors
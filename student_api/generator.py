@@ -1,47 +1,197 @@
 import os
 import re
+import html
 import json
+import time
+import base64
+import asyncio
+import binascii
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
 import openai
 from dotenv import load_dotenv
 
+from student_api.llm_cache import LLMCache, cache_key
+from student_api.code_blocks import CodeBlockParser, parse_code_blocks
+
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-3.5-turbo"
+TEMPERATURE = 0.2
+MAX_TOKENS = 4096
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+completion_cache = LLMCache("completion")
+captcha_cache = LLMCache("captcha")
+CAPTCHA_QUESTION = "What are the characters in this image?"
+# Generated code refers to the captcha solution through this placeholder, so the completion does
+# not wait for the captcha to be solved and the same brief shares one cached completion.
+CAPTCHA_PLACEHOLDER = "__CAPTCHA_SOLUTION__"
+# A completion without files, or without the placeholder when there is a captcha to show, is requested again.
+GENERATION_ATTEMPTS = 2
+SCRIPT_BLOCK = re.compile(r"(<script\b[^>]*>)(.*?)(</script\s*>)", re.IGNORECASE | re.DOTALL)
+
+logger = logging.getLogger(__name__)
+
+class GenerationEngine:
+    """
+    Runs OpenAI calls on a dedicated event loop shared by all jobs.
+    One AsyncOpenAI client keeps connections alive across calls, a semaphore bounds the number of
+    requests in flight and completions are streamed so files are parsed as soon as they are complete.
+    Job threads call run(), which blocks until the coroutine finishes on the engine loop.
+    """
+
+    def __init__(self, max_concurrency: int = OPENAI_MAX_CONCURRENCY, timeout: float = OPENAI_TIMEOUT,
+                 base_url: Optional[str] = None):
+        self._max_concurrency = max_concurrency
+        self._timeout = timeout
+        self._base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._slots = None
+        self.completions = 0
+        self.first_file_seconds_total = 0.0
+        self.completion_seconds_total = 0.0
+
+    def stats(self) -> dict:
+        """Returns streamed completion counts and latency figures."""
+        return {
+            "completions": self.completions,
+            "first_file_seconds_mean": round(self.first_file_seconds_total / self.completions, 3) if self.completions else None,
+            "completion_seconds_mean": round(self.completion_seconds_total / self.completions, 3) if self.completions else None,
+        }
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="generation-engine", daemon=True).start()
+            return self._loop
+
+    def run(self, coroutine):
+        """Runs a coroutine on the engine loop from a job thread and returns its result."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop())
+        return future.result()
+
+    def _get_client(self) -> openai.AsyncOpenAI:
+        # Created lazily on the engine loop, which owns the client's connection pool.
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=self._base_url,
+                                              timeout=self._timeout, max_retries=OPENAI_MAX_RETRIES)
+            self._slots = asyncio.Semaphore(self._max_concurrency)
+        return self._client
+
+    async def vision(self, image_data_uri: str, question: str) -> Optional[str]:
+        """Asks the vision model a question about an image and returns the answer."""
+        client = self._get_client()
+        async with self._slots:
+            response = await client.chat.completions.create(
+                model=MODEL,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": question},
+                            {
+                                "type": "image_url",
+                                "image_url": {
+                                    "url": image_data_uri,
+                                },
+                            },
+                        ],
+                    }
+                ],
+                max_tokens=300,
+            )
+        return response.choices[0].message.content
+
+    async def stream_completion(self, messages: list[dict], on_file: Optional[Callable[[str, str], None]] = None) -> str:
+        """
+        Streams a chat completion and returns the full text.
+        on_file(name, content) is called for each file as soon as its code block is complete.
+        """
+        client = self._get_client()
+        parser = CodeBlockParser()
+        chunks = []
+        started = time.monotonic()
+        first_file_at = None
+
+        def report(completed: list[tuple[str, str]]):
+            nonlocal first_file_at
+            if completed and first_file_at is None:
+                first_file_at = time.monotonic()
+            for name, content in completed:
+                if on_file:
+                    on_file(name, content)
+
+        async with self._slots:
+            stream = await client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                stream=True,
+            )
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                chunks.append(chunk.choices[0].delta.content)
+                report(parser.feed(chunks[-1]))
+        report(parser.close())
+        finished = time.monotonic()
+        self.completions += 1
+        self.first_file_seconds_total += (first_file_at or finished) - started
+        self.completion_seconds_total += finished - started
+        logger.info(f"Streamed completion in {finished - started:.2f}s ({len(parser.files)} files)")
+        return "".join(chunks)
+
+engine = GenerationEngine()
+# Captcha solving runs alongside code generation; the engine bounds the actual API concurrency.
+_captcha_executor = ThreadPoolExecutor(max_workers=OPENAI_MAX_CONCURRENCY, thread_name_prefix="captcha")
+
+def image_digest(image_data_uri: str) -> str:
+    """
+    Returns a sha256 of the decoded image bytes of a data URI, so the same image hashes the same
+    regardless of how it was encoded. Non data URIs are hashed as-is.
+    """
+    header, _, encoded = image_data_uri.partition(",")
+    if header.startswith("data:") and header.endswith(";base64"):
+        encoded = "".join(encoded.split())
+        try:
+            return hashlib.sha256(base64.b64decode(encoded + "=" * (-len(encoded) % 4))).hexdigest()
+        except (ValueError, binascii.Error):
+            pass
+    return hashlib.sha256(image_data_uri.encode()).hexdigest()
 
 def solve_captcha(image_data_uri: str) -> str:
     """
     Solves the captcha from a data URI using a vision model.
+    Solutions are memoized by the hash of the decoded image, so a sample image shared by a whole
+    cohort is only sent to the model once.
     """
+    def solve() -> str:
+        solution = engine.run(engine.vision(image_data_uri, CAPTCHA_QUESTION))
+        return solution.strip() if solution else None
+
     try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "What are the characters in this image?"},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": image_data_uri,
-                            },
-                        },
-                    ],
-                }
-            ],
-            max_tokens=300,
-        )
-        solution = response.choices[0].message.content
-        return solution.strip() if solution else "Could not solve captcha"
+        solution = captcha_cache.get_or_compute(cache_key(MODEL, CAPTCHA_QUESTION, image_digest(image_data_uri)), solve)
+        return solution if solution else "Could not solve captcha"
     except Exception as e:
         print(f"Error solving captcha: {e}")
         return "Error solving captcha"
 
-def create_prompt(brief: str, processed_data: dict, captcha_solution: str) -> str:
+def create_prompt(brief: str, processed_data: dict, captcha_solution: str = CAPTCHA_PLACEHOLDER) -> str:
     """
     Creates a prompt for the LLM to generate the application code.
+    By default the solved text is left as CAPTCHA_PLACEHOLDER and substituted after generation.
     """
     sample_image_uri = ""
     for name, data in processed_data.items():
@@ -73,6 +223,7 @@ You are an expert web developer. Your task is to build a single-page web applica
 - If the URL parameter exists, use it as the `src` for the captcha `<img>` tag.
 - If the URL parameter does not exist, use the Sample Captcha Image Data URI as the `src`.
 - The solved captcha text, `{captcha_solution}`, should be hardcoded into the HTML or JavaScript and displayed on the page. **Do not try to solve it on the client side.**
+- If the solved text is `{CAPTCHA_PLACEHOLDER}`, write that placeholder exactly as-is; it is replaced with the real solution after generation.
 - Generate a professional README.md file with setup instructions, code explanation, usage, and a license.
 - Generate an MIT LICENSE file.
 
@@ -99,24 +250,40 @@ Please generate the files in the following format, with each file enclosed in a
 def parse_generated_code(generated_code: str) -> dict[str, str]:
     """
     Parses the generated code and splits it into files.
+    Malformed code blocks are skipped and logged.
     """
-    files = {}
-    file_patterns = {
-        "index.html": r"```html\n<!-- index.html -->\n(.*?)\n```",
-        "README.md": r"```markdown\n<!-- README.md -->\n(.*?)\n```",
-        "LICENSE": r"```text\n<!-- LICENSE -->\n(.*?)\n```",
-    }
-
-    for file_name, pattern in file_patterns.items():
-        match = re.search(pattern, generated_code, re.DOTALL)
-        if match:
-            files[file_name] = match.group(1).strip()
-
+    files, errors = parse_code_blocks(generated_code)
+    for error in errors:
+        logger.warning(f"Skipped malformed code block at line {error.line}: {error.reason}")
     return files
 
-def generate_app(brief: str, processed_data: dict) -> dict[str, str]:
+def js_string_escape(text: str) -> str:
+    """Escapes text for a JavaScript string literal of any quote style, also inside an inline <script>."""
+    escaped = json.dumps(text)[1:-1]
+    return escaped.replace("'", "\\'").replace("`", "\\`").replace("$", "\\$").replace("<", "\\u003c")
+
+def substitute_captcha(name: str, content: str, solution: str) -> str:
+    """
+    Replaces CAPTCHA_PLACEHOLDER in a generated file with the solution, escaped for where it appears:
+    as a string in JavaScript files and inline scripts, and as text or an attribute elsewhere in HTML.
+    """
+    if name.endswith((".js", ".mjs")):
+        return content.replace(CAPTCHA_PLACEHOLDER, js_string_escape(solution))
+    if name.endswith((".html", ".htm")):
+        content = SCRIPT_BLOCK.sub(
+            lambda m: m.group(1) + m.group(2).replace(CAPTCHA_PLACEHOLDER, js_string_escape(solution)) + m.group(3), content
+        )
+        return content.replace(CAPTCHA_PLACEHOLDER, html.escape(solution))
+    return content.replace(CAPTCHA_PLACEHOLDER, solution)
+
+def generate_app(brief: str, processed_data: dict, on_file: Optional[Callable[[str, str], None]] = None) -> dict[str, str]:
     """
     Generates a simple HTML/JS application based on the brief and processed data.
+    The captcha is solved while the code is generated, and the solution is substituted into the
+    generated files. on_file(name, content) is called as each file finishes streaming, or for each
+    file of a cached completion, before the solution is substituted. A completion without files,
+    or one that does not show the captcha placeholder when there is a sample image, is requested
+    again up to GENERATION_ATTEMPTS times.
     """
     sample_image_uri = ""
     for name, data in processed_data.items():
@@ -124,30 +291,45 @@ def generate_app(brief: str, processed_data: dict) -> dict[str, str]:
             sample_image_uri = data
             break
 
-    if not sample_image_uri:
-        captcha_solution = "No sample image provided."
-    else:
-        captcha_solution = solve_captcha(sample_image_uri)
+    captcha_future = _captcha_executor.submit(solve_captcha, sample_image_uri) if sample_image_uri else None
+
+    prompt = create_prompt(brief, processed_data)
+    messages = [
+        {"role": "system", "content": "You are an expert web developer."},
+        {"role": "user", "content": prompt},
+    ]
+    streamed = []
 
-    prompt = create_prompt(brief, processed_data, captcha_solution)
+    def complete() -> str:
+        streamed.append(True)
+        return engine.run(engine.stream_completion(messages, on_file))
+
+    def usable(files: dict) -> bool:
+        return bool(files) and (captcha_future is None or any(CAPTCHA_PLACEHOLDER in content for content in files.values()))
 
     try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "system", "content": "You are an expert web developer."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.2,
-            max_tokens=4096,
-        )
-        generated_code = response.choices[0].message.content
-        files = parse_generated_code(generated_code)
-        return files
+        for attempt in range(1, GENERATION_ATTEMPTS + 1):
+            streamed.clear()
+            # Identical prompts (retries, repeated nonces, resubmissions) share one completion. Only a
+            # usable completion is cached, so a truncated or malformed one is requested again.
+            generated_code = completion_cache.get_or_compute(cache_key(MODEL, messages, TEMPERATURE, MAX_TOKENS), complete,
+                                                             valid=lambda code: usable(parse_code_blocks(code)[0]))
+            files = parse_generated_code(generated_code or "")
+            if usable(files):
+                break
+            logger.warning(f"Generated code has no files or no captcha placeholder (attempt {attempt} of {GENERATION_ATTEMPTS})")
     except openai.RateLimitError as e:
         print(f"Error generating code: {e}")
         return {"error": "OpenAI API quota exceeded. Please check your plan and billing details."}
     except Exception as e:
         print(f"Error generating code: {e}")
-        return {}
\ No newline at end of file
+        return {}
+
+    if files and not usable(files):
+        return {"error": "Generated code does not display the captcha solution."}
+    if on_file and not streamed:
+        for name, content in files.items():
+            on_file(name, content)
+
+    captcha_solution = captcha_future.result() if captcha_future else "No sample image provided."
+    return {name: substitute_captcha(name, content, captcha_solution) for name, content in files.items()}
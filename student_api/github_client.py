@@ -0,0 +1,173 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_MAX_CONCURRENCY = int(os.getenv("GITHUB_MAX_CONCURRENCY", "4"))
+# Requests are held back once the remaining budget drops to this reserve, until the window resets.
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50"))
+# GitHub asks integrators to leave at least a second between mutating requests.
+GITHUB_WRITE_INTERVAL = float(os.getenv("GITHUB_WRITE_INTERVAL", "1.0"))
+ETAG_CACHE_SIZE = 1024
+MAX_RATE_LIMIT_WAIT = 900
+MAX_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+class GitHubError(Exception):
+    """An error response from the GitHub API."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+class GitHubClient:
+    """
+    A small GitHub REST client shared by all jobs.
+    It tracks the X-RateLimit-* headers, queues calls behind a bounded number of concurrent
+    requests, waits for the window to reset when the budget runs low, spaces out writes and
+    serves conditional GETs from an ETag cache so 304 responses do not consume budget.
+    """
+
+    def __init__(self, token: str, base_url: str = GITHUB_API_URL, max_concurrency: int = GITHUB_MAX_CONCURRENCY,
+                 reserve: int = GITHUB_RATE_LIMIT_RESERVE, write_interval: float = GITHUB_WRITE_INTERVAL):
+        self.base_url = base_url.rstrip("/")
+        self._session = requests.Session()
+        self._session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "X-GitHub-Api-Version": "2022-11-28",
+        })
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._budget_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reserve = reserve
+        self._write_interval = write_interval
+        self._last_write = 0.0
+        self._resume_at = None
+        self._etags = OrderedDict()
+        self.remaining = None
+        self.limit = None
+        self.reset_at = None
+        self.requests_made = 0
+        self.not_modified = 0
+        self.throttled_seconds = 0.0
+
+    def budget(self) -> dict:
+        """Returns the current rate-limit budget and request counters."""
+        return {
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "reset_at": self.reset_at,
+            "requests": self.requests_made,
+            "not_modified": self.not_modified,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+    def _sleep(self, seconds: float, reason: str):
+        seconds = max(0.0, min(seconds, MAX_RATE_LIMIT_WAIT))
+        if seconds:
+            logger.warning(f"Throttling GitHub requests for {seconds:.1f}s: {reason}")
+            with self._lock:
+                self.throttled_seconds += seconds
+            time.sleep(seconds)
+
+    def _throttle(self, method: str, needs_budget: bool = True):
+        """
+        Waits until the request may be sent. The waits are worked out under the locks but slept
+        outside them, so a request that needs no budget (a revalidation of a cached GET, which
+        answers 304 for free) is never held up by one waiting for the rate-limit window to reset.
+        """
+        budget_wait, reason = 0.0, ""
+        with self._budget_lock:
+            now = time.time()
+            if self._resume_at is None and self.remaining is not None and self.remaining <= self._reserve and self.reset_at:
+                self._resume_at = min(self.reset_at, now + MAX_RATE_LIMIT_WAIT)
+            if self._resume_at is not None and now >= self._resume_at:
+                self._resume_at = None
+                self.remaining = None
+            if needs_budget and self._resume_at is not None:
+                budget_wait, reason = self._resume_at - now, f"{self.remaining} requests left"
+        self._sleep(budget_wait, reason)
+        if method != "GET":
+            # Each write reserves the next free slot, then waits for it without holding the lock.
+            with self._write_lock:
+                now = time.monotonic()
+                slot = max(now, self._last_write + self._write_interval)
+                self._last_write = slot
+            self._sleep(slot - now, "spacing writes")
+
+    def _record(self, response: requests.Response):
+        with self._lock:
+            self.requests_made += 1
+            if "X-RateLimit-Remaining" in response.headers:
+                self.remaining = int(response.headers["X-RateLimit-Remaining"])
+                self.limit = int(response.headers.get("X-RateLimit-Limit", 0)) or self.limit
+                self.reset_at = int(response.headers.get("X-RateLimit-Reset", 0)) or self.reset_at
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """Returns how long to wait before retrying a rate-limited response, or None if it is not one."""
+        if response.status_code not in (403, 429):
+            return None
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            return int(response.headers.get("X-RateLimit-Reset", time.time())) - time.time()
+        if "rate limit" in response.text.lower():
+            return 60 * 2 ** attempt
+        return None
+
+    def request(self, method: str, path: str, json: dict = None, conditional: bool = False):
+        """Sends a request and returns the decoded JSON body, raising GitHubError on failure."""
+        url = f"{self.base_url}{path}"
+        with self._lock:
+            cached = self._etags.get(url) if conditional else None
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        for attempt in range(MAX_ATTEMPTS):
+            self._throttle(method, needs_budget=not cached)
+            with self._slots:
+                response = self._session.request(method, url, json=json, headers=headers, timeout=30)
+                self._record(response)
+
+            if response.status_code == 304 and cached:
+                with self._lock:
+                    self.not_modified += 1
+                return cached[1]
+
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt == MAX_ATTEMPTS - 1:
+                break
+            self._sleep(delay, f"rate limited on {method} {path}")
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("message", response.text)
+            except ValueError:
+                message = response.text
+            raise GitHubError(response.status_code, message)
+
+        data = response.json() if response.content else None
+        if conditional and "ETag" in response.headers:
+            with self._lock:
+                self._etags[url] = (response.headers["ETag"], data)
+                self._etags.move_to_end(url)
+                while len(self._etags) > ETAG_CACHE_SIZE:
+                    self._etags.popitem(last=False)
+        return data
+
+    def get(self, path: str, conditional: bool = True):
+        return self.request("GET", path, conditional=conditional)
+
+    def post(self, path: str, json: dict = None):
+        return self.request("POST", path, json=json)
+
+    def patch(self, path: str, json: dict = None):
+        return self.request("PATCH", path, json=json)
@@ -1,31 +1,74 @@
 import os
-import time
-from github import Github, Auth, GithubException
+from typing import Callable
 from dotenv import load_dotenv
 import logging
 
+from student_api.github_client import GitHubClient, GitHubError
+from student_api.pages import PagesFollower
+
 load_dotenv()
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-# A mock for the Github object when no token is provided
+if not GITHUB_TOKEN:
+    raise ValueError("GITHUB_TOKEN not found in .env file (set it to your_github_token to mock GitHub)")
+# A mock for the GitHub client when the placeholder token is configured
 if GITHUB_TOKEN == "your_github_token":
-    g = None
+    client = None
+    pages_follower = None
 else:
-    auth = Auth.Token(GITHUB_TOKEN)
-    g = Github(auth=auth)
+    client = GitHubClient(GITHUB_TOKEN)
+    pages_follower = PagesFollower(client)
 
 logger = logging.getLogger(__name__)
 
+def get_rate_limit_budget() -> dict:
+    """Returns the GitHub rate-limit budget of the shared client."""
+    if client is None:
+        return {"mocked": True}
+    return client.budget()
+
+def get_pages_stats() -> dict:
+    """Returns GitHub Pages deployment counts and build latency."""
+    if pages_follower is None:
+        return {"mocked": True}
+    return pages_follower.stats()
+
+def push_files(gh: GitHubClient, repo: dict, files: dict[str, str], commit_message: str) -> str:
+    """
+    Pushes all files as a single commit on the default branch using the Git Data API.
+    Blobs are created inline with one tree, then one commit, and the branch ref is moved once.
+    Returns the sha of the branch head after the push.
+    """
+    full_name = repo["full_name"]
+    branch = repo["default_branch"]
+    branch_ref = gh.get(f"/repos/{full_name}/git/ref/heads/{branch}")
+    parent = gh.get(f"/repos/{full_name}/git/commits/{branch_ref['object']['sha']}")
+    tree = gh.post(f"/repos/{full_name}/git/trees", json={
+        "base_tree": parent["tree"]["sha"],
+        "tree": [{"path": path, "mode": "100644", "type": "blob", "content": content} for path, content in files.items()],
+    })
+    if tree["sha"] == parent["tree"]["sha"]:
+        logger.info(f"No changes to push to repo {full_name}")
+        return parent["sha"]
+    commit = gh.post(f"/repos/{full_name}/git/commits", json={
+        "message": commit_message,
+        "tree": tree["sha"],
+        "parents": [parent["sha"]],
+    })
+    gh.patch(f"/repos/{full_name}/git/refs/heads/{branch}", json={"sha": commit["sha"]})
+    logger.info(f"Pushed {len(files)} files to repo {full_name} in commit {commit['sha']}")
+    return commit["sha"]
+
 def create_and_push_to_repo(email: str, task_name: str, files: dict[str, str], round_num: int) -> tuple[str, str, str]:
     """
-    Creates a GitHub repository, pushes files to it, and enables GitHub Pages.
+    Creates a GitHub repository and pushes files to it. GitHub Pages is enabled by follow_pages_deployment.
     If the repo already exists, it updates the files in the existing repository, making this function suitable for both Round 1 and Round 2.
     """
     repo_name = f"{task_name}-{email.split('@')[0]}"
 
-    # Mock functionality if no token is provided
-    if g is None:
-        logger.warning("No GITHUB_TOKEN found, mocking GitHub API calls.")
+    # Mock functionality for the placeholder token
+    if client is None:
+        logger.warning("GITHUB_TOKEN is the placeholder, mocking GitHub API calls.")
         user_login = "mockuser"
         repo_url = f"https://github.com/{user_login}/{repo_name}"
         commit_sha = "mock_commit_sha"
@@ -41,16 +84,21 @@ def create_and_push_to_repo(email: str, task_name: str, files: dict[str, str], r
         logger.info(f"Mocked GitHub pages URL: {pages_url}")
         return repo_url, commit_sha, pages_url
 
+    if not files:
+        logger.error(f"No files generated for task {task_name}. Aborting.")
+        return None, None, None
+
+    user = client.get("/user")
     try:
-        user = g.get_user()
-        repo = user.get_repo(repo_name)
+        repo = client.get(f"/repos/{user['login']}/{repo_name}")
         logger.info(f"Repo {repo_name} already exists. Updating files.")
-    except GithubException as e:
+    except GitHubError as e:
         if e.status == 404:
             logger.info(f"Creating repo {repo_name}.")
             try:
-                repo = user.create_repo(repo_name, private=False)
-            except GithubException as create_e:
+                # auto_init gives the repo an initial commit; the Git Data API rejects empty repositories.
+                repo = client.post("/user/repos", json={"name": repo_name, "private": False, "auto_init": True})
+            except GitHubError as create_e:
                 logger.error(f"Failed to create repo {repo_name}: {create_e}")
                 raise create_e
         else:
@@ -60,46 +108,21 @@ def create_and_push_to_repo(email: str, task_name: str, files: dict[str, str], r
     commit_message = f"Round {round_num} submission"
     logger.info(f"Using commit message: {commit_message}")
 
-    try:
-        main_ref = repo.get_git_ref('heads/main')
-        latest_commit_sha = main_ref.object.sha
-        tree = repo.get_git_tree(latest_commit_sha, recursive=True)
-        file_shas = {item.path: item.sha for item in tree.tree}
-        logger.info(f"Found existing files in repo {repo_name}: {list(file_shas.keys())}")
-    except GithubException:
-        latest_commit_sha = None
-        file_shas = {}
-        logger.info(f"No existing files found in repo {repo_name}")
+    commit_sha = push_files(client, repo, files, commit_message)
 
-    if not files:
-        logger.error(f"No files generated for task {task_name}. Aborting.")
-        return None, None, None
+    pages_url = f"https://{user['login']}.github.io/{repo_name}/"
+
+    return repo["html_url"], commit_sha, pages_url
 
-    for path, content in files.items():
-        try:
-            if path in file_shas:
-                logger.info(f"Updating file {path} in repo {repo_name}")
-                repo.update_file(path, commit_message, content, file_shas[path], branch="main")
-            else:
-                logger.info(f"Creating file {path} in repo {repo_name}")
-                repo.create_file(path, commit_message, content, branch="main")
-        except GithubException as e:
-            logger.error(f"Failed to commit file {path} to repo {repo_name}: {e}")
-            # Continue to the next file
-            pass
-
-    for i in range(3):
-        try:
-            source = {"branch": "main", "path": "/"}
-            repo.enable_pages(source=source)
-            logger.info(f"Successfully enabled GitHub Pages for {repo_name}")
-            break
-        except GithubException as e:
-            logger.error(f"Failed to enable GitHub Pages for {repo_name} (attempt {i+1}/3): {e}")
-            time.sleep(2)
-
-    main_ref = repo.get_git_ref('heads/main')
-    commit_sha = main_ref.object.sha
-    pages_url = f"https://{user.login}.github.io/{repo_name}/"
-
-    return repo.html_url, commit_sha, pages_url
+def follow_pages_deployment(repo_url: str, commit_sha: str, on_deployed: Callable[[float], None], on_failed: Callable[[str], None]):
+    """
+    Enables GitHub Pages for the repo and calls on_deployed(build_seconds) once commit_sha is live,
+    or on_failed(reason) if the build fails. Polling happens in the background; this returns immediately.
+    """
+    if pages_follower is None:
+        logger.info(f"Mocked GitHub Pages deployment for {repo_url}")
+        on_deployed(0.0)
+        return
+    full_name = repo_url.split("github.com/", 1)[1]
+    repo = client.get(f"/repos/{full_name}")
+    pages_follower.follow(full_name, repo["default_branch"], commit_sha, on_deployed, on_failed)
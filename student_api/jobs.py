@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Callable, Optional
+
+from database.db_utils import execute, fetchone, fetchall, transaction
+from student_api.admission import AdmissionController
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Initial estimate of a job's run time, used for Retry-After until real durations are measured.
+JOB_SECONDS_ESTIMATE = 30.0
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+class Deferred:
+    """
+    Returned by a job handler whose remaining stages continue outside the worker pool.
+    The job stays running until complete_job or fail_job is called for it.
+    """
+
+def submission_key(payload: dict) -> tuple:
+    return payload["email"], payload["task"], payload["round"], payload["nonce"]
+
+def find_job(payload: dict) -> Optional[dict]:
+    """Returns the id and status of the job for the payload's (email, task, round, nonce), if there is one."""
+    return fetchone("SELECT id, status FROM jobs WHERE email=? AND task=? AND round=? AND nonce=?", submission_key(payload))
+
+def create_job(payload: dict, endpoint: str) -> tuple[str, bool]:
+    """
+    Returns the id of the job for the payload's (email, task, round, nonce) and whether the caller should run it.
+    A new submission gets a queued job and a failed one is re-queued; a queued, running or succeeded job is returned as is.
+    """
+    job_id = uuid.uuid4().hex
+    key = submission_key(payload)
+    execute(
+        "INSERT INTO jobs (id, email, task, round, nonce, status, request, endpoint) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(email, task, round, nonce) DO NOTHING",
+        (job_id, *key, QUEUED, json.dumps(payload), endpoint)
+    )
+    job = find_job(payload)
+    if job is None:
+        raise RuntimeError(f"Could not create a job for task {payload['task']}")
+    if job["id"] == job_id:
+        return job_id, True
+    if job["status"] != FAILED:
+        return job["id"], False
+    # Only one of several concurrent retries of a failed job wins the update.
+    with transaction() as conn:
+        requeued = conn.execute(
+            "UPDATE jobs SET status=?, stage=NULL, error=NULL, request=?, endpoint=?, updated_at=CURRENT_TIMESTAMP WHERE id=? AND status=?",
+            (QUEUED, json.dumps(payload), endpoint, job["id"], FAILED)
+        ).rowcount == 1
+    return job["id"], requeued
+
+def update_job(job_id: str, **fields):
+    """Updates the given columns of a job row."""
+    if "result" in fields and fields["result"] is not None:
+        fields["result"] = json.dumps(fields["result"])
+    columns = ", ".join(f"{name}=?" for name in fields)
+    execute(
+        f"UPDATE jobs SET {columns}, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+        (*fields.values(), job_id)
+    )
+
+def complete_job(job_id: str, result: dict):
+    """Marks a job as succeeded with its result."""
+    update_job(job_id, status=SUCCEEDED, stage=None, result=result)
+    logger.info(f"Job {job_id} completed.")
+
+def fail_job(job_id: str, error: str):
+    """Marks a job as failed, keeping the stage it failed in."""
+    update_job(job_id, status=FAILED, error=error)
+
+def get_deployment(job_id: str) -> Optional[dict]:
+    """
+    Returns the repo_url, commit_sha and pages_url of a job that had pushed its commit and was
+    waiting for (or notifying about) its Pages deployment, or None if it had not got that far.
+    """
+    return fetchone(
+        "SELECT repo_url, commit_sha, pages_url FROM jobs WHERE id=? AND stage IN ('deploy', 'notify') AND commit_sha IS NOT NULL",
+        (job_id,)
+    )
+
+def get_job(job_id: str) -> Optional[dict]:
+    """Returns the public view of a job, or None if it does not exist."""
+    row = fetchone("SELECT id, email, task, round, nonce, status, stage, result, error, created_at, updated_at FROM jobs WHERE id=?", (job_id,))
+    if row and row["result"]:
+        row["result"] = json.loads(row["result"])
+    return row
+
+class JobRunner:
+    """
+    Runs task jobs on a bounded pool of worker threads.
+    The handler is called as handler(job_id, payload, endpoint) and its return value is stored as the job result.
+    Jobs waiting for a worker are kept in a priority queue, later rounds first and then in arrival
+    order. With an admission controller, new requests are only queued while the queue has room
+    and their email and task have tokens left; otherwise submit raises Overloaded.
+    """
+
+    def __init__(self, handler: Callable[[str, dict, str], dict], max_workers: int = JOB_WORKERS, admission: AdmissionController = None):
+        self._handler = handler
+        self._max_workers = max_workers
+        self._admission = admission
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._futures = {}
+        self._pending = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        # Serializes the duplicate lookup, admission and job creation, so concurrent copies of one
+        # request are attached to a single job and only that job is charged a token.
+        self._submit_lock = threading.Lock()
+        self._job_seconds = JOB_SECONDS_ESTIMATE
+        self.duplicates = 0
+
+    def submit(self, payload: dict, endpoint: str) -> tuple[str, bool]:
+        """
+        Persists a job for the payload and schedules it on the worker pool. Returns the job id and
+        whether a new run was scheduled; a repeated submission is attached to its existing job
+        without going through admission.
+        """
+        with self._submit_lock:
+            existing = find_job(payload)
+            if existing is None or existing["status"] == FAILED:
+                if self._admission:
+                    with self._lock:
+                        queued = len(self._pending)
+                        drain_seconds = self._job_seconds / self._max_workers
+                    self._admission.admit(payload, queued, drain_seconds)
+                job_id, created = create_job(payload, endpoint)
+            else:
+                job_id, created = existing["id"], False
+        if created:
+            self._schedule(job_id, payload, endpoint)
+        else:
+            self.duplicates += 1
+            logger.info(f"Attached repeated request for task {payload['task']} (nonce {payload['nonce']}) to job {job_id}")
+        return job_id, created
+
+    def _schedule(self, job_id: str, payload: dict, endpoint: str):
+        future = Future()
+        with self._lock:
+            heapq.heappush(self._pending, (-payload.get("round", 1), next(self._seq), job_id, payload, endpoint, future))
+            self._futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget(job_id))
+        # Each executor task runs whichever queued job has the highest priority when a worker frees up.
+        self._executor.submit(self._run_next)
+
+    def _forget(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _run_next(self):
+        with self._lock:
+            _, _, job_id, payload, endpoint, future = heapq.heappop(self._pending)
+        start = time.monotonic()
+        try:
+            self._run(job_id, payload, endpoint)
+        finally:
+            with self._lock:
+                self._job_seconds = 0.8 * self._job_seconds + 0.2 * (time.monotonic() - start)
+            future.set_result(None)
+
+    def _run(self, job_id: str, payload: dict, endpoint: str):
+        update_job(job_id, status=RUNNING)
+        try:
+            result = self._handler(job_id, payload, endpoint)
+        except Exception as e:
+            logger.error(f"Job {job_id} for task {payload.get('task')} failed: {e}", exc_info=True)
+            fail_job(job_id, str(e))
+        else:
+            if not isinstance(result, Deferred):
+                complete_job(job_id, result)
+
+    def recover(self):
+        """
+        Re-schedules jobs that were queued or running when the process last stopped. The handler
+        can resume from the job's stored stage, see get_deployment.
+        """
+        for job in fetchall("SELECT id, request, endpoint FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)):
+            logger.info(f"Resuming interrupted job {job['id']}")
+            self._schedule(job["id"], json.loads(job["request"]), job["endpoint"])
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Blocks until the job's handler has returned (or the timeout expires) and returns the job's current state.
+        A deferred job may still be running at that point.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            wait_futures([future], timeout=timeout)
+        return get_job(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"scheduled": len(self._futures), "queued": len(self._pending), "duplicates": self.duplicates}
+        if self._admission:
+            stats["admission"] = self._admission.stats()
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Stops accepting new jobs and optionally waits for running ones."""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from database.db_utils import execute, fetchone
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+logger = logging.getLogger(__name__)
+
+def cache_key(*parts) -> str:
+    """Returns a stable content hash of the given JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+class LLMCache:
+    """
+    A persistent, content-addressed cache of model responses stored in the llm_cache table.
+    Entries expire after `ttl` seconds and the least recently used ones are evicted once the
+    cache holds more than `max_bytes`. Concurrent misses for the same key are coalesced so only
+    one caller runs the computation while the others wait for its result.
+    """
+
+    def __init__(self, namespace: str, ttl: float = LLM_CACHE_TTL, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for key, or None if it is missing or expired."""
+        now = time.time()
+        row = fetchone("SELECT response, created_at FROM llm_cache WHERE key=?", (self._key(key),))
+        if row is None:
+            return None
+        if row["created_at"] < now - self.ttl:
+            execute("DELETE FROM llm_cache WHERE key=?", (self._key(key),))
+            return None
+        execute("UPDATE llm_cache SET last_used_at=? WHERE key=?", (now, self._key(key)))
+        return row["response"]
+
+    def put(self, key: str, response: str):
+        """Stores a response and evicts the least recently used entries beyond max_bytes."""
+        now = time.time()
+        execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+            (self._key(key), response, len(response.encode()), now, now)
+        )
+        execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used_at DESC, key) AS total FROM llm_cache) WHERE total > ?"
+            ")",
+            (self.max_bytes,)
+        )
+
+    def _get_valid(self, key: str, valid: Optional[Callable[[str], bool]]) -> Optional[str]:
+        response = self.get(key)
+        if response is not None and valid is not None and not valid(response):
+            return None
+        return response
+
+    def get_or_compute(self, key: str, compute: Callable[[], str], valid: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Returns the cached response for key, computing and storing it once on a miss.
+        With a valid(response) predicate, only responses it accepts are stored or served from the
+        cache; a rejected one is still returned to the callers waiting on it.
+        """
+        response = self._get_valid(key, valid)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            self.coalesced += 1
+            return future.result()
+
+        try:
+            response = self._get_valid(key, valid)
+            if response is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                response = compute()
+                if response is not None and (valid is None or valid(response)):
+                    self.put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from database.db_utils import execute, fetchall
+
+NOTIFY_POOL_SIZE = int(os.getenv("NOTIFY_POOL_SIZE", "10"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT", "10"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "8"))
+NOTIFY_BACKOFF_BASE = float(os.getenv("NOTIFY_BACKOFF_BASE", "2"))
+NOTIFY_BACKOFF_MAX = float(os.getenv("NOTIFY_BACKOFF_MAX", "600"))
+# A claimed notification is retried by another sender if it is not settled within the lease.
+NOTIFY_LEASE = 120
+BATCH_SIZE = 50
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+logger = logging.getLogger(__name__)
+
+def _make_session() -> requests.Session:
+    adapter = HTTPAdapter(pool_connections=NOTIFY_POOL_SIZE, pool_maxsize=NOTIFY_POOL_SIZE)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+# Shared keep-alive session for evaluation callbacks, with a bounded connection pool per host.
+http = _make_session()
+
+def enqueue_notification(url: str, payload: dict) -> int:
+    """Persists a notification for delivery by the sender and returns its id. Raises if it could not be stored."""
+    notification_id = execute(
+        "INSERT INTO notifications (url, payload, status, next_attempt_at) VALUES (?, ?, ?, ?)",
+        (url, json.dumps(payload), PENDING, time.time())
+    )
+    if notification_id is None:
+        raise RuntimeError(f"Could not queue the notification for {url}")
+    sender.wake()
+    return notification_id
+
+def notification_stats() -> dict:
+    """Returns the number of notifications in each state."""
+    rows = fetchall("SELECT status, COUNT(*) AS count FROM notifications GROUP BY status")
+    return {row["status"]: row["count"] for row in rows}
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given number of failed attempts."""
+    return random.uniform(0, min(NOTIFY_BACKOFF_MAX, NOTIFY_BACKOFF_BASE ** attempts))
+
+class NotificationSender:
+    """
+    Drains the notifications table in the background.
+    Due rows are claimed atomically with a lease, posted concurrently over the shared session and
+    rescheduled with exponential backoff on failure; after NOTIFY_MAX_ATTEMPTS they are dead-lettered.
+    Pending rows survive restarts and are picked up again when the sender starts.
+    """
+
+    def __init__(self, workers: int = NOTIFY_WORKERS, poll_interval: float = 5.0):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify")
+        self._poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notification-sender", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                sent = self.send_due()
+            except Exception as e:
+                logger.error(f"Notification sender error: {e}", exc_info=True)
+                sent = 0
+            if sent < BATCH_SIZE:
+                self._wakeup.wait(self._poll_interval)
+                self._wakeup.clear()
+
+    def _claim(self) -> list[dict]:
+        now = time.time()
+        return fetchall(
+            "UPDATE notifications SET next_attempt_at=? WHERE id IN ("
+            "SELECT id FROM notifications WHERE status=? AND next_attempt_at<=? ORDER BY next_attempt_at LIMIT ?"
+            ") RETURNING id, url, payload, attempts",
+            (now + NOTIFY_LEASE, PENDING, now, BATCH_SIZE)
+        )
+
+    def send_due(self) -> int:
+        """Claims and delivers every due notification in one batch. Returns the number claimed."""
+        batch = self._claim()
+        list(self._executor.map(self._deliver, batch))
+        return len(batch)
+
+    def _deliver(self, notification: dict):
+        payload = json.loads(notification["payload"])
+        try:
+            response = http.post(notification["url"], json=payload, timeout=NOTIFY_TIMEOUT)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            attempts = notification["attempts"] + 1
+            if attempts >= NOTIFY_MAX_ATTEMPTS:
+                execute("UPDATE notifications SET status=?, attempts=?, last_error=? WHERE id=?", (DEAD, attempts, str(e), notification["id"]))
+                logger.error(f"Dead-lettered notification {notification['id']} for task {payload.get('task')} after {attempts} attempts: {e}")
+            else:
+                execute("UPDATE notifications SET attempts=?, last_error=?, next_attempt_at=? WHERE id=?", (attempts, str(e), time.time() + backoff_delay(attempts), notification["id"]))
+                logger.warning(f"Failed to notify evaluation service for task {payload.get('task')} (attempt {attempts}): {e}")
+        else:
+            execute("UPDATE notifications SET status=?, attempts=?, sent_at=CURRENT_TIMESTAMP WHERE id=?", (SENT, notification["attempts"] + 1, notification["id"]))
+            logger.info(f"Successfully notified evaluation service for task: {payload.get('task')}")
+
+sender = NotificationSender()
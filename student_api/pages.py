@@ -0,0 +1,149 @@
+import os
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+from student_api.github_client import GitHubClient, GitHubError
+
+PAGES_POLL_INITIAL_DELAY = float(os.getenv("PAGES_POLL_INITIAL_DELAY", "5"))
+PAGES_POLL_MAX_DELAY = float(os.getenv("PAGES_POLL_MAX_DELAY", "60"))
+PAGES_DEPLOY_TIMEOUT = float(os.getenv("PAGES_DEPLOY_TIMEOUT", "900"))
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Deployment:
+    full_name: str
+    branch: str
+    commit_sha: str
+    on_deployed: Callable[[float], None]
+    on_failed: Callable[[str], None]
+    started_at: float = field(default_factory=time.monotonic)
+    delay: float = PAGES_POLL_INITIAL_DELAY
+    pages_enabled: bool = False
+
+class PagesFollower:
+    """
+    Enables GitHub Pages and polls the latest Pages build of each pushed commit in the background.
+    A single thread serves every deployment from a schedule ordered by next poll time, backing off
+    exponentially between polls. on_deployed(build_seconds) runs once the build for the commit, or
+    for a newer commit that contains it, is live; on_failed(reason) runs if that build errors or
+    none finishes within the timeout.
+    """
+
+    def __init__(self, gh: GitHubClient, initial_delay: float = PAGES_POLL_INITIAL_DELAY,
+                 max_delay: float = PAGES_POLL_MAX_DELAY, timeout: float = PAGES_DEPLOY_TIMEOUT):
+        self._gh = gh
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._timeout = timeout
+        self._schedule = []
+        self._sequence = itertools.count()
+        self._wakeup = threading.Condition()
+        self._callbacks = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pages-callback")
+        self._thread = None
+        self.deployed = 0
+        self.failed = 0
+        self.build_seconds_total = 0.0
+        self.build_seconds_max = 0.0
+
+    def stats(self) -> dict:
+        """Returns deployment counts and build latency figures."""
+        return {
+            "pending": len(self._schedule),
+            "deployed": self.deployed,
+            "failed": self.failed,
+            "build_seconds_mean": round(self.build_seconds_total / self.deployed, 3) if self.deployed else None,
+            "build_seconds_max": round(self.build_seconds_max, 3),
+        }
+
+    def follow(self, full_name: str, branch: str, commit_sha: str, on_deployed: Callable[[float], None], on_failed: Callable[[str], None]):
+        """Starts following the Pages deployment of commit_sha, served from branch of repo full_name."""
+        deployment = Deployment(full_name, branch, commit_sha, on_deployed, on_failed, delay=self._initial_delay)
+        self._enqueue(deployment, 0)
+        with self._wakeup:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pages-follower", daemon=True)
+                self._thread.start()
+
+    def _enqueue(self, deployment: Deployment, delay: float):
+        with self._wakeup:
+            heapq.heappush(self._schedule, (time.monotonic() + delay, next(self._sequence), deployment))
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._schedule or self._schedule[0][0] > time.monotonic():
+                    self._wakeup.wait(self._schedule[0][0] - time.monotonic() if self._schedule else None)
+                _, _, deployment = heapq.heappop(self._schedule)
+            try:
+                self._poll(deployment)
+            except Exception as e:
+                logger.error(f"Error polling Pages build for {deployment.full_name}: {e}", exc_info=True)
+                self._retry(deployment)
+
+    def _enable(self, deployment: Deployment):
+        try:
+            self._gh.post(f"/repos/{deployment.full_name}/pages", json={"source": {"branch": deployment.branch, "path": "/"}})
+            logger.info(f"Successfully enabled GitHub Pages for {deployment.full_name}")
+        except GitHubError as e:
+            if e.status != 409:
+                raise
+        deployment.pages_enabled = True
+
+    def _poll(self, deployment: Deployment):
+        if not deployment.pages_enabled:
+            self._enable(deployment)
+        try:
+            build = self._gh.get(f"/repos/{deployment.full_name}/pages/builds/latest")
+        except GitHubError as e:
+            if e.status != 404:
+                raise
+            build = {}
+
+        status = build.get("status")
+        if status not in ("built", "errored") or not self._contains(deployment, build.get("commit")):
+            self._retry(deployment)
+        elif status == "built":
+            build_seconds = time.monotonic() - deployment.started_at
+            self.deployed += 1
+            self.build_seconds_total += build_seconds
+            self.build_seconds_max = max(self.build_seconds_max, build_seconds)
+            logger.info(f"GitHub Pages for {deployment.full_name} deployed in {build_seconds:.1f}s")
+            self._callbacks.submit(deployment.on_deployed, build_seconds)
+        else:
+            message = (build.get("error") or {}).get("message") or "Pages build errored"
+            self._fail(deployment, message)
+
+    def _contains(self, deployment: Deployment, build_commit: str) -> bool:
+        """Whether the built commit is the deployment's commit or a later one on top of it (a newer push)."""
+        if not build_commit:
+            return False
+        if build_commit == deployment.commit_sha:
+            return True
+        try:
+            comparison = self._gh.get(f"/repos/{deployment.full_name}/compare/{deployment.commit_sha}...{build_commit}")
+        except GitHubError as e:
+            if e.status != 404:
+                raise
+            return False
+        return comparison.get("status") in ("ahead", "identical")
+
+    def _retry(self, deployment: Deployment):
+        if time.monotonic() - deployment.started_at > self._timeout:
+            self._fail(deployment, f"Pages build not deployed within {self._timeout:.0f}s")
+            return
+        delay = deployment.delay
+        deployment.delay = min(deployment.delay * 2, self._max_delay)
+        self._enqueue(deployment, delay)
+
+    def _fail(self, deployment: Deployment, reason: str):
+        self.failed += 1
+        logger.error(f"GitHub Pages deployment for {deployment.full_name} failed: {reason}")
+        self._callbacks.submit(deployment.on_failed, reason)
@@ -1,17 +1,99 @@
 import base64
 import os
+import io
 import json
 import csv
 import logging
+from typing import Iterator
 
-def process_attachments(attachments: list[dict]) -> dict:
+# Attachments that decode to more than this many bytes are skipped.
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(10 * 1024 * 1024)))
+# Number of base64 characters decoded at a time; a multiple of 4.
+DECODE_CHUNK_SIZE = 64 * 1024
+
+class AttachmentTooLarge(ValueError):
+    """An attachment decodes to more than the configured size cap."""
+
+def decoded_size_limit(url: str) -> int:
+    """Returns an upper bound on the decoded size of a base64 data URI, from its length alone."""
+    return (len(url) - url.index(",") - 1) * 3 // 4
+
+def iter_decoded(url: str, max_bytes: int = None, chunk_size: int = DECODE_CHUNK_SIZE) -> Iterator[bytes]:
     """
-    Processes the attachments by decoding them and saving them to a temporary directory.
-    For image files, it returns the data URI directly.
+    Decodes the base64 payload of a data URI in chunks, without copying the whole payload.
+    Missing padding and embedded whitespace are tolerated. Raises AttachmentTooLarge before decoding
+    anything if the payload could decode to more than max_bytes, ATTACHMENT_MAX_BYTES by default.
+    """
+    max_bytes = ATTACHMENT_MAX_BYTES if max_bytes is None else max_bytes
+    if decoded_size_limit(url) - 2 > max_bytes:
+        raise AttachmentTooLarge(f"attachment exceeds {max_bytes} bytes")
+    pending = ""
+    for offset in range(url.index(",") + 1, len(url), chunk_size):
+        chunk = pending + "".join(url[offset:offset + chunk_size].split())
+        usable = len(chunk) - len(chunk) % 4
+        pending = chunk[usable:]
+        if usable:
+            yield base64.b64decode(chunk[:usable])
+    if pending.rstrip("="):
+        yield base64.b64decode(pending + "=" * (-len(pending) % 4))
+
+class DecodedStream(io.RawIOBase):
+    """A read-only binary stream over the chunks produced by iter_decoded."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+def open_text(url: str, encoding: str = "utf-8-sig") -> io.TextIOWrapper:
+    """Opens the payload of a data URI as a text stream that is decoded as it is read."""
+    return io.TextIOWrapper(io.BufferedReader(DecodedStream(iter_decoded(url))), encoding=encoding, newline="")
+
+def read_bytes(url: str) -> bytes:
+    """Decodes the whole payload of a data URI, enforcing the size cap."""
+    return b"".join(iter_decoded(url))
+
+def open_source(source: str) -> io.TextIOWrapper:
+    """Opens a data URI or a file path as text."""
+    if source.startswith("data:"):
+        return open_text(source)
+    return open(source, "r", encoding="utf-8-sig", newline="")
+
+class CSVAttachment:
+    """
+    The rows of a CSV attachment as dicts, read from a data URI or a stored file. Rows are parsed
+    lazily on each iteration, so only one chunk of the attachment is held in memory at a time.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+
+    def __iter__(self) -> Iterator[dict]:
+        with open_source(self.source) as f:
+            yield from csv.DictReader(f)
+
+def process_attachments(attachments: list[dict], scratch=None) -> dict:
+    """
+    Processes the attachments by decoding them in a streaming fashion.
+    For image files, it returns the data URI directly. CSV files become a lazily parsed
+    CSVAttachment, JSON files are parsed from the decoded bytes and Markdown files are decoded to text.
+    If a scratch directory from the attachment store is given, every other attachment is stored and
+    linked into it, and the results are read from there; they are only valid while it exists.
     """
     processed_data = {}
-    temp_dir = "temp"
-    os.makedirs(temp_dir, exist_ok=True)
 
     for attachment in attachments:
         name = attachment["name"]
@@ -22,42 +104,21 @@ def process_attachments(attachments: list[dict]) -> dict:
             continue
 
         try:
-            header, encoded = url.split(",", 1)
-            # Add padding if it's missing
-            padding = len(encoded) % 4
-            if padding != 0:
-                encoded += "=" * (4 - padding)
-            data = base64.b64decode(encoded)
-        except (ValueError, TypeError) as e:
-            logging.error(f"Error decoding attachment {name}: {e}")
-            continue
-
-        file_path = os.path.join(temp_dir, name)
-        try:
-            with open(file_path, "wb") as f:
-                f.write(data)
-        except IOError as e:
-            logging.error(f"Error writing attachment {name} to file: {e}")
-            continue
-
-        if name.endswith(".csv"):
-            try:
-                with open(file_path, "r", encoding='utf-8-sig') as f:
-                    reader = csv.DictReader(f)
-                    processed_data[name] = [row for row in reader]
-            except (IOError, csv.Error) as e:
-                logging.error(f"Error processing CSV {name}: {e}")
-        elif name.endswith(".json"):
-            try:
-                with open(file_path, "r") as f:
+            source = scratch.add(name, url) if scratch else url
+            if name.endswith(".csv"):
+                # Reading the header checks the size cap and the encoding up front.
+                with open_source(source) as f:
+                    next(csv.reader(f), None)
+                processed_data[name] = CSVAttachment(source)
+            elif name.endswith(".json"):
+                with open_source(source) as f:
                     processed_data[name] = json.load(f)
-            except (IOError, json.JSONDecodeError) as e:
-                logging.error(f"Error processing JSON {name}: {e}")
-        elif name.endswith(".md"):
-            try:
-                with open(file_path, "r") as f:
+            elif name.endswith(".md"):
+                with open_source(source) as f:
                     processed_data[name] = f.read()
-            except IOError as e:
-                logging.error(f"Error reading Markdown file {name}: {e}")
+        except AttachmentTooLarge as e:
+            logging.error(f"Skipping attachment {name}: {e}")
+        except (ValueError, TypeError, IOError, csv.Error) as e:
+            logging.error(f"Error processing attachment {name}: {e}")
 
-    return processed_data
\ No newline at end of file
+    return processed_data
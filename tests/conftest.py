@@ -0,0 +1,15 @@
+import os
+import shutil
+import tempfile
+
+# Tests must never touch the operator's database/tasks.db, so every connection is pointed at a
+# scratch database before any test module imports database.db_utils.
+_DB_DIR = tempfile.mkdtemp(prefix="auto-app-tests-")
+os.environ["DB_PATH"] = os.path.join(_DB_DIR, "tasks.db")
+# GitHub is mocked unless a real token is configured; the job tests also stub the Pages follower.
+os.environ.setdefault("GITHUB_TOKEN", "your_github_token")
+# The student API refuses to start without a secret; requests in the tests read it back from the environment.
+os.environ.setdefault("API_SECRET", "test-secret")
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
@@ -0,0 +1,163 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _sha(*parts) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def deploy_now(repo_url, commit_sha, on_deployed, on_failed):
+    """Stands in for follow_pages_deployment in job tests: the site is live immediately."""
+    on_deployed(0.0)
+
+class FakeGitHub:
+    """
+    An in-process stand-in for the parts of the GitHub REST API used by the student API.
+    It tracks a rate-limit budget, answers conditional GETs with 304 and records every call.
+    """
+
+    def __init__(self, limit: int = 5000):
+        self.limit = limit
+        self.remaining = limit
+        self.calls = []
+        self.repos = {}
+        self.trees = {}
+        self.commits = {}
+        self.pages = set()
+        # Number of polls of the latest Pages build that report "building" before it is "built".
+        self.build_polls = 2
+        self._build_polls_seen = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, method: str, pattern: str = "") -> int:
+        return sum(1 for m, path in self.calls if m == method and re.search(pattern, path))
+
+    def _commit(self, files: dict, parent: str = None) -> str:
+        tree_sha = _sha(files)
+        self.trees[tree_sha] = files
+        commit_sha = _sha(tree_sha, parent)
+        self.commits[commit_sha] = {"sha": commit_sha, "tree": {"sha": tree_sha}, "parents": [parent] if parent else []}
+        return commit_sha
+
+    def handle(self, method: str, path: str, body: dict):
+        match = re.match(r"^/repos/fakeuser/([^/]+)(.*)$", path)
+        if method == "GET" and path == "/user":
+            return 200, {"login": "fakeuser"}
+        if method == "POST" and path == "/user/repos":
+            name = body["name"]
+            self.repos[name] = {
+                "name": name, "full_name": f"fakeuser/{name}", "default_branch": "main",
+                "html_url": f"https://github.com/fakeuser/{name}",
+                "head": self._commit({"README.md": name}),
+            }
+            return 201, self._public(name)
+        if not match or match.group(1) not in self.repos:
+            return 404, {"message": "Not Found"}
+        name, rest = match.groups()
+        repo = self.repos[name]
+        if method == "GET" and rest == "":
+            return 200, self._public(name)
+        if method == "GET" and rest == "/git/ref/heads/main":
+            return 200, {"ref": "refs/heads/main", "object": {"sha": repo["head"]}}
+        if method == "GET" and rest.startswith("/git/commits/"):
+            return 200, self.commits[rest.rsplit("/", 1)[1]]
+        if method == "GET" and rest.startswith("/compare/"):
+            base, head = rest[len("/compare/"):].split("...")
+            if base not in self.commits or head not in self.commits:
+                return 404, {"message": "Not Found"}
+            return 200, {"status": "identical" if base == head else "ahead" if self._is_ancestor(base, head) else "diverged"}
+        if method == "POST" and rest == "/git/trees":
+            files = dict(self.trees[body["base_tree"]])
+            files.update({element["path"]: element["content"] for element in body["tree"]})
+            tree_sha = _sha(files)
+            self.trees[tree_sha] = files
+            return 201, {"sha": tree_sha}
+        if method == "POST" and rest == "/git/commits":
+            commit_sha = _sha(body["tree"], body["parents"][0])
+            self.commits[commit_sha] = {"sha": commit_sha, "tree": {"sha": body["tree"]}, "parents": body["parents"]}
+            return 201, {"sha": commit_sha}
+        if method == "PATCH" and rest == "/git/refs/heads/main":
+            repo["head"] = body["sha"]
+            return 200, {"ref": "refs/heads/main", "object": {"sha": body["sha"]}}
+        if method == "POST" and rest == "/pages":
+            if name in self.pages:
+                return 409, {"message": "GitHub Pages is already enabled."}
+            self.pages.add(name)
+            return 201, {"url": f"https://fakeuser.github.io/{name}/"}
+        if method == "GET" and rest == "/pages/builds/latest":
+            if name not in self.pages:
+                return 404, {"message": "Not Found"}
+            key = (name, repo["head"])
+            self._build_polls_seen[key] = self._build_polls_seen.get(key, 0) + 1
+            status = "built" if self._build_polls_seen[key] > self.build_polls else "building"
+            return 200, {"status": status, "commit": repo["head"]}
+        return 404, {"message": "Not Found"}
+
+    def _is_ancestor(self, base: str, head: str) -> bool:
+        commits = [head]
+        while commits:
+            sha = commits.pop()
+            if sha == base:
+                return True
+            commits.extend(self.commits[sha]["parents"])
+        return False
+
+    def files(self, name: str) -> dict:
+        repo = self.repos[name]
+        return self.trees[self.commits[repo["head"]]["tree"]["sha"]]
+
+    def _public(self, name: str) -> dict:
+        return {key: value for key, value in self.repos[name].items() if key != "head"}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                with fake._lock:
+                    fake.calls.append((self.command, self.path))
+                    status, payload = fake.handle(self.command, self.path, body)
+                    data = json.dumps(payload).encode()
+                    etag = f'"{hashlib.md5(data).hexdigest()}"'
+                    not_modified = self.command == "GET" and status == 200 and self.headers.get("If-None-Match") == etag
+                    if not not_modified:
+                        fake.remaining -= 1
+                    headers = {
+                        "X-RateLimit-Limit": str(fake.limit),
+                        "X-RateLimit-Remaining": str(fake.remaining),
+                        "X-RateLimit-Reset": str(int(time.time()) + 3600),
+                    }
+                if not_modified:
+                    self.send_response(304)
+                    data = b""
+                else:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                if self.command == "GET" and status == 200:
+                    self.send_header("ETag", etag)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = _respond
+
+        return Handler
@@ -0,0 +1,104 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FILES = {
+    "index.html": "<html><body><p>__CAPTCHA_SOLUTION__</p></body></html>",
+    "README.md": "# Captcha solver",
+    "LICENSE": "MIT License",
+}
+
+def completion_text(files: dict = FILES) -> str:
+    languages = {"index.html": "html", "README.md": "markdown", "LICENSE": "text"}
+    return "\n\n".join(f"```{languages[name]}\n<!-- {name} -->\n{content}\n```" for name, content in files.items())
+
+class FakeOpenAI:
+    """
+    An in-process stand-in for the chat completions endpoint.
+    Vision requests (image content) answer with captcha_answer; other requests answer with text,
+    streamed as server-sent events in chunk_size pieces when stream is set. latency is added before
+    the first byte and chunk_delay between chunks, so streaming behaves like a slow model.
+    """
+
+    def __init__(self, text: str = None, captcha_answer: str = "XK42", latency: float = 0.0,
+                 chunk_size: int = 16, chunk_delay: float = 0.0):
+        self.text = text if text is not None else completion_text()
+        self.captcha_answer = captcha_answer
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, kind: str) -> int:
+        return sum(1 for request in self.requests if request == kind)
+
+    def _answer(self, body: dict) -> tuple[str, str]:
+        content = body["messages"][-1]["content"]
+        if isinstance(content, list):
+            return "vision", self.captcha_answer
+        return "completion", self.text
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, text: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(text), fake.chunk_size):
+                    self._send_event({"choices": [{"index": 0, "delta": {"content": text[i:i + fake.chunk_size]}, "finish_reason": None}]})
+                    time.sleep(fake.chunk_delay)
+                self._send_event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _send_event(self, chunk: dict):
+                chunk.update({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": "fake"})
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                kind, text = fake._answer(body)
+                with fake._lock:
+                    fake.requests.append(kind)
+                time.sleep(fake.latency)
+                if body.get("stream"):
+                    self._send_stream(text)
+                else:
+                    self._send_json({
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": "fake",
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                    })
+
+        return Handler
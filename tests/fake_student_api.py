@@ -0,0 +1,62 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeStudentAPI:
+    """
+    An in-process stand-in for a student's task endpoint.
+    Each POST is answered with `status` after `latency` seconds; the first `failures` requests for
+    each email get a 503 first. Received payloads are recorded.
+    """
+
+    def __init__(self, status: int = 202, latency: float = 0.0, failures: int = 0):
+        self.status = status
+        self.latency = latency
+        self.failures = failures
+        self.received = []
+        self.attempts = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}/api-endpoint"
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                    attempt = fake.attempts[payload["email"]] = fake.attempts.get(payload["email"], 0) + 1
+                time.sleep(fake.latency)
+                status = 503 if attempt <= fake.failures else fake.status
+                with fake._lock:
+                    fake.in_flight -= 1
+                    if status == fake.status:
+                        fake.received.append(payload)
+                data = json.dumps({"status": "accepted"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,139 @@
+import os
+import time
+import uuid
+import threading
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from student_api.admission import AdmissionController, Overloaded
+from student_api.app import app, job_runner
+from student_api.jobs import JobRunner
+from database.db_utils import init_db
+from tests.fake_github import deploy_now
+
+client = TestClient(app)
+
+def payload(email: str = "adm@example.com", task: str = "adm-task", round_num: int = 1) -> dict:
+    return {
+        "email": email,
+        "secret": os.getenv("API_SECRET"),
+        "task": task,
+        "round": round_num,
+        "nonce": uuid.uuid4().hex,
+        "brief": "Test brief",
+        "checks": [],
+        "evaluation_url": "http://example.com/evaluate",
+        "attachments": [],
+    }
+
+def test_token_buckets_limit_each_email_and_task():
+    """
+    Tests that an email or task over its burst is rejected with the time until its next token,
+    and that a rejected request does not consume tokens.
+    """
+    admission = AdmissionController(email_rate=0.5, email_burst=2, task_rate=0.25, task_burst=3)
+    admission.admit(payload("a@example.com"), 0, 1)
+    admission.admit(payload("a@example.com"), 0, 1)
+    with pytest.raises(Overloaded) as rejected:
+        admission.admit(payload("a@example.com"), 0, 1)
+    assert rejected.value.retry_after == 2
+
+    admission.admit(payload("b@example.com"), 0, 1)
+    with pytest.raises(Overloaded) as rejected:
+        admission.admit(payload("c@example.com"), 0, 1)
+    assert rejected.value.retry_after == 4
+    admission.admit(payload("c@example.com", task="other-task"), 0, 1)
+    assert admission.stats() == {"admitted": 4, "rejected": 2, "buckets": 5}
+
+def test_refilled_buckets_are_dropped():
+    """
+    Tests that buckets which have refilled completely are pruned, while those still recovering are kept.
+    """
+    admission = AdmissionController(email_rate=100, email_burst=1, task_rate=0.01, task_burst=5, prune_interval=0)
+    admission.admit(payload("a@example.com"), 0, 1)
+    time.sleep(0.05)
+    admission.admit(payload("b@example.com"), 0, 1)
+    assert set(admission._emails) == {"b@example.com"}
+    assert set(admission._tasks) == {"adm-task"}
+
+def test_concurrent_duplicates_are_charged_once():
+    """
+    Tests that simultaneous copies of one new request share a job and spend a single token.
+    """
+    init_db()
+    admission = AdmissionController(email_burst=1, email_rate=0.01)
+    runner = JobRunner(lambda job_id, data, endpoint: {"status": "success"}, admission=admission)
+    data = payload("dup@example.com")
+    results, errors = [], []
+    start = threading.Barrier(5)
+
+    def submit():
+        start.wait()
+        try:
+            results.append(runner.submit(data, "http://localhost/api-endpoint"))
+        except Overloaded as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=submit) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    runner.shutdown()
+
+    assert not errors
+    assert len({job_id for job_id, _ in results}) == 1
+    assert sum(created for _, created in results) == 1
+    assert admission.stats()["admitted"] == 1
+
+def test_full_queue_is_rejected_and_later_rounds_run_first():
+    """
+    Tests that requests beyond the queue bound are rejected, that queued round 2 jobs run before
+    round 1 ones, and that a repeated request is attached even when the queue is full.
+    """
+    init_db()
+    release = threading.Event()
+    order = []
+
+    def handler(job_id, data, endpoint):
+        release.wait(10)
+        order.append((data["email"], data["round"]))
+        return {"status": "success"}
+
+    runner = JobRunner(handler, max_workers=1, admission=AdmissionController(max_queue=2, email_burst=10, task_burst=10))
+    first = payload("q0@example.com")
+    runner.submit(first, "http://localhost/api-endpoint")
+    for _ in range(100):
+        if not runner.stats()["queued"]:
+            break
+        time.sleep(0.01)
+    queued = [payload("q1@example.com"), payload("q2@example.com", round_num=2)]
+    job_ids = [runner.submit(data, "http://localhost/api-endpoint")[0] for data in queued]
+    with pytest.raises(Overloaded):
+        runner.submit(payload("q3@example.com"), "http://localhost/api-endpoint")
+    assert runner.submit(queued[0], "http://localhost/api-endpoint") == (job_ids[0], False)
+
+    release.set()
+    for job_id in job_ids:
+        runner.wait(job_id, timeout=10)
+    runner.shutdown()
+    assert order == [("q0@example.com", 1), ("q2@example.com", 2), ("q1@example.com", 1)]
+
+@patch("student_api.app.follow_pages_deployment", deploy_now)
+@patch("student_api.app.generate_app")
+@patch("student_api.app.create_and_push_to_repo")
+def test_api_answers_429_with_retry_after(mock_create_and_push_to_repo, mock_generate_app, monkeypatch):
+    """
+    Tests that the API rejects a request over the email's rate with 429 and a Retry-After header.
+    """
+    init_db()
+    mock_generate_app.return_value = {"index.html": "<html></html>"}
+    mock_create_and_push_to_repo.return_value = ("https://github.com/user/adm", "sha", "https://user.github.io/adm/")
+    monkeypatch.setattr(job_runner, "_admission", AdmissionController(email_rate=0.01, email_burst=1))
+
+    accepted = client.post("/api-endpoint", json=payload())
+    rejected = client.post("/api-endpoint", json=payload())
+    assert accepted.status_code == 202
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "100"
+    job_runner.wait(accepted.json()["job_id"], timeout=10)
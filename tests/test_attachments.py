@@ -0,0 +1,97 @@
+import os
+import time
+import base64
+import pytest
+from student_api import utils
+from student_api.utils import process_attachments, iter_decoded, AttachmentTooLarge
+from student_api.attachments import AttachmentStore
+
+def data_uri(data: bytes, mime: str = "text/plain") -> str:
+    return f"data:{mime};base64," + base64.b64encode(data).decode()
+
+def test_decoding_across_chunks_and_without_padding():
+    """
+    Tests that chunked decoding matches a one-shot decode, including unpadded and wrapped payloads.
+    """
+    data = bytes(range(256)) * 41
+    uri = data_uri(data).rstrip("=")
+    assert b"".join(iter_decoded(uri, chunk_size=12)) == data
+    wrapped = "data:text/plain;base64," + "\n".join(uri.split(",", 1)[1][i:i + 76] for i in range(0, len(uri), 76))
+    assert b"".join(iter_decoded(wrapped, chunk_size=10)) == data
+
+def test_process_attachments_parses_csv_lazily_and_json_in_memory():
+    """
+    Tests that CSV rows are parsed on iteration, and JSON and Markdown are decoded without temp files.
+    """
+    csv_data = "﻿name,score\n" + "".join(f"s{i},{i}\n" for i in range(1000))
+    processed = process_attachments([
+        {"name": "data.csv", "url": data_uri(csv_data.encode(), "text/csv")},
+        {"name": "rates.json", "url": data_uri(b'{"USD": 1.0}', "application/json")},
+        {"name": "notes.md", "url": data_uri("# Notes ✓".encode())},
+        {"name": "sample.png", "url": "data:image/png;base64,aGVsbG8="},
+    ])
+    rows = list(processed["data.csv"])
+    assert len(rows) == 1000
+    assert rows[0] == {"name": "s0", "score": "0"}
+    assert list(processed["data.csv"]) == rows
+    assert processed["rates.json"] == {"USD": 1.0}
+    assert processed["notes.md"] == "# Notes ✓"
+    assert processed["sample.png"] == "data:image/png;base64,aGVsbG8="
+
+def test_attachments_over_the_size_cap_are_skipped(monkeypatch):
+    """
+    Tests that an attachment larger than the cap is rejected before it is decoded.
+    """
+    with pytest.raises(AttachmentTooLarge):
+        next(iter_decoded(data_uri(b"x" * 100), max_bytes=10))
+    monkeypatch.setattr(utils, "ATTACHMENT_MAX_BYTES", 10)
+    assert process_attachments([{"name": "big.json", "url": data_uri(b'["' + b"x" * 100 + b'"]')}]) == {}
+
+def test_store_decodes_identical_attachments_once_per_cohort(tmp_path):
+    """
+    Tests that two requests with the same attachment share one blob, in separate scratch directories.
+    """
+    store = AttachmentStore(root=str(tmp_path))
+    attachment = {"name": "data.csv", "url": data_uri(b"name,score\na,1\n", "text/csv")}
+    with store.scratch("job-1") as first, store.scratch("job-2") as second:
+        first_rows = list(process_attachments([attachment], first)["data.csv"])
+        second_rows = list(process_attachments([attachment], second)["data.csv"])
+        first_path, second_path = os.path.join(first.path, "data.csv"), os.path.join(second.path, "data.csv")
+        assert first_path != second_path
+        assert os.stat(first_path).st_ino == os.stat(second_path).st_ino
+    assert first_rows == second_rows == [{"name": "a", "score": "1"}]
+    assert store.decoded == 1 and store.reused == 1
+    assert not os.path.exists(first.path) and not os.path.exists(second.path)
+    assert store.stats()["referenced"] == 0
+
+def test_collector_evicts_unreferenced_blobs_least_recently_used_first(tmp_path):
+    """
+    Tests that collection frees space down to max_bytes, skipping blobs still in use.
+    """
+    store = AttachmentStore(root=str(tmp_path), max_bytes=150)
+    with store.scratch("old") as scratch:
+        scratch.add("old.txt", data_uri(b"o" * 100))
+    time.sleep(0.01)
+    with store.scratch("recent") as scratch:
+        scratch.add("recent.txt", data_uri(b"r" * 100))
+    with store.scratch("busy") as busy:
+        busy.add("busy.txt", data_uri(b"b" * 100))
+        assert store.collect() == 200
+        assert os.path.exists(os.path.join(busy.path, "busy.txt"))
+        assert store.stats()["blobs"] == 1
+
+def test_duplicate_names_replace_the_link_not_the_blob(tmp_path, monkeypatch):
+    """
+    Tests that a second attachment with the same name replaces the first in the scratch directory
+    without changing the first one's blob, even when the copy fallback is used.
+    """
+    store = AttachmentStore(root=str(tmp_path))
+    with store.scratch("dup") as scratch:
+        scratch.add("data.txt", data_uri(b"first"))
+        first = store.blob_path(scratch.digests[0])
+        monkeypatch.setattr(os, "link", lambda *args: (_ for _ in ()).throw(OSError("cross-device link")))
+        path = scratch.add("data.txt", data_uri(b"second"))
+        with open(path, "rb") as f:
+            assert f.read() == b"second"
+        with open(first, "rb") as f:
+            assert f.read() == b"first"
@@ -0,0 +1,62 @@
+from student_api.code_blocks import CodeBlockParser, parse_code_blocks
+
+COMPLETION = """Here is the application.
+
+```html
+<!-- index.html -->
+<html><script src="app.js"></script></html>
+```
+
+**app.js**
+```javascript
+document.title = "Captcha";
+```
+
+```markdown
+<!-- README.md -->
+# Captcha Solver
+
+```bash
+python -m http.server
+```
+```
+
+```text
+<!-- LICENSE -->
+MIT License
+```
+"""
+
+def test_parses_arbitrary_files_and_nested_fences():
+    """
+    Tests that files named by markers or headings are extracted, keeping fences nested in a README.
+    """
+    files, errors = parse_code_blocks(COMPLETION)
+    assert list(files) == ["index.html", "app.js", "README.md", "LICENSE"]
+    assert files["app.js"] == 'document.title = "Captcha";'
+    assert files["README.md"] == "# Captcha Solver\n\n```bash\npython -m http.server\n```"
+    assert errors == []
+
+def test_incremental_parsing_matches_a_single_pass():
+    """
+    Tests that feeding the text a few characters at a time yields each file once its block closes.
+    """
+    parser = CodeBlockParser()
+    completed = []
+    for i in range(0, len(COMPLETION), 3):
+        completed.extend(name for name, _ in parser.feed(COMPLETION[i:i + 3]))
+    completed.extend(name for name, _ in parser.close())
+    assert completed == ["index.html", "app.js", "README.md", "LICENSE"]
+    assert parser.files == parse_code_blocks(COMPLETION)[0]
+
+def test_malformed_blocks_are_reported():
+    """
+    Tests that unnamed, unsafe and unterminated blocks are skipped and reported with their line.
+    """
+    files, errors = parse_code_blocks("```css\nbody {}\n```\n```js\n// ../../etc/app.js\nx\n```\n```html\n<!-- index.html -->\n<html>")
+    assert files == {}
+    assert [(error.line, error.reason) for error in errors] == [
+        (1, "code block has no file name"),
+        (4, "unsafe file path ../../etc/app.js"),
+        (8, "unterminated code block for index.html"),
+    ]
@@ -1,12 +1,13 @@
 import os
 import sqlite3
-from database.db_utils import init_db, get_connection
+from database.db_utils import init_db, get_db_path, get_connection, execute, executemany, fetchall, transaction, migrate
+from database import db_utils
 
 def test_init_db():
     """
     Tests that the database is initialized correctly.
     """
-    db_path = os.path.join(os.path.dirname(__file__), '..', 'database', 'tasks.db')
+    db_path = get_db_path()
     if os.path.exists(db_path):
         os.remove(db_path)
 
@@ -30,4 +31,116 @@ def test_init_db():
     assert cur.fetchone() is not None, "Table 'results' does not exist"
 
     conn.close()
-    os.remove(db_path)
\ No newline at end of file
+    os.remove(db_path)
+
+def test_executemany_and_transaction():
+    """
+    Tests batched inserts and that a failing transaction is rolled back.
+    """
+    init_db()
+    execute("DELETE FROM tasks WHERE task='batch-task'")
+
+    inserted = executemany(
+        "INSERT INTO tasks (email, task, round) VALUES (?, ?, ?)",
+        [(f"student{i}@example.com", "batch-task", 1) for i in range(5)]
+    )
+    assert inserted == 5
+
+    try:
+        with transaction():
+            execute("INSERT INTO tasks (email, task, round) VALUES (?, ?, ?)", ("extra@example.com", "batch-task", 1))
+            raise RuntimeError("abort")
+    except RuntimeError:
+        pass
+
+    rows = fetchall("SELECT email FROM tasks WHERE task='batch-task'")
+    assert len(rows) == 5
+    execute("DELETE FROM tasks WHERE task='batch-task'")
+
+
+def test_migrations_are_applied_once():
+    """
+    Tests that migrations are recorded, create the lookup indexes and are not re-applied.
+    """
+    init_db()
+
+    conn = get_connection()
+    versions = [row[0] for row in conn.execute("SELECT version FROM schema_migrations ORDER BY version")]
+    assert versions == sorted(versions) and versions[:2] == [1, 2]
+    assert migrate(conn) == []
+
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {"ux_tasks_submission", "idx_tasks_email_round", "idx_tasks_task_round", "idx_repos_round"} <= indexes
+
+    plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN SELECT * FROM tasks WHERE email=? AND round=1", ("a@example.com",)))
+    assert "USING INDEX" in plan
+    conn.close()
+
+def test_errors_inside_a_transaction_roll_it_back():
+    """
+    Tests that a failing statement inside a transaction propagates instead of committing the others.
+    """
+    init_db()
+    execute("DELETE FROM tasks WHERE task='partial-task'")
+
+    try:
+        with transaction():
+            execute("INSERT INTO tasks (email, task, round) VALUES (?, ?, ?)", ("first@example.com", "partial-task", 1))
+            execute("INSERT INTO no_such_table (email) VALUES (?)", ("second@example.com",))
+    except sqlite3.Error:
+        pass
+    else:
+        raise AssertionError("The failing statement was swallowed")
+
+    assert fetchall("SELECT email FROM tasks WHERE task='partial-task'") == []
+    assert execute("INSERT INTO no_such_table (email) VALUES (?)", ("outside@example.com",)) is None
+
+def test_legacy_tasks_tables_are_upgraded(tmp_path):
+    """
+    Tests that tasks tables created by the original schema.sql and init_db gain the columns and
+    unique key the deployment upsert relies on, keeping their rows.
+    """
+    legacy_schemas = [
+        "CREATE TABLE tasks (timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, email TEXT, task TEXT, round INTEGER, nonce TEXT, brief TEXT, "
+        "attachments TEXT, checks TEXT, evaluation_url TEXT, endpoint TEXT, statuscode INTEGER, secret TEXT)",
+        "CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT, task TEXT, round INTEGER, nonce TEXT, brief TEXT, "
+        "attachments TEXT, checks TEXT, evaluation_url TEXT, endpoint TEXT, statuscode INTEGER, secret TEXT, repo_url TEXT, "
+        "commit_sha TEXT, pages_url TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)",
+    ]
+    for i, schema in enumerate(legacy_schemas):
+        conn = sqlite3.connect(str(tmp_path / f"legacy{i}.db"), isolation_level=None)
+        conn.execute(schema)
+        conn.execute("INSERT INTO tasks (email, task, round, nonce, statuscode) VALUES ('a@example.com', 'legacy', 1, 'n1', 202)")
+        migrate(conn)
+
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+        assert {"id", "timestamp", "repo_url", "commit_sha", "pages_url"} <= columns
+        conn.execute(
+            "INSERT INTO tasks (email, task, round, nonce, statuscode, repo_url) VALUES ('a@example.com', 'legacy', 1, 'n1', 200, 'https://github.com/u/r') "
+            "ON CONFLICT(email, task, round, nonce) DO UPDATE SET statuscode=excluded.statuscode, repo_url=excluded.repo_url"
+        )
+        rows = conn.execute("SELECT id, timestamp, statuscode, repo_url FROM tasks").fetchall()
+        assert len(rows) == 1 and rows[0][0] == 1 and rows[0][1] is not None
+        assert rows[0][2:] == (200, "https://github.com/u/r")
+        conn.close()
+
+def test_duplicate_tasks_are_set_aside_on_upgrade(tmp_path):
+    """
+    Tests that rows dropped to create the tasks unique key are kept in tasks_duplicates.
+    """
+    conn = sqlite3.connect(str(tmp_path / "duplicates.db"), isolation_level=None)
+    conn.execute("CREATE TABLE tasks (email TEXT, task TEXT, round INTEGER, nonce TEXT, statuscode INTEGER)")
+    conn.executemany("INSERT INTO tasks VALUES ('a@example.com', 'dup', 1, 'n1', ?)", [(202,), (200,)])
+    migrate(conn)
+    assert conn.execute("SELECT statuscode FROM tasks").fetchall() == [(200,)]
+    assert conn.execute("SELECT email, nonce, statuscode FROM tasks_duplicates").fetchall() == [("a@example.com", "n1", 202)]
+    conn.close()
+
+def test_a_tasks_db_in_the_working_directory_is_still_used(tmp_path, monkeypatch):
+    """
+    Tests that without DB_PATH, a database left at the old default location (./tasks.db) is used.
+    """
+    monkeypatch.chdir(tmp_path)
+    assert db_utils._default_db_path().endswith(os.path.join("database", "tasks.db"))
+    (tmp_path / "tasks.db").write_bytes(b"")
+    assert db_utils._default_db_path() == str(tmp_path / "tasks.db")
@@ -1,9 +1,11 @@
 import os
 from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
-from student_api.app import app
+from student_api.app import app, job_runner
+from student_api.notifier import sender as notification_sender
 from database.db_utils import init_db, DB_PATH
 from dotenv import load_dotenv
+from tests.fake_github import deploy_now
 
 load_dotenv()
 
@@ -11,7 +13,8 @@ client = TestClient(app)
 
 API_SECRET = os.getenv("API_SECRET")
 
-@patch("student_api.app.requests.Session.post")
+@patch("student_api.app.follow_pages_deployment", deploy_now)
+@patch("student_api.notifier.requests.Session.post")
 @patch("student_api.app.create_and_push_to_repo")
 @patch("student_api.app.generate_app")
 def test_end_to_end_flow(mock_generate_app, mock_create_and_push, mock_post):
@@ -54,11 +57,19 @@ def test_end_to_end_flow(mock_generate_app, mock_create_and_push, mock_post):
     )
 
     # 3. Assertions
-    assert response.status_code == 200
-    response_json = response.json()
-    assert response_json["status"] == "success"
-    assert response_json["repo_url"] == "https://github.com/user/repo"
-    assert response_json["pages_url"] == "https://user.github.io/repo/"
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    job_runner.wait(job_id, timeout=10)
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["status"] == "success"
+    assert job["result"]["repo_url"] == "https://github.com/user/repo"
+    assert job["result"]["pages_url"] == "https://user.github.io/repo/"
+
+    # The evaluation callback is queued and delivered by the notification sender
+    mock_post.assert_not_called()
+    assert notification_sender.send_due() == 1
 
     # Check if mocks were called
     mock_generate_app.assert_called_once()
@@ -0,0 +1,245 @@
+import os
+import json
+import shutil
+import asyncio
+import subprocess
+import urllib.error
+import urllib.request
+from contextlib import asynccontextmanager
+from database.db_utils import init_db, execute, fetchall
+from evaluation_scripts import evaluate
+from evaluation_scripts.evaluate import evaluate_all
+from evaluation_scripts.repo_cache import RepoCache
+from evaluation_scripts.static_server import StaticServer
+
+class FakeBrowserPool:
+    """Stands in for the Chromium pool and records the pages that were opened."""
+
+    def __init__(self, failing: set = frozenset()):
+        self.opened = 0
+        self.failing = failing
+        self.evaluations = []
+        self.loaded = []
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @asynccontextmanager
+    async def page(self):
+        self.opened += 1
+        yield FakePage(self)
+
+class FakePage:
+    """Answers the batched check evaluation, failing the expressions in the pool's failing set."""
+
+    def __init__(self, pool: FakeBrowserPool):
+        self.pool = pool
+
+    async def goto(self, url, wait_until=None):
+        if url.startswith("http://127.0.0.1"):
+            self.pool.loaded.append(await asyncio.to_thread(lambda: urllib.request.urlopen(url).read().decode()))
+
+    async def evaluate(self, script, arg=None):
+        self.pool.evaluations.append(arg["expressions"])
+        return [{"passed": expression not in self.pool.failing, "error": None if expression not in self.pool.failing else "false", "ms": 1.0}
+                for expression in arg["expressions"]]
+
+def make_repo(path, readme):
+    os.makedirs(path)
+    with open(os.path.join(path, "LICENSE"), "w") as f:
+        f.write("MIT License")
+    with open(os.path.join(path, "README.md"), "w") as f:
+        f.write(readme)
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+    subprocess.run(["git", "-C", path, "add", "."], check=True)
+    subprocess.run(["git", "-C", path, "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-qm", "init"], check=True)
+    return subprocess.run(["git", "-C", path, "rev-parse", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+
+def test_evaluate_all_runs_checks_concurrently(tmp_path):
+    """
+    Tests that every repo gets all three checks recorded and shares the browser pool.
+    """
+    init_db()
+    execute("DELETE FROM results WHERE task='eval-task'")
+    repos = []
+    for i in range(3):
+        path = str(tmp_path / f"repo{i}")
+        sha = make_repo(path, "# Title\n" + "x" * (200 if i else 10))
+        repos.append({"email": f"s{i}@example.com", "task": "eval-task", "round": 1, "nonce": f"n{i}", "repo_url": path, "commit_sha": sha, "pages_url": "http://localhost/"})
+
+    browsers = FakeBrowserPool()
+    timer = asyncio.run(evaluate_all(repos, workers=2, browsers=browsers, repo_cache=RepoCache(str(tmp_path / "cache"))))
+
+    results = fetchall("SELECT email, check_name, score FROM results WHERE task='eval-task'")
+    assert len(results) == 9
+    assert browsers.opened == 3
+    assert {r["score"] for r in results if r["check_name"] == "Professional README" and r["email"] == "s0@example.com"} == {0}
+    assert timer.counts["fetch"] == 3
+    execute("DELETE FROM results WHERE task='eval-task'")
+
+
+def test_repo_cache_skips_fetch_for_known_commit(tmp_path):
+    """
+    Tests that a commit already in the mirror is checked out again without touching the remote.
+    """
+    source = str(tmp_path / "source")
+    sha = make_repo(source, "# Readme")
+    repo = {"email": "s@example.com", "task": "cache-task", "round": 1, "repo_url": "file://" + source, "commit_sha": sha}
+    cache = RepoCache(str(tmp_path / "cache"))
+
+    worktree = asyncio.run(cache.checkout(repo))
+    assert os.path.exists(os.path.join(worktree, "LICENSE"))
+    assert cache.fetches == 1
+
+    shutil.rmtree(source)
+    assert asyncio.run(cache.checkout(repo)) == worktree
+    assert cache.fetches == 1
+
+
+def test_unchanged_commits_are_not_re_evaluated(tmp_path):
+    """
+    Tests that a second run over the same commit reuses the stored results unless forced.
+    """
+    init_db()
+    execute("DELETE FROM results WHERE task='memo-task'")
+    path = str(tmp_path / "repo")
+    sha = make_repo(path, "# Title\n" + "x" * 200)
+    repos = [{"email": "m@example.com", "task": "memo-task", "round": 1, "nonce": "n", "repo_url": path, "commit_sha": sha, "pages_url": "http://localhost/"}]
+    cache = RepoCache(str(tmp_path / "cache"))
+
+    asyncio.run(evaluate_all(repos, browsers=FakeBrowserPool(), repo_cache=cache))
+    browsers = FakeBrowserPool()
+    timer = asyncio.run(evaluate_all(repos, browsers=browsers, repo_cache=cache))
+    assert timer.cached == 3
+    assert browsers.opened == 0
+    assert len(fetchall("SELECT * FROM results WHERE task='memo-task'")) == 3
+
+    asyncio.run(evaluate_all(repos, browsers=FakeBrowserPool(), repo_cache=cache, force=True))
+    assert len(fetchall("SELECT * FROM results WHERE task='memo-task'")) == 6
+    execute("DELETE FROM results WHERE task='memo-task'")
+
+
+def test_results_are_memoized_per_round_and_check_definition(tmp_path, monkeypatch):
+    """
+    Tests that a round 2 submission of an unchanged commit is evaluated against its own checks,
+    and that a failed live-site check is retried once its failure is older than the retry delay.
+    """
+    init_db()
+    execute("DELETE FROM results WHERE task='memo2-task'")
+    execute("DELETE FROM tasks WHERE task='memo2-task'")
+    execute("INSERT INTO tasks (email, task, round, nonce, checks) VALUES (?, ?, ?, ?, ?)", ("m2@example.com", "memo2-task", 1, "n1", json.dumps(["js: one"])))
+    execute("INSERT INTO tasks (email, task, round, nonce, checks) VALUES (?, ?, ?, ?, ?)", ("m2@example.com", "memo2-task", 2, "n2", json.dumps(["js: two"])))
+    path = str(tmp_path / "repo")
+    sha = make_repo(path, "# Title\n" + "x" * 200)
+    cache = RepoCache(str(tmp_path / "cache"))
+    round1 = {"email": "m2@example.com", "task": "memo2-task", "round": 1, "nonce": "n1", "repo_url": path, "commit_sha": sha, "pages_url": "http://localhost/"}
+    round2 = dict(round1, round=2, nonce="n2")
+
+    asyncio.run(evaluate_all([round1], browsers=FakeBrowserPool(), repo_cache=cache))
+    browsers = FakeBrowserPool(failing={"two"})
+    timer = asyncio.run(evaluate_all([round2], browsers=browsers, repo_cache=cache))
+    assert timer.cached == 0
+    assert browsers.evaluations == [["two"]]
+
+    browsers = FakeBrowserPool()
+    asyncio.run(evaluate_all([round1, round2], browsers=browsers, repo_cache=cache))
+    assert browsers.opened == 0
+
+    monkeypatch.setattr(evaluate, "EVAL_RETRY_FAILED_AFTER", -1)
+    timer = asyncio.run(evaluate_all([round1, round2], browsers=browsers, repo_cache=cache))
+    assert browsers.evaluations == [["two"]]
+    assert timer.cached == 5
+    scores = [row["score"] for row in fetchall("SELECT score FROM results WHERE task='memo2-task' AND round=2 AND check_name='Playwright Test' ORDER BY rowid")]
+    assert scores == [0, 1]
+    execute("DELETE FROM results WHERE task='memo2-task'")
+
+
+def test_js_checks_run_in_one_evaluation_per_page(tmp_path):
+    """
+    Tests that the js: checks of the task and its template are evaluated together and summarized.
+    """
+    init_db()
+    execute("DELETE FROM results WHERE task='sum-of-sales-9'")
+    execute("DELETE FROM tasks WHERE task='sum-of-sales-9'")
+    execute("INSERT INTO tasks (email, task, round, nonce, checks) VALUES (?, ?, ?, ?, ?)",
+            ("j@example.com", "sum-of-sales-9", 1, "n", json.dumps(["Repo has MIT license", "js: document.querySelector('h1') !== null"])))
+    path = str(tmp_path / "repo")
+    sha = make_repo(path, "# Title\n" + "x" * 200)
+    repos = [{"email": "j@example.com", "task": "sum-of-sales-9", "round": 1, "nonce": "n", "repo_url": path, "commit_sha": sha, "pages_url": "http://localhost/"}]
+    browsers = FakeBrowserPool(failing={"!!document.querySelector('#total-sales')"})
+
+    timer = asyncio.run(evaluate_all(repos, browsers=browsers, repo_cache=RepoCache(str(tmp_path / "cache"))))
+
+    assert browsers.evaluations == [[
+        "document.querySelector('h1') !== null",
+        "document.title.includes('Sales Summary')",
+        "!!document.querySelector('#total-sales')",
+    ]]
+    result = fetchall("SELECT score, reason, logs, check_version FROM results WHERE task='sum-of-sales-9' AND check_name='Playwright Test'")[0]
+    assert result["score"] == 0
+    assert result["reason"] == "2/3 checks passed; failed: !!document.querySelector('#total-sales')"
+    assert [check["ms"] for check in json.loads(result["logs"])] == [1.0, 1.0, 1.0]
+    assert result["check_version"] == 2
+    assert timer.counts["js-checks"] == 1
+    execute("DELETE FROM results WHERE task='sum-of-sales-9'")
+    execute("DELETE FROM tasks WHERE task='sum-of-sales-9'")
+
+
+def test_serve_local_loads_pages_from_the_checkout(tmp_path):
+    """
+    Tests that local mode serves each checkout to the browser and only uses pages_url for the deployment check.
+    """
+    init_db()
+    execute("DELETE FROM results WHERE task='local-task'")
+    live = tmp_path / "live"
+    live.mkdir()
+    (live / "index.html").write_text("live site")
+    site = StaticServer()
+    site.root = str(live)
+    site.start()
+    repos = []
+    for i in range(3):
+        path = str(tmp_path / f"repo{i}")
+        sha = make_repo(path, "# Title\n" + "x" * 200)
+        with open(os.path.join(path, "index.html"), "w") as f:
+            f.write(f"repo {i}")
+        subprocess.run(["git", "-C", path, "add", "."], check=True)
+        subprocess.run(["git", "-C", path, "-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-qm", "page"], check=True)
+        sha = subprocess.run(["git", "-C", path, "rev-parse", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+        pages_url = site.url if i else "http://127.0.0.1:9/"
+        repos.append({"email": f"l{i}@example.com", "task": "local-task", "round": 1, "nonce": "n", "repo_url": path, "commit_sha": sha, "pages_url": pages_url})
+
+    browsers = FakeBrowserPool()
+    try:
+        asyncio.run(evaluate_all(repos, workers=2, browsers=browsers, repo_cache=RepoCache(str(tmp_path / "cache")), serve_local=True))
+    finally:
+        site.close()
+
+    assert sorted(browsers.loaded) == ["repo 0", "repo 1", "repo 2"]
+    deployment = {row["email"]: row["score"] for row in fetchall("SELECT email, score FROM results WHERE task='local-task' AND check_name='Pages Deployment'")}
+    assert deployment == {"l0@example.com": 0, "l1@example.com": 1, "l2@example.com": 1}
+    assert len(fetchall("SELECT * FROM results WHERE task='local-task'")) == 12
+    execute("DELETE FROM results WHERE task='local-task'")
+
+def test_static_server_without_a_root_serves_nothing(tmp_path):
+    """
+    Tests that an idle static server answers 404 instead of serving the working directory.
+    """
+    site = StaticServer()
+    site.start()
+    try:
+        for path in ("", ".env", "README.md"):
+            try:
+                urllib.request.urlopen(site.url + path)
+                status = 200
+            except urllib.error.HTTPError as e:
+                status = e.code
+            assert status == 404
+        (tmp_path / "index.html").write_text("repo")
+        site.root = str(tmp_path)
+        assert urllib.request.urlopen(site.url).read() == b"repo"
+    finally:
+        site.close()
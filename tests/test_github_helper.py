@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+import subprocess
+import threading
+from unittest.mock import patch
+from student_api.github_client import GitHubClient
+from student_api.github_helper import push_files, create_and_push_to_repo
+from tests.fake_github import FakeGitHub
+
+FILES = {"index.html": "<html></html>", "README.md": "README", "LICENSE": "LICENSE"}
+
+def test_push_files_creates_a_single_commit():
+    """
+    Tests that all files are pushed in one tree and one commit, moving the branch ref once.
+    """
+    with FakeGitHub() as fake:
+        gh = GitHubClient("token", base_url=fake.url, write_interval=0)
+        repo = gh.post("/user/repos", json={"name": "repo", "auto_init": True})
+
+        commit_sha = push_files(gh, repo, FILES, "Round 1 submission")
+
+        assert fake.repos["repo"]["head"] == commit_sha
+        assert fake.files("repo") == FILES
+        assert fake.count("POST", "/git/trees") == 1
+        assert fake.count("POST", "/git/commits") == 1
+        assert fake.count("PATCH", "/git/refs") == 1
+
+def test_push_files_skips_unchanged_tree():
+    """
+    Tests that no commit is created when the files are identical to the branch head.
+    """
+    with FakeGitHub() as fake:
+        gh = GitHubClient("token", base_url=fake.url, write_interval=0)
+        repo = gh.post("/user/repos", json={"name": "repo", "auto_init": True})
+        first = push_files(gh, repo, FILES, "Round 1 submission")
+
+        assert push_files(gh, repo, FILES, "Round 1 submission") == first
+        assert fake.count("POST", "/git/commits") == 1
+
+def test_conditional_gets_do_not_consume_budget():
+    """
+    Tests that repeated GETs are answered from the ETag cache with 304s and the budget is tracked.
+    """
+    with FakeGitHub() as fake:
+        gh = GitHubClient("token", base_url=fake.url)
+        assert gh.get("/user")["login"] == "fakeuser"
+        assert gh.get("/user")["login"] == "fakeuser"
+        assert gh.get("/user")["login"] == "fakeuser"
+
+        budget = gh.budget()
+        assert budget["not_modified"] == 2
+        assert budget["remaining"] == fake.limit - 1
+        assert budget["limit"] == fake.limit
+
+def test_waiting_for_the_budget_does_not_block_revalidations():
+    """
+    Tests that while one request waits for the rate-limit window to reset, a revalidation of a
+    cached GET, which needs no budget, is still sent.
+    """
+    with FakeGitHub(limit=100) as fake:
+        gh = GitHubClient("token", base_url=fake.url, reserve=99)
+        gh.get("/user")
+        waiting, release = threading.Event(), threading.Event()
+
+        def sleep(seconds):
+            waiting.set()
+            release.wait(5)
+
+        with patch("student_api.github_client.time.sleep", sleep):
+            blocked = threading.Thread(target=lambda: gh.get("/user", conditional=False))
+            blocked.start()
+            assert waiting.wait(5)
+            try:
+                started = time.monotonic()
+                assert gh.get("/user")["login"] == "fakeuser"
+                assert time.monotonic() - started < 2
+            finally:
+                release.set()
+                blocked.join()
+        assert gh.budget()["not_modified"] == 1
+
+def test_writes_reserve_spaced_slots():
+    """
+    Tests that concurrent writes are given slots write_interval apart and sleep outside the lock.
+    """
+    gh = GitHubClient("token", write_interval=1.0)
+    slept = []
+
+    def sleep(seconds):
+        assert not gh._write_lock.locked()
+        slept.append(seconds)
+
+    with patch("student_api.github_client.time.sleep", sleep):
+        for _ in range(3):
+            gh._throttle("POST")
+    assert [round(seconds) for seconds in slept] == [1, 2]
+
+def test_create_and_push_to_repo_round_trip():
+    """
+    Tests the round 1 and round 2 flow: create the repo, push, enable Pages, then update it.
+    """
+    with FakeGitHub() as fake:
+        gh = GitHubClient("token", base_url=fake.url, write_interval=0)
+        with patch("student_api.github_helper.client", gh):
+            repo_url, commit_sha, pages_url = create_and_push_to_repo("student@example.com", "task", FILES, 1)
+            assert repo_url == "https://github.com/fakeuser/task-student"
+            assert pages_url == "https://fakeuser.github.io/task-student/"
+            assert fake.repos["task-student"]["head"] == commit_sha
+
+            _, round2_sha, _ = create_and_push_to_repo("student@example.com", "task", {"index.html": "v2"}, 2)
+            assert round2_sha != commit_sha
+            assert fake.files("task-student")["index.html"] == "v2"
+            assert fake.count("POST", "/user/repos") == 1
+            assert gh.budget()["not_modified"] >= 1
+
+def test_missing_token_fails_at_import():
+    """
+    Tests that an unset GITHUB_TOKEN is an error instead of silently mocking GitHub.
+    """
+    env = {name: value for name, value in os.environ.items() if name != "GITHUB_TOKEN"}
+    result = subprocess.run([sys.executable, "-c", "import student_api.github_helper"], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.returncode != 0
+    assert "GITHUB_TOKEN not found" in result.stderr
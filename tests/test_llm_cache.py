@@ -0,0 +1,165 @@
+import time
+import threading
+from database.db_utils import init_db, execute, fetchall
+from student_api.llm_cache import LLMCache, cache_key
+from student_api import generator
+from tests.fake_openai import FakeOpenAI
+
+def test_cache_key_is_stable_and_model_specific():
+    """
+    Tests that the key ignores the order of mapping keys and changes with the model.
+    """
+    messages = [{"role": "user", "content": "brief"}]
+    key = cache_key("gpt-3.5-turbo", messages, {"temperature": 0.2, "max_tokens": 4096})
+    assert key == cache_key("gpt-3.5-turbo", messages, {"max_tokens": 4096, "temperature": 0.2})
+    assert key != cache_key("gpt-4o", messages, {"temperature": 0.2, "max_tokens": 4096})
+
+def test_concurrent_misses_share_one_call():
+    """
+    Tests that concurrent identical requests are coalesced and later ones are served from the cache.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    cache = LLMCache("test")
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return "response"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["response"] * 5
+    assert len(calls) == 1
+    assert cache.get_or_compute("k", compute) == "response"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] >= 1
+
+def test_invalid_responses_are_not_cached():
+    """
+    Tests that a response rejected by the validity predicate is returned but not stored.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    cache = LLMCache("valid")
+    responses = iter(["", "ok"])
+    assert cache.get_or_compute("k", lambda: next(responses), valid=bool) == ""
+    assert cache.get_or_compute("k", lambda: next(responses), valid=bool) == "ok"
+    assert cache.get_or_compute("k", lambda: "recomputed", valid=bool) == "ok"
+
+def test_ttl_and_size_eviction():
+    """
+    Tests that expired entries are ignored and the least recently used entries are evicted past max_bytes.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    expired = LLMCache("ttl", ttl=0)
+    expired.put("k", "value")
+    assert expired.get("k") is None
+
+    cache = LLMCache("lru", max_bytes=10)
+    cache.put("a", "aaaa")
+    time.sleep(0.01)
+    cache.put("b", "bbbb")
+    time.sleep(0.01)
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", "cccc")
+    assert {row["key"] for row in fetchall("SELECT key FROM llm_cache")} == {"lru:a", "lru:c"}
+
+def test_generate_app_reuses_cached_completion(monkeypatch):
+    """
+    Tests that generating the same app twice only calls the completion API once.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    with FakeOpenAI(text="```html\n<!-- index.html -->\n<html></html>\n```") as fake:
+        monkeypatch.setattr(generator, "engine", generator.GenerationEngine(base_url=fake.url))
+        assert generator.generate_app("brief", {}) == {"index.html": "<html></html>"}
+        assert generator.generate_app("brief", {}) == {"index.html": "<html></html>"}
+    assert fake.count("completion") == 1
+
+def test_generate_app_does_not_cache_a_completion_without_files(monkeypatch):
+    """
+    Tests that a completion that parses into no files is requested again rather than served from the cache.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    with FakeOpenAI(text="Sorry, I cannot help with that.") as fake:
+        monkeypatch.setattr(generator, "engine", generator.GenerationEngine(base_url=fake.url))
+        assert generator.generate_app("brief", {}) == {}
+        assert generator.generate_app("brief", {}) == {}
+    assert fake.count("completion") == 2 * generator.GENERATION_ATTEMPTS
+
+def test_generate_app_fails_without_the_captcha_placeholder(monkeypatch):
+    """
+    Tests that a completion that never shows the captcha solution is requested again and then reported as an error.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    with FakeOpenAI(text="```html\n<!-- index.html -->\n<html>XK42</html>\n```") as fake:
+        monkeypatch.setattr(generator, "engine", generator.GenerationEngine(base_url=fake.url))
+        files = generator.generate_app("brief", {"sample.png": "data:image/png;base64,aGVsbG8="})
+    assert "error" in files
+    assert fake.count("completion") == generator.GENERATION_ATTEMPTS
+
+def test_captcha_solution_is_escaped_for_its_context():
+    """
+    Tests that the solution is HTML-escaped in markup and attributes and string-escaped in scripts.
+    """
+    solution = "</p><script>alert('x')</script>"
+    page = '<p title="__CAPTCHA_SOLUTION__">__CAPTCHA_SOLUTION__</p><script>const s = "__CAPTCHA_SOLUTION__";</script>'
+    substituted = generator.substitute_captcha("index.html", page, solution)
+    assert substituted.count("<script>") == 1
+    assert "&lt;/p&gt;&lt;script&gt;alert(&#x27;x&#x27;)&lt;/script&gt;" in substituted
+    assert 'const s = "\\u003c/p>\\u003cscript>alert(\\\'x\\\')\\u003c/script>";' in substituted
+    assert generator.substitute_captcha("app.js", "const s = `__CAPTCHA_SOLUTION__`;", "a`${b}") == "const s = `a\\`\\${b}`;"
+    assert generator.substitute_captcha("README.md", "Solution: __CAPTCHA_SOLUTION__", "XK42") == "Solution: XK42"
+
+def test_generate_app_streams_files_and_substitutes_captcha(monkeypatch):
+    """
+    Tests that files are reported as they stream, or from the cached completion, and the captcha solved alongside is filled in.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    streamed = []
+    with FakeOpenAI(captcha_answer=" QW7 ", chunk_size=8) as fake:
+        monkeypatch.setattr(generator, "engine", generator.GenerationEngine(base_url=fake.url))
+        files = generator.generate_app("brief", {"sample.png": "data:image/png;base64,aGVsbG8="}, lambda name, content: streamed.append(name))
+    assert streamed == ["index.html", "README.md", "LICENSE"]
+    assert files["index.html"] == "<html><body><p>QW7</p></body></html>"
+    # Served from the caches: nothing streams, but every file is still reported.
+    cached = generator.generate_app("brief", {"sample.png": "data:image/png;base64,aGVsbG8="}, lambda name, content: streamed.append(name))
+    assert cached == files
+    assert streamed == ["index.html", "README.md", "LICENSE"] * 2
+    assert fake.count("completion") == 1
+    assert fake.count("vision") == 1
+    assert generator.engine.stats()["completions"] == 1
+
+def test_captcha_solution_is_memoized_by_image_content(monkeypatch):
+    """
+    Tests that the same image, even with different base64 padding, is only sent to the model once.
+    """
+    init_db()
+    execute("DELETE FROM llm_cache")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    with FakeOpenAI(captcha_answer=" XK42 ") as fake:
+        monkeypatch.setattr(generator, "engine", generator.GenerationEngine(base_url=fake.url))
+        hits = generator.captcha_cache.hits
+        assert generator.solve_captcha("data:image/png;base64,aGVsbG8=") == "XK42"
+        assert generator.solve_captcha("data:image/png;base64,aGVsbG8") == "XK42"
+        assert generator.captcha_cache.hits == hits + 1
+    assert fake.count("vision") == 1
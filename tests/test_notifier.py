@@ -0,0 +1,50 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import requests
+from database.db_utils import init_db, execute, fetchone
+from student_api import notifier
+from student_api.notifier import NotificationSender, enqueue_notification
+
+def test_failed_notifications_back_off_and_dead_letter():
+    """
+    Tests that a failing notification is rescheduled with backoff and dead-lettered after the last attempt.
+    """
+    init_db()
+    execute("DELETE FROM notifications")
+    sender = NotificationSender(workers=1)
+    notification_id = enqueue_notification("http://example.invalid/notify", {"task": "t"})
+
+    with patch.object(notifier.http, "post", side_effect=requests.exceptions.ConnectionError("refused")), \
+         patch.object(notifier, "NOTIFY_MAX_ATTEMPTS", 2):
+        assert sender.send_due() == 1
+        row = fetchone("SELECT * FROM notifications WHERE id=?", (notification_id,))
+        assert row["status"] == "pending" and row["attempts"] == 1 and "refused" in row["last_error"]
+
+        execute("UPDATE notifications SET next_attempt_at=0 WHERE id=?", (notification_id,))
+        assert sender.send_due() == 1
+        assert fetchone("SELECT status FROM notifications WHERE id=?", (notification_id,))["status"] == "dead"
+
+    assert sender.send_due() == 0
+
+def test_notifications_are_claimed_once():
+    """
+    Tests that a claimed notification is not delivered again while its lease is held.
+    """
+    init_db()
+    execute("DELETE FROM notifications")
+    enqueue_notification("http://example.invalid/notify", {"task": "t"})
+    sender = NotificationSender(workers=1)
+
+    with patch.object(notifier.http, "post", return_value=MagicMock(status_code=200)) as mock_post:
+        assert sender.send_due() == 1
+        assert sender.send_due() == 0
+    mock_post.assert_called_once()
+    assert fetchone("SELECT status FROM notifications")["status"] == "sent"
+
+def test_a_notification_that_cannot_be_stored_raises():
+    """
+    Tests that enqueueing fails loudly when the insert fails, so the job is marked as failed.
+    """
+    with patch.object(notifier, "execute", return_value=None):
+        with pytest.raises(RuntimeError):
+            enqueue_notification("http://example.invalid/notify", {"task": "t"})
@@ -0,0 +1,64 @@
+import threading
+from student_api.github_client import GitHubClient
+from student_api.github_helper import push_files
+from student_api.pages import PagesFollower
+from tests.fake_github import FakeGitHub
+
+def test_follower_waits_for_the_commit_to_be_built():
+    """
+    Tests that Pages is enabled and on_deployed only fires once the pushed commit is built.
+    """
+    with FakeGitHub() as fake:
+        gh = GitHubClient("token", base_url=fake.url, write_interval=0)
+        repo = gh.post("/user/repos", json={"name": "site", "auto_init": True})
+        commit_sha = push_files(gh, repo, {"index.html": "<html></html>"}, "Round 1 submission")
+
+        deployed = threading.Event()
+        build_seconds = []
+        follower = PagesFollower(gh, initial_delay=0.01, max_delay=0.05, timeout=5)
+        follower.follow("fakeuser/site", "main", commit_sha, lambda s: (build_seconds.append(s), deployed.set()), lambda reason: deployed.set())
+
+        assert deployed.wait(5)
+        assert build_seconds and build_seconds[0] > 0
+        assert "site" in fake.pages
+        assert fake.count("GET", "/pages/builds/latest") == fake.build_polls + 1
+        assert follower.stats()["deployed"] == 1
+
+def test_follower_times_out():
+    """
+    Tests that on_failed fires when the build never finishes.
+    """
+    with FakeGitHub() as fake:
+        fake.build_polls = 10_000
+        gh = GitHubClient("token", base_url=fake.url, write_interval=0)
+        repo = gh.post("/user/repos", json={"name": "slow", "auto_init": True})
+        commit_sha = push_files(gh, repo, {"index.html": "<html></html>"}, "Round 1 submission")
+
+        failures = []
+        done = threading.Event()
+        follower = PagesFollower(gh, initial_delay=0.01, max_delay=0.02, timeout=0.2)
+        follower.follow("fakeuser/slow", "main", commit_sha, lambda s: done.set(), lambda reason: (failures.append(reason), done.set()))
+
+        assert done.wait(5)
+        assert failures and "not deployed" in failures[0]
+        assert follower.stats()["failed"] == 1
+
+def test_a_newer_build_containing_the_commit_counts_as_deployed():
+    """
+    Tests that a second push before the first commit is built deploys the first commit too,
+    rather than waiting for a build of it that never comes.
+    """
+    with FakeGitHub() as fake:
+        gh = GitHubClient("token", base_url=fake.url, write_interval=0)
+        repo = gh.post("/user/repos", json={"name": "twice", "auto_init": True})
+        first_sha = push_files(gh, repo, {"index.html": "<html>1</html>"}, "Round 1 submission")
+        push_files(gh, repo, {"index.html": "<html>2</html>"}, "Round 2 submission")
+
+        deployed = threading.Event()
+        failures = []
+        follower = PagesFollower(gh, initial_delay=0.01, max_delay=0.05, timeout=5)
+        follower.follow("fakeuser/twice", "main", first_sha, lambda s: deployed.set(), lambda reason: (failures.append(reason), deployed.set()))
+
+        assert deployed.wait(5)
+        assert not failures
+        assert fake.count("GET", "/compare/") == 1
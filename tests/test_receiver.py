@@ -0,0 +1,101 @@
+import time
+import asyncio
+from fastapi.testclient import TestClient
+from database.db_utils import init_db, execute, executemany, fetchall
+from evaluation_scripts import receiver
+from evaluation_scripts.scheduler import Scheduler
+from tests.test_scheduler import FakeEvaluator
+
+TASK_INSERT = "INSERT INTO tasks (email, task, round, nonce, checks) VALUES (?, ?, ?, ?, '[]')"
+
+def callback(i: int, nonce: str = None, commit_sha: str = "sha1") -> dict:
+    return {"email": f"r{i}@example.com", "task": "receiver-task", "round": 1, "nonce": nonce or f"rn{i}",
+            "repo_url": f"https://github.com/u/r{i}", "commit_sha": commit_sha, "pages_url": f"https://u.github.io/r{i}/"}
+
+def setup_tasks(count: int):
+    init_db()
+    execute("DELETE FROM tasks WHERE task='receiver-task'")
+    execute("DELETE FROM repos WHERE task='receiver-task'")
+    executemany(TASK_INSERT, [(f"r{i}@example.com", "receiver-task", 1, f"rn{i}") for i in range(count)])
+
+def test_callbacks_are_validated_recorded_and_queued(monkeypatch):
+    """
+    Tests that a callback matching a sent task is upserted into repos and scheduled for evaluation,
+    and that one with an unknown nonce is rejected.
+    """
+    setup_tasks(2)
+    evaluator = FakeEvaluator()
+    evaluated = evaluator.evaluated
+    monkeypatch.setattr(receiver, "scheduler", Scheduler(evaluator, poll_interval=0))
+    with TestClient(receiver.app) as client:
+        assert client.post("/evaluation", json=callback(0)).status_code == 200
+        assert client.post("/evaluation", json=callback(0, commit_sha="sha2")).status_code == 200
+        response = client.post("/evaluation", json=callback(1, nonce="forged"))
+        assert response.status_code == 400
+        assert client.post("/evaluation", json={"email": "r1@example.com"}).status_code == 422
+        for _ in range(100):
+            if len(evaluated) == 2:
+                break
+            time.sleep(0.05)
+        metrics = client.get("/metrics").json()
+
+    rows = fetchall("SELECT email, commit_sha FROM repos WHERE task='receiver-task'")
+    assert rows == [{"email": "r0@example.com", "commit_sha": "sha2"}]
+    assert evaluated == [("r0@example.com", "sha1"), ("r0@example.com", "sha2")]
+    assert metrics["repos"]["accepted"] == 2
+    assert metrics["repos"]["rejected"] == 1
+
+def test_concurrent_callbacks_are_written_in_batches():
+    """
+    Tests that callbacks arriving together are committed in a few transactions rather than one each.
+    """
+    setup_tasks(200)
+    committed = []
+
+    async def burst():
+        writer = receiver.RepoWriter(on_commit=committed.extend)
+        writer.start()
+        try:
+            results = await asyncio.gather(*(writer.submit(callback(i)) for i in range(200)),
+                                           writer.submit(callback(0, nonce="forged")))
+        finally:
+            await writer.stop()
+        return writer, results
+
+    writer, results = asyncio.run(burst())
+    assert results == [True] * 200 + [False]
+    assert writer.batches < 10
+    assert len(committed) == 200
+    assert len(fetchall("SELECT * FROM repos WHERE task='receiver-task'")) == 200
+
+def test_writer_survives_cancelled_callers_and_failing_batches():
+    """
+    Tests that a caller cancelling its request and an unexpected error in a batch do not stop the writer.
+    """
+    setup_tasks(2)
+    calls = []
+
+    def on_commit(repos):
+        calls.append(repos)
+        if len(calls) == 1:
+            raise ValueError("scheduler unavailable")
+
+    async def scenario():
+        writer = receiver.RepoWriter(on_commit=on_commit)
+        writer.start()
+        try:
+            cancelled = asyncio.create_task(writer.submit(callback(0)))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            for _ in range(100):
+                if calls:
+                    break
+                await asyncio.sleep(0.01)
+            return await asyncio.wait_for(writer.submit(callback(1)), 5)
+        finally:
+            await writer.stop()
+
+    assert asyncio.run(scenario()) is True
+    assert len(calls) == 2
+    assert len(fetchall("SELECT * FROM repos WHERE task='receiver-task'")) == 2
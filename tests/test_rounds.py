@@ -0,0 +1,142 @@
+import os
+import csv
+import time
+from unittest.mock import patch
+from database.db_utils import init_db, execute, executemany, fetchall
+from evaluation_scripts import round1, round2, dispatcher
+from evaluation_scripts.templates import template_for, render_round
+from tests.fake_student_api import FakeStudentAPI
+
+TASK_INSERT = "INSERT INTO tasks (email, task, round, nonce, secret, evaluation_url, endpoint, checks) VALUES (?, ?, ?, ?, ?, ?, ?, '[]')"
+
+def test_round2_payloads_come_from_one_query_and_the_template():
+    """
+    Tests that round 2 uses each student's latest round 1 task, skips students already sent round 2
+    or without a repo, and renders the brief from the template's round2 entry.
+    """
+    init_db()
+    execute("DELETE FROM tasks")
+    execute("DELETE FROM repos")
+    executemany(TASK_INSERT, [
+        ("a@example.com", "sum-of-sales-1", 1, "n1", "old-secret", "http://eval/old", "http://a/api"),
+        ("a@example.com", "sum-of-sales-1", 1, "n2", "a-secret", "http://eval/a", "http://a/api"),
+        ("b@example.com", "captcha-solver-1", 1, "n3", "b-secret", "http://eval/b", None),
+        ("c@example.com", "captcha-solver-1", 1, "n4", "c-secret", "http://eval/c", None),
+        ("c@example.com", "captcha-solver-1", 2, "n5", "c-secret", "http://eval/c", None),
+        ("d@example.com", "captcha-solver-1", 1, "n6", "d-secret", "http://eval/d", None),
+    ])
+    executemany("INSERT INTO repos (email, task, round, nonce, repo_url) VALUES (?, ?, 1, ?, ?)", [
+        ("a@example.com", "sum-of-sales-1", "n2", "https://github.com/u/a"),
+        ("b@example.com", "captcha-solver-1", "n3", "https://github.com/u/b"),
+        ("c@example.com", "captcha-solver-1", "n4", "https://github.com/u/c"),
+    ])
+
+    with patch.object(round2, "fetchall", wraps=fetchall) as queries:
+        payloads = round2.build_round2_payloads()
+    assert queries.call_count == 1
+
+    assert [(endpoint, payload["email"], payload["secret"], payload["evaluation_url"]) for endpoint, payload in payloads] == [
+        ("http://a/api", "a@example.com", "a-secret", "http://eval/a"),
+        (round2.DEFAULT_ENDPOINT, "b@example.com", "b-secret", "http://eval/b"),
+    ]
+    assert payloads[0][1]["brief"].startswith("Add #product-sales table")
+    assert payloads[0][1]["checks"] == ["js: document.querySelectorAll('#product-sales tbody tr').length >= 1"]
+    assert payloads[1][1]["brief"] == round2.fallback_round2("captcha-solver-1")["brief"]
+
+def test_templates_render_per_student_seeds():
+    """
+    Tests that templates are matched by id prefix and placeholders are filled with a stable seed.
+    """
+    template = template_for("sum-of-sales-7")
+    assert template["id"] == "sum-of-sales"
+    first = render_round(template, "a@example.com", "sum-of-sales-7", 1)
+    assert first == render_round(template, "a@example.com", "sum-of-sales-7", 1)
+    assert "${seed}" not in first["attachments"][0]["url"]
+    assert first["attachments"] != render_round(template, "b@example.com", "sum-of-sales-7", 1)["attachments"]
+    assert render_round(template, "a@example.com", "sum-of-sales-7", 3) is None
+    assert template_for("unknown-task") is None
+
+def make_payload(i: int) -> dict:
+    return {
+        "email": f"s{i}@example.com", "secret": "s", "task": "captcha-solver-1", "round": 1, "nonce": f"n{i}",
+        "brief": "brief", "checks": ["check"], "evaluation_url": "http://eval", "attachments": [],
+    }
+
+def test_dispatcher_limits_each_host_and_retries_with_backoff(monkeypatch):
+    """
+    Tests that a slow host only uses its own slots, transient 503s are retried and every task is
+    recorded in the tasks table.
+    """
+    init_db()
+    execute("DELETE FROM tasks")
+    monkeypatch.setattr(dispatcher, "DISPATCH_BACKOFF_BASE", 0.01)
+    with FakeStudentAPI(latency=0.3) as slow, FakeStudentAPI(failures=1) as flaky, FakeStudentAPI(status=400) as broken:
+        items = [(slow.url, make_payload(i)) for i in range(4)]
+        items += [(flaky.url, make_payload(i)) for i in range(4, 24)]
+        items += [(broken.url, make_payload(24))]
+        start = time.perf_counter()
+        result = dispatcher.dispatch(iter(items), per_host=2, batch_size=7)
+        elapsed = time.perf_counter() - start
+
+    assert slow.max_in_flight == 2
+    assert len(flaky.received) == 20 and all(count == 2 for count in flaky.attempts.values())
+    assert (result.sent, result.failed, result.retries) == (24, 1, 20)
+    assert elapsed < 1.5
+    statuses = {row["email"]: row["statuscode"] for row in fetchall("SELECT email, statuscode FROM tasks")}
+    assert len(statuses) == 25
+    assert statuses["s24@example.com"] == 400
+    assert statuses["s0@example.com"] == 202
+
+def write_submissions(path, emails, endpoint, mode="w"):
+    with open(path, mode, newline="") as f:
+        writer = csv.writer(f)
+        if mode == "w":
+            writer.writerow(["email", "secret", "task", "round", "nonce", "brief", "checks", "evaluation_url", "attachments", "endpoint"])
+        for email in emails:
+            writer.writerow([email, "s", "captcha-solver-1", 1, "n", "multi\nline brief", "a,b", "http://eval", "[]", endpoint])
+
+def test_round1_ingest_skips_processed_emails_and_resumes_from_checkpoint(tmp_path):
+    """
+    Tests that processed emails come from one query and a second run only reads rows appended since.
+    """
+    init_db()
+    execute("DELETE FROM tasks")
+    execute("DELETE FROM ingest_checkpoints")
+    execute(TASK_INSERT, ("done@example.com", "captcha-solver-1", 1, "old", "s", "http://eval", None))
+    path = str(tmp_path / "submissions.csv")
+    with FakeStudentAPI() as api:
+        write_submissions(path, ["done@example.com", "a@example.com", "b@example.com"], api.url)
+        with patch.object(round1, "fetchall", wraps=fetchall) as queries:
+            round1.main(["--csv", path])
+        assert queries.call_count == 1
+        assert [payload["email"] for payload in api.received] == ["a@example.com", "b@example.com"]
+        assert api.received[0]["brief"] == "multi\nline brief"
+        saved = fetchall("SELECT byte_offset, row_number FROM ingest_checkpoints")
+        assert saved == [{"byte_offset": os.path.getsize(path), "row_number": 3}]
+
+        execute("DELETE FROM tasks WHERE email IN ('a@example.com', 'b@example.com')")
+        write_submissions(path, ["c@example.com"], api.url, mode="a")
+        round1.main(["--csv", path])
+        assert [payload["email"] for payload in api.received][2:] == ["c@example.com"]
+        assert fetchall("SELECT row_number FROM ingest_checkpoints") == [{"row_number": 4}]
+
+def test_checkpoint_only_advances_over_finished_rows(tmp_path):
+    """
+    Tests that a row finishing early does not move the checkpoint past a row still in flight.
+    """
+    init_db()
+    execute("DELETE FROM ingest_checkpoints")
+    path = str(tmp_path / "submissions.csv")
+    write_submissions(path, ["a@example.com", "b@example.com", "c@example.com"], "http://student")
+    checkpoint = round1.Checkpoint(path)
+    rows = list(round1.iter_submissions(path, checkpoint))
+    for row_number, offset, row in rows:
+        checkpoint.read(row_number, offset, row["email"])
+    checkpoint.done("a@example.com")
+    checkpoint.done("c@example.com")
+    checkpoint.save()
+
+    resumed = round1.Checkpoint(path)
+    assert (resumed.row_number, resumed.offset) == (1, rows[0][1])
+    assert [row["email"] for _, _, row in round1.iter_submissions(path, resumed)] == ["b@example.com", "c@example.com"]
+    assert round1.Checkpoint(path, restart=True).row_number == 0
@@ -0,0 +1,188 @@
+import time
+import asyncio
+from database.db_utils import init_db, execute, executemany
+from evaluation_scripts.scheduler import Scheduler, deadline_for
+
+class FakeEvaluator:
+    """Records the repos it evaluates; evaluation waits until `gate` is set."""
+
+    def __init__(self):
+        self.evaluated = []
+        self.done = set()
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def pending(self, repo):
+        return [] if (repo["repo_url"], repo["commit_sha"]) in self.done else ["Playwright Test"]
+
+    async def evaluate(self, repo):
+        await self.gate.wait()
+        self.evaluated.append((repo["email"], repo["commit_sha"]))
+        self.done.add((repo["repo_url"], repo["commit_sha"]))
+
+    def flush(self):
+        pass
+
+def repo(name: str, round_num: int = 1, commit_sha: str = "sha1") -> dict:
+    return {"email": f"{name}@example.com", "task": "scheduler-task", "round": round_num, "nonce": name,
+            "repo_url": f"https://github.com/u/{name}", "commit_sha": commit_sha, "pages_url": f"https://u.github.io/{name}/"}
+
+async def settle(evaluator: FakeEvaluator, count: int):
+    for _ in range(200):
+        if len(evaluator.evaluated) >= count:
+            return
+        await asyncio.sleep(0.01)
+
+def test_submissions_are_prioritized_and_deduplicated():
+    """
+    Tests that round 2 submissions run before round 1 ones, that a commit is evaluated once,
+    and that a new commit replaces the queued one for the same submission.
+    """
+    async def scenario():
+        evaluator = FakeEvaluator()
+        scheduler = Scheduler(evaluator, workers=1, poll_interval=0)
+        await scheduler.start()
+        evaluator.gate.clear()
+        scheduler.submit(repo("first"))
+        await asyncio.sleep(0.01)
+        scheduler.submit(repo("a"))
+        scheduler.submit(repo("b", round_num=2))
+        scheduler.submit(repo("a"))
+        scheduler.submit(repo("first"))
+        scheduler.submit(repo("c"))
+        scheduler.submit(repo("c", commit_sha="sha2"))
+        evaluator.gate.set()
+        await settle(evaluator, 4)
+        scheduler.submit(repo("b", round_num=2))
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return evaluator, scheduler
+
+    evaluator, scheduler = asyncio.run(scenario())
+    assert evaluator.evaluated == [
+        ("first@example.com", "sha1"), ("b@example.com", "sha1"), ("a@example.com", "sha1"), ("c@example.com", "sha2"),
+    ]
+    assert scheduler.stats()["duplicates"] == 3
+
+def test_backlog_beyond_the_queue_is_read_from_repos():
+    """
+    Tests that submissions that do not fit the queue are deferred and later picked up by the repos poller.
+    """
+    init_db()
+    execute("DELETE FROM repos")
+    rows = [repo(f"p{i}") for i in range(6)]
+    executemany("INSERT INTO repos (email, task, round, nonce, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(r["email"], r["task"], r["round"], r["nonce"], r["repo_url"], r["commit_sha"], r["pages_url"]) for r in rows])
+
+    async def scenario():
+        evaluator = FakeEvaluator()
+        evaluator.gate.clear()
+        scheduler = Scheduler(evaluator, workers=1, max_pending=2, poll_interval=0.01)
+        await scheduler.start()
+        accepted = [scheduler.submit(r) for r in rows]
+        await asyncio.sleep(0.05)
+        evaluator.gate.set()
+        await settle(evaluator, 6)
+        await scheduler.stop()
+        return evaluator, accepted
+
+    evaluator, accepted = asyncio.run(scenario())
+    assert accepted[:2] == [True, True] and not all(accepted)
+    emails = {r["email"] for r in rows}
+    assert sorted(email for email, _ in evaluator.evaluated if email in emails) == sorted(emails)
+    execute("DELETE FROM repos WHERE task='scheduler-task'")
+
+def test_poller_reads_every_row_once_in_seq_order():
+    """
+    Tests that rows beyond the queue are read on later polls, and that a submission updated within
+    the same second is picked up with its new commit.
+    """
+    init_db()
+    execute("DELETE FROM repos")
+    rows = [repo(f"s{i}") for i in range(4)]
+    executemany("INSERT INTO repos (email, task, round, nonce, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(r["email"], r["task"], r["round"], r["nonce"], r["repo_url"], r["commit_sha"], r["pages_url"]) for r in rows])
+
+    async def scenario():
+        evaluator = FakeEvaluator()
+        evaluator.gate.clear()
+        scheduler = Scheduler(evaluator, workers=1, max_pending=1, poll_interval=0.01)
+        await scheduler.start()
+        await asyncio.sleep(0.05)
+        evaluator.gate.set()
+        await settle(evaluator, 4)
+        execute("UPDATE repos SET commit_sha='sha2' WHERE email='s0@example.com'")
+        await settle(evaluator, 5)
+        await scheduler.stop()
+        return evaluator
+
+    evaluator = asyncio.run(scenario())
+    assert sorted(evaluator.evaluated) == sorted([(r["email"], "sha1") for r in rows] + [("s0@example.com", "sha2")])
+    execute("DELETE FROM repos WHERE task='scheduler-task'")
+
+def test_poller_stops_at_a_rejected_row():
+    """
+    Tests that the watermark does not move past a row submit rejected, so it and the rows after it are read again.
+    """
+    init_db()
+    execute("DELETE FROM repos")
+    rows = [repo(f"w{i}") for i in range(3)]
+    executemany("INSERT INTO repos (email, task, round, nonce, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(r["email"], r["task"], r["round"], r["nonce"], r["repo_url"], r["commit_sha"], r["pages_url"]) for r in rows])
+
+    async def scenario():
+        scheduler = Scheduler(FakeEvaluator(), workers=1, poll_interval=0.01)
+        offered = []
+        submit = scheduler.submit
+
+        def reject_w1_once(row):
+            offered.append(row["email"])
+            return submit(row) if row["email"] != "w1@example.com" or offered.count(row["email"]) > 1 else False
+
+        scheduler.submit = reject_w1_once
+        await scheduler.start()
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return offered
+
+    offered = asyncio.run(scenario())
+    assert offered[:4] == ["w0@example.com", "w1@example.com", "w1@example.com", "w2@example.com"]
+    execute("DELETE FROM repos WHERE task='scheduler-task'")
+
+def test_deadlines_accept_any_timestamp_format():
+    """
+    Tests that SQLite and ISO timestamps give the same deadline and an unparseable one counts as now.
+    """
+    sqlite_style = deadline_for({"round": 1, "timestamp": "2026-10-18 10:00:00"})
+    assert deadline_for({"round": 1, "timestamp": "2026-10-18T10:00:00"}) == sqlite_style
+    assert deadline_for({"round": 1, "timestamp": "2026-10-18T12:00:00+02:00"}) == sqlite_style
+    assert abs(deadline_for({"round": 1, "timestamp": "yesterday"}) - (time.time() + 600)) < 5
+
+def test_a_bad_row_does_not_stop_the_poller():
+    """
+    Tests that a row that cannot be queued is logged and skipped, and the rows after it are still evaluated.
+    """
+    init_db()
+    execute("DELETE FROM repos")
+    execute("INSERT INTO repos (email, task, round, nonce, repo_url, commit_sha, timestamp) VALUES "
+            "('bad@example.com', 'scheduler-task', NULL, 'bad', 'https://github.com/u/bad', 'sha1', 'not a time')")
+    good = repo("good")
+    execute("INSERT INTO repos (email, task, round, nonce, repo_url, commit_sha, pages_url) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (good["email"], good["task"], good["round"], good["nonce"], good["repo_url"], good["commit_sha"], good["pages_url"]))
+
+    async def scenario():
+        evaluator = FakeEvaluator()
+        scheduler = Scheduler(evaluator, workers=1, poll_interval=0.01)
+        await scheduler.start()
+        await settle(evaluator, 1)
+        await scheduler.stop()
+        return evaluator
+
+    assert asyncio.run(scenario()).evaluated == [("good@example.com", "sha1")]
+    execute("DELETE FROM repos WHERE task='scheduler-task'")
@@ -1,10 +1,16 @@
 import os
 import json
+import time
+import uuid
+import asyncio
+import threading
 from unittest.mock import patch
 from fastapi.testclient import TestClient
-from student_api.app import app
-from database.db_utils import init_db
+from student_api.app import app, api_endpoint, job_runner, process_task
+from student_api.jobs import JobRunner, RUNNING, create_job, update_job
+from database.db_utils import init_db, fetchall
 from dotenv import load_dotenv
+from tests.fake_github import deploy_now
 
 load_dotenv()
 
@@ -33,11 +39,12 @@ def test_invalid_secret():
     assert response.status_code == 403
     assert response.json() == {"detail": "Invalid secret"}
 
+@patch("student_api.app.follow_pages_deployment", deploy_now)
 @patch("student_api.app.generate_app")
 @patch("student_api.app.create_and_push_to_repo")
 def test_valid_request(mock_create_and_push_to_repo, mock_generate_app):
     """
-    Tests that the API returns a 200 OK status when a valid request is sent.
+    Tests that the API accepts a valid request with 202 and the job completes successfully.
     """
     init_db()
     mock_generate_app.return_value = {
@@ -58,15 +65,213 @@ def test_valid_request(mock_create_and_push_to_repo, mock_generate_app):
             "secret": API_SECRET,
             "task": "test-task",
             "round": 1,
-            "nonce": "test-nonce",
+            "nonce": uuid.uuid4().hex,
+            "brief": "Test brief",
+            "checks": [],
+            "evaluation_url": "http://example.com/evaluate",
+            "attachments": [],
+        },
+    )
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    job_runner.wait(job_id, timeout=10)
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["status"] == "success"
+    assert job["result"]["repo_url"] == "https://github.com/user/repo"
+    assert job["result"]["pages_url"] == "https://user.github.io/repo/"
+
+@patch("student_api.app.generate_app")
+def test_failed_job(mock_generate_app):
+    """
+    Tests that a failing generation stage marks the job as failed.
+    """
+    init_db()
+    mock_generate_app.return_value = {"error": "OpenAI API quota exceeded."}
+
+    response = client.post(
+        "/api-endpoint",
+        json={
+            "email": "test@example.com",
+            "secret": API_SECRET,
+            "task": "test-task-failed",
+            "round": 1,
+            "nonce": "test-nonce-failed",
             "brief": "Test brief",
             "checks": [],
             "evaluation_url": "http://example.com/evaluate",
             "attachments": [],
         },
     )
+    assert response.status_code == 202
+    job = job_runner.wait(response.json()["job_id"], timeout=10)
+    assert job["status"] == "failed"
+    assert job["stage"] == "generate"
+    assert "quota" in job["error"]
+
+def test_unknown_job():
+    """
+    Tests that the job status endpoint returns 404 for unknown jobs.
+    """
+    init_db()
+    response = client.get("/jobs/does-not-exist")
+    assert response.status_code == 404
+
+def test_metrics():
+    """
+    Tests that the metrics endpoint exposes the GitHub budget.
+    """
+    response = client.get("/metrics")
     assert response.status_code == 200
-    response_json = response.json()
-    assert response_json["status"] == "success"
-    assert response_json["repo_url"] == "https://github.com/user/repo"
-    assert response_json["pages_url"] == "https://user.github.io/repo/"
\ No newline at end of file
+    assert "github" in response.json()
+
+@patch("student_api.app.follow_pages_deployment", deploy_now)
+@patch("student_api.app.generate_app")
+@patch("student_api.app.create_and_push_to_repo")
+def test_repeated_nonce_is_attached_to_the_existing_job(mock_create_and_push_to_repo, mock_generate_app):
+    """
+    Tests that a repeated request joins the in-flight job, gets the stored result once it has
+    succeeded, and that generation runs only once.
+    """
+    init_db()
+    release = threading.Event()
+
+    def generate(brief, processed_data):
+        release.wait(10)
+        return {"index.html": "<html></html>"}
+
+    mock_generate_app.side_effect = generate
+    mock_create_and_push_to_repo.return_value = ("https://github.com/user/idem", "sha", "https://user.github.io/idem/")
+    payload = {
+        "email": "idem@example.com",
+        "secret": API_SECRET,
+        "task": "idem-task",
+        "round": 1,
+        "nonce": uuid.uuid4().hex,
+        "brief": "Test brief",
+        "checks": [],
+        "evaluation_url": "http://example.com/evaluate",
+        "attachments": [],
+    }
+
+    first = client.post("/api-endpoint", json=payload)
+    retries = [client.post("/api-endpoint", json=payload) for _ in range(3)]
+    assert first.status_code == 202
+    assert {response.status_code for response in retries} == {202}
+    assert {response.json()["job_id"] for response in retries} == {first.json()["job_id"]}
+
+    release.set()
+    job_runner.wait(first.json()["job_id"], timeout=10)
+    completed = client.post("/api-endpoint", json=payload)
+    assert completed.status_code == 200
+    assert completed.json()["status"] == "completed"
+    assert completed.json()["result"]["repo_url"] == "https://github.com/user/idem"
+    assert mock_generate_app.call_count == 1
+    assert len(fetchall("SELECT id FROM jobs WHERE nonce=?", (payload["nonce"],))) == 1
+
+@patch("student_api.app.generate_app")
+def test_repeated_nonce_retries_a_failed_job(mock_generate_app):
+    """
+    Tests that a repeated request for a failed job runs it again under the same job id.
+    """
+    init_db()
+    mock_generate_app.return_value = {"error": "OpenAI API quota exceeded."}
+    payload = {
+        "email": "retry@example.com",
+        "secret": API_SECRET,
+        "task": "retry-task",
+        "round": 1,
+        "nonce": uuid.uuid4().hex,
+        "brief": "Test brief",
+        "checks": [],
+        "evaluation_url": "http://example.com/evaluate",
+        "attachments": [],
+    }
+
+    job_id = client.post("/api-endpoint", json=payload).json()["job_id"]
+    assert job_runner.wait(job_id, timeout=10)["status"] == "failed"
+    retry = client.post("/api-endpoint", json=payload)
+    assert retry.status_code == 202
+    assert retry.json()["job_id"] == job_id
+    job_runner.wait(job_id, timeout=10)
+    assert mock_generate_app.call_count == 2
+
+@patch("student_api.app.follow_pages_deployment")
+@patch("student_api.app.create_and_push_to_repo")
+@patch("student_api.app.generate_app")
+def test_job_waiting_for_its_deployment_is_followed_again_after_a_restart(mock_generate_app, mock_create_and_push_to_repo, mock_follow):
+    """
+    Tests that a job interrupted in the deploy stage resumes following its pushed commit on
+    recovery, without generating and pushing again.
+    """
+    init_db()
+    mock_follow.side_effect = deploy_now
+    payload = {
+        "email": "resume@example.com",
+        "secret": API_SECRET,
+        "task": "resume-task",
+        "round": 1,
+        "nonce": uuid.uuid4().hex,
+        "brief": "Test brief",
+        "checks": [],
+        "evaluation_url": "http://example.com/evaluate",
+        "attachments": [],
+    }
+    job_id, _ = create_job(payload, "http://localhost/api-endpoint")
+    update_job(job_id, status=RUNNING, stage="deploy", repo_url="https://github.com/user/resume",
+               commit_sha="resume_sha", pages_url="https://user.github.io/resume/")
+
+    runner = JobRunner(process_task)
+    runner.recover()
+    job = runner.wait(job_id, timeout=10)
+    runner.shutdown()
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["commit_sha"] == "resume_sha"
+    assert mock_follow.call_args[0][:2] == ("https://github.com/user/resume", "resume_sha")
+    mock_generate_app.assert_not_called()
+    mock_create_and_push_to_repo.assert_not_called()
+
+def test_submission_does_not_block_the_event_loop(monkeypatch):
+    """
+    Tests that the event loop keeps running while a job submission is slow.
+    """
+    def slow_submit(payload, endpoint):
+        time.sleep(0.3)
+        return "slow-job", True
+
+    class FakeRequest:
+        url = "http://testserver/api-endpoint"
+
+        async def json(self):
+            return {
+                "email": "slow@example.com",
+                "secret": API_SECRET,
+                "task": "slow-task",
+                "round": 1,
+                "nonce": uuid.uuid4().hex,
+                "brief": "Test brief",
+                "checks": [],
+                "evaluation_url": "http://example.com/evaluate",
+                "attachments": [],
+            }
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        response = await api_endpoint(FakeRequest())
+        ticking.cancel()
+        return response, ticks
+
+    monkeypatch.setattr(job_runner, "submit", slow_submit)
+    response, ticks = asyncio.run(scenario())
+    assert response.status_code == 202
+    assert ticks > 5